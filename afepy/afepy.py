@@ -11,6 +11,7 @@ from mesh import Mesh
 from material import Material
 from elem import FiniteElement
 from tools.exomgr import ExodusIIFile
+from tools.vtkmgr import VTKFile
 from tools.misc import Range
 from tools.lapackjac import linsolve
 
@@ -18,6 +19,7 @@ from tools.lapackjac import linsolve
 from apps.fem.static_linear_solve import StaticLinearSolve
 from apps.fem.static_nonlin_solve import StaticNonlinearSolve
 from apps.fem.dynamic_linear_solve import ExplicitLinearSolve
+from apps.fem.explicit_dynamic_solve import ExplicitDynamicSolve
 from apps.fem.freq import ModeShapes
 
 from numpy import set_printoptions
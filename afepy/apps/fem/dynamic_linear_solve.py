@@ -1,9 +1,10 @@
-from numpy import dot, zeros, ones, eye, diag
+from numpy import dot, zeros, ones, eye
 from numpy.linalg import lstsq
 
 from tools.errors import AFEPYError
-from tools.lapackjac import linsolve
+from tools.lapackjac import make_solver
 from tools.logger import ConsoleLogger as logger
+from tools.profiler import profiler
 
 
 HEAD = """\
@@ -32,6 +33,7 @@ def ExplicitLinearSolve(V, u, node_bcs, tractions, F=None, period=1.,
     u is the unkown nodal displacement vector
 
     """
+    profiler.reset()
     lumped_mass = 1
     alpha, beta = a, b
 
@@ -62,7 +64,12 @@ def ExplicitLinearSolve(V, u, node_bcs, tractions, F=None, period=1.,
 
     # adjusted mass and initial acceleration
     Mk = M + .5 * beta * dtime * dtime * A
-    a[0] = linsolve(M, -dot(A, u.u) + F)
+    solver = make_solver(block_size=V.num_dof_per_node, perm=V.dof_order)
+    a[0] = solver(M, -A.dot(u.u) + F)
+
+    # the adjusted mass is constant, factor it once
+    if not lumped_mass:
+        solver.factor(Mk)
 
     istep = 1
     for n in range(increments):
@@ -70,13 +77,13 @@ def ExplicitLinearSolve(V, u, node_bcs, tractions, F=None, period=1.,
 
         # update residual
         uu = u.u + dtime * v[0] + .5 * (1. - beta) * dtime * dtime * a[0]
-        rn = F - dot(A, uu)
+        rn = F - A.dot(uu)
 
         # update acceleration
         if lumped_mass:
-            a[1] = rn / diag(Mk)
+            a[1] = rn / Mk.diagonal()
         else:
-            a[1] = linsolve(Mk, rn)
+            a[1] = solver.solve(rn)
 
         # update velocity
         v[1] = v[0] + dtime * (1. - alpha * a[0] + alpha * a[1])
@@ -97,6 +104,9 @@ def ExplicitLinearSolve(V, u, node_bcs, tractions, F=None, period=1.,
         message = ITER_FMT.format(istep, n+1, u.time, dtime)
         logger.info(message)
 
+    logger.write(solver.summary())
+    V.close()
+    profiler.report("ExplicitLinearSolve")
     logger.write("Simulation completed successfully\n")
     logger.write("=" * 78)
     return
@@ -0,0 +1,164 @@
+import numpy as np
+from numpy import sqrt, dot
+
+from tools.errors import AFEPYError
+from tools.logger import ConsoleLogger as logger
+from tools.profiler import profiler
+
+
+HEAD = """\
+ Step    Increment     Time        Time       Kinetic
+                                   Step       Energy"""
+ITER_FMT = "{0:=4}   {1:=10}   {2:.4E}  {3:.4E}  {4:.4E}"
+
+def ExplicitDynamicSolve(V, data, node_bcs, tractions=None, F=None, period=1.,
+                         dtime=None, safety=.9, amplitude=None, damping=0.,
+                         frames=100):
+    """Integrate the equations of motion by the explicit central difference
+    method
+
+    Parameters
+    ----------
+    dtime : float, optional
+        The time step, by default safety times the stable time step
+    safety : float
+        Fraction of the stable time step used as the time step
+    amplitude : callable, optional
+        amplitude(t) scales the loads and prescribed displacements at time t,
+        by default they are applied in full from the start
+    damping : float
+        Mass proportional damping coefficient
+    frames : int
+        Approximate number of steps output, every num_steps // frames step
+        and the last step are output (to the stride of the output)
+
+    Notes
+    -----
+    Integrates
+
+                  M a = F - R(u)
+
+    where
+
+    M is the row sum lumped mass, kept as the vector of its diagonal
+    F is the global finite element load
+    R is the internal force, integrated element by element
+    u, a are the unknown nodal displacements and accelerations
+
+    No global matrix is formed so that the storage grows only linearly with
+    the size of the mesh.  The time step is limited by the time it takes a
+    dilatational wave to cross the smallest element (see stable_time_step).
+
+    """
+    profiler.reset()
+
+    if amplitude is None:
+        amplitude = lambda t: 1.
+
+    dt_crit = stable_time_step(V)
+    if dtime is None:
+        dtime = safety * dt_crit
+    elif dtime > dt_crit:
+        logger.warn("time step {0:.4E} exceeds the stable time step "
+                    "{1:.4E}".format(dtime, dt_crit))
+    num_steps = int(np.ceil(period / dtime))
+    dtime = period / float(num_steps)
+
+    # output every frame_step-th step and the last step
+    frame_step = max(1, num_steps // max(1, int(frames)))
+
+    logger.write_intro("Dynamic, explicit", num_steps, None, None, None,
+                       data.time, data.time + period, V.num_dim, V.num_elem,
+                       V.num_node)
+    logger.write("Stable time step: {0:.4E}, time step: {1:.4E}".format(
+                 dt_crit, dtime))
+    logger.write(HEAD)
+
+    m = V.lumped_mass()
+    if np.any(m <= 0.):
+        raise AFEPYError("lumped mass must be positive")
+
+    # Compute global force, it is scaled by the amplitude of each step
+    q = V.force(tractions)
+    if F is not None:
+        q += F
+
+    bcs = V.dirichlet_set(node_bcs)
+    rows = bcs.rows
+
+    # internal force and acceleration of the initial state
+    u = data.Zeros()
+    for bd in data.blk_data:
+        bd.reset()
+    V.update_kinematics(data, u, dtime)
+    V.update_material(data, u, data.time, dtime, 0)
+    R = V.residual(data, u)
+    v = np.zeros(V.num_dof)
+    a = (amplitude(data.time) * q - R) / m
+    a[rows] = 0.
+
+    t0 = data.time
+    for n in range(num_steps):
+        kstep = n + 1
+        time = t0 + kstep * dtime
+
+        # velocity at the half step, the first step is a half step
+        h = .5 * dtime if n == 0 else dtime
+        v += h * a
+
+        # increment in displacement, prescribed at the constrained dofs
+        du = dtime * v
+        du[rows] = amplitude(time) * bcs.mag - data[rows]
+        v[rows] = du[rows] / dtime
+
+        # internal force of the updated state
+        V.update_kinematics(data, du, dtime)
+        V.update_material(data, du, data.time, dtime, kstep)
+        R = V.residual(data, du)
+
+        a = (amplitude(time) * q - R - damping * m * v) / m
+        a[rows] = 0.
+
+        output = kstep % frame_step == 0 or kstep == num_steps
+        data.time = time
+        data.advance_data(du, output=output)
+
+        if output:
+            energy = .5 * dot(m, v * v)
+            logger.info(ITER_FMT.format(1, kstep, data.time, dtime, energy))
+
+    V.close()
+    profiler.report("ExplicitDynamicSolve")
+    logger.write("Simulation completed successfully\n")
+    logger.write("=" * 78)
+    return
+
+def stable_time_step(V):
+    """The stable time step of the central difference method, the smallest
+    time for a dilatational wave to cross an element
+
+    The element size is the smallest distance between two nodes of the
+    element and the wave speed is computed from the elastic bulk and shear
+    moduli and density.
+
+    """
+    dt = np.inf
+    for eb in V.blocks:
+        e = V.elements[eb.elem_ids[0]]
+        try:
+            K, G = e.material.bulk_modulus, e.material.shear_modulus
+        except AttributeError:
+            raise AFEPYError("{0}: material does not define the elastic "
+                             "moduli needed for the stable time "
+                             "step".format(e.material.name))
+        c = sqrt((K + 4. / 3. * G) / e.density)
+
+        X = V.X[V.connect[eb.elem_ids, :eb.num_node_per_elem]]
+        h = np.empty(len(eb.elem_ids))
+        h.fill(np.inf)
+        for i in range(X.shape[1]):
+            for j in range(i + 1, X.shape[1]):
+                d = X[:, i] - X[:, j]
+                h = np.minimum(h, sqrt((d * d).sum(axis=1)))
+        dt = min(dt, h.min() / c)
+    return dt
@@ -1,56 +1,132 @@
-from numpy import dot, zeros, sqrt, array
-from numpy.linalg import inv, svd
+import numpy as np
+from numpy import sqrt, pi
+import numpy.linalg as la
+try:
+    from scipy.sparse.linalg import eigsh
+    from scipy.linalg import eigh
+except ImportError:
+    eigsh = None
 
 from tools.errors import AFEPYError
+from tools.numeric import issparse
 from tools.logger import ConsoleLogger as logger
+from tools.profiler import profiler
 
 
 HEAD = """\
- Step  Increment Time   Time
-                        Step"""
-ITER_FMT = "{0:=4}    {1:=4}     {2:.2f}   {3:.2f}"
+ Mode   Eigenvalue   Frequency    Frequency
+                     (rad/time)   (cycles/time)"""
+ITER_FMT = "{0:=4}   {1:.4E}   {2:.4E}   {3:.4E}"
 
-
-def ModeShapes(V, u, node_bcs):
-    """Assemble and solve the system of equations
+def ModeShapes(V, data, node_bcs, num_modes=10, sigma=None, lumped_mass=0):
+    """Compute the lowest natural frequencies and mode shapes
 
     Parameters
     ----------
+    num_modes : int
+        The number of modes to compute
+    sigma : float, optional
+        Shift of the shift-invert iteration, the modes with eigenvalues
+        nearest sigma are found.  By default, a small negative shift is used
+        so that the lowest modes, including rigid body modes, are found
+    lumped_mass : bool
+        Use the lumped mass
+
+    Returns
+    -------
+    freq : ndarray
+        The frequencies of the modes, in cycles per unit time
+    modes : ndarray
+        The mass normalized mode shapes, (num_modes, num_dof)
 
     Notes
     -----
+    Solves the generalized eigenvalue problem
 
-    """
-    lumped_mass = 1
-
-    # Get initial estimate of element stiffnesses
-    du = u.Zeros()
-    F = u.Zeros()
-    A = V.stiff(u, u.time, 1., du, 0)
-    M = V.mass(lumped_mass=1)
-    V.apply_bcs(u, du, node_bcs, A, F)
-
-    rtm = sqrt(M)
-    irtm = inv(rtm);
-    H = dot(dot(irtm, A), irtm)
-    Q, Lambda, QQ = svd(H)
+                  K phi = lambda M phi
 
-    # Sort eigenvalues into order
-    elist = array(sorted([Lambda[i,i] for i in range(V.num_dof)]))
-    print elist[:10]
+    of the free dofs by shift-invert Lanczos iteration (scipy's eigsh), where
 
-    # Can specify which (non rigid body) mode to extract below
-    for mode in range(4):
-        for i in range(V.num_dof):
-            if Lambda[i,i] - elist[mode+3*ndof] ** 2 < 0.00000001:
-                mn = i
+    K is the global finite element stiffness
+    M is the global finite element mass
+    lambda is the square of the circular frequency of mode phi
 
-        u.u[:] = dot(irtm, Q[mn, :])
+    The mode shapes are added to data as steps, step k (at time k) holding
+    mode k, so that writing data to an ExodusII file writes each mode to its
+    own time plane.
 
-        scale = 3.;
-        for i in range(V.num_node):
-            for j in range(V.num_dof_per_node):
-                x[i, j] = V.X[i, j] + scale * u[V.num_dor_per_node*i+j]
-
-
-    return
+    """
+    profiler.reset()
+    logger.write_intro("Frequency, shift-invert Lanczos", num_modes, None,
+                       None, None, 0., float(num_modes), V.num_dim, V.num_elem,
+                       V.num_node)
+
+    # stiffness and mass of the undeformed state
+    u = data.Zeros()
+    A = V.stiffness(data, u, 0., 1., 0)
+    data.reset()
+    M = V.mass(lumped_mass=lumped_mass)
+
+    # the constrained dofs are fixed, only the free dofs vibrate
+    bcs = V.dirichlet_set(node_bcs)
+    Af, _ = bcs.reduce(A, u)
+    Mf, _ = bcs.reduce(M, u)
+    num_free = Af.shape[0]
+    if num_modes < 1 or num_modes > num_free:
+        raise AFEPYError("number of modes must be between 1 and the number "
+                         "of free dofs ({0})".format(num_free))
+
+    if sigma is None:
+        # K may be singular (rigid body modes), shift below zero
+        scale = np.mean(Af.diagonal() / Mf.diagonal())
+        sigma = -1.E-6 * scale
+
+    with profiler.phase("eigensolve"):
+        lam, phi = eigenmodes(Af, Mf, num_modes, sigma)
+
+    modes = np.zeros((num_modes, V.num_dof))
+    modes[:, bcs.free] = phi.T
+    omega = sqrt(np.maximum(lam, 0.))
+    freq = omega / (2. * pi)
+
+    logger.write(HEAD)
+    for (k, mode) in enumerate(modes):
+        logger.info(ITER_FMT.format(k+1, lam[k], omega[k], freq[k]))
+
+        # Updating stress and strains of the mode is a post process
+        du = mode - data.u
+        V.update_kinematics(data, du, 1.)
+        V.update_material(data, du, float(k), 1., k+1)
+        data.time = float(k + 1)
+        data += du
+
+    V.close()
+    profiler.report("ModeShapes")
+    logger.write("Simulation completed successfully\n")
+    logger.write("=" * 78)
+
+    return freq, modes
+
+def eigenmodes(A, M, num_modes, sigma):
+    """The num_modes eigenpairs of A phi = lambda M phi with eigenvalues
+    nearest sigma, in order of increasing eigenvalue.  The eigenvectors are
+    M-orthonormal"""
+    n = A.shape[0]
+    if eigsh is not None and num_modes < n - 1:
+        lam, phi = eigsh(A, k=num_modes, M=M, sigma=sigma, which="LM")
+    else:
+        # too few dofs for Lanczos iteration, solve the dense problem
+        if issparse(A):
+            A, M = A.toarray(), M.toarray()
+        if eigsh is not None:
+            lam, phi = eigh(A, M)
+        else:
+            # reduce to a standard eigenvalue problem, M = L L^T
+            Linv = la.inv(la.cholesky(M))
+            lam, y = la.eigh(np.dot(np.dot(Linv, A), Linv.T))
+            phi = np.dot(Linv.T, y)
+        nearest = np.argsort(np.abs(lam - sigma), kind="mergesort")
+        lam, phi = lam[nearest[:num_modes]], phi[:, nearest[:num_modes]]
+
+    order = np.argsort(lam, kind="mergesort")
+    return lam[order], phi[:, order]
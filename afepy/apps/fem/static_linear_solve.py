@@ -1,10 +1,12 @@
 from numpy import dot, zeros, zeros_like, ones
 from numpy.linalg import lstsq
 
-from tools.lapackjac import linsolve
+from tools.lapackjac import make_solver
 from tools.errors import AFEPYError
 from tools.logger import ConsoleLogger as logger
+from tools.profiler import profiler
 from core.source_term import SourceTerm
+from core.runtime import opts
 
 HEAD = """\
  Step  Frame  Iteration   Load   Time   Time  Correction  Residual  Tolerance
@@ -28,6 +30,7 @@ def StaticLinearSolve(V, data, node_bcs, tractions=None, F=None, period=1.):
     u is the unkown nodal displacement vector
 
     """
+    profiler.reset()
     logger.write_intro("Static, direct", 1, None, None, None,
                        0., period, V.num_dim, V.num_elem, V.num_node)
     kstep = 1
@@ -49,12 +52,17 @@ def StaticLinearSolve(V, data, node_bcs, tractions=None, F=None, period=1.):
     # Compute global force
     q += V.force(tractions)
 
-    # Enforce displacement boundary conditions
-    B = A.copy()
-    V.apply_bcs(data, node_bcs, A, q, u)
-
-    # --- Solve for the nodal displacement
-    u = linsolve(A, q)
+    # Enforce displacement boundary conditions and solve for the nodal
+    # displacement
+    # the reduced system is renumbered by reduce_bcs
+    perm = None if opts.reduce_bcs else V.dof_order
+    solver = make_solver(block_size=V.num_dof_per_node, perm=perm)
+    if opts.reduce_bcs:
+        Af, qf, expand = V.reduce_bcs(data, node_bcs, A, q, u)
+        u = expand(solver(Af, qf))
+    else:
+        V.apply_bcs(data, node_bcs, A, q, u)
+        u = solver(A, q)
 
     message = ITER_FMT.format(1, 1, data.time, period, "-")
     logger.info(message)
@@ -66,6 +74,9 @@ def StaticLinearSolve(V, data, node_bcs, tractions=None, F=None, period=1.):
     data.time += period
     data += u
 
+    logger.write(solver.summary())
+    V.close()
+    profiler.report("StaticLinearSolve")
     logger.write("Simulation completed successfully\n")
     logger.write("=" * 78)
 
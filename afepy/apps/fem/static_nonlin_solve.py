@@ -5,8 +5,10 @@ from numpy.linalg import lstsq
 
 from core.func import Function
 from tools.errors import AFEPYError
-from tools.lapackjac import linsolve
+from tools.lapackjac import make_solver
+from core.runtime import opts
 from tools.logger import ConsoleLogger as logger
+from tools.profiler import profiler
 
 
 HEAD = """\
@@ -16,11 +18,16 @@ ITER_FMT = ("{0:=4}  {8:=4}     {1:=4}       {2:.2f}    {3:.2f}  {4:.2f}   "
             "{5:.2E}   {6:.2E}   {7:.2E}")
 
 def StaticNonlinearSolve(V, data, node_bcs, tractions=None, F=None, period=1.,
-                         increments=5, maxiters=10, tolerance=1.E-4, relax=1.):
+                         increments=5, maxiters=10, tolerance=1.E-4, relax=1.,
+                         modified_newton=False):
     """Assemble and solve the system of equations
 
     Parameters
     ----------
+    modified_newton : bool
+        If True, the stiffness is assembled and factored only on the first
+        iteration of each frame and the factorization is reused for the
+        remaining iterations of the frame
 
     Notes
     -----
@@ -35,6 +42,7 @@ def StaticNonlinearSolve(V, data, node_bcs, tractions=None, F=None, period=1.,
     u is the unkown nodal displacement vector
 
     """
+    profiler.reset()
 
     # Allocate storage
     u = data.Zeros()
@@ -42,11 +50,18 @@ def StaticNonlinearSolve(V, data, node_bcs, tractions=None, F=None, period=1.,
         F = data.Zeros()
 
     dtime = period / float(increments)
+    # the reduced system is renumbered by reduce_bcs
+    perm = None if opts.reduce_bcs else V.dof_order
+    solver = make_solver(block_size=V.num_dof_per_node, perm=perm)
 
     logger.write_intro("Static, nonlinear", increments, tolerance,
                        maxiters, relax, 0., period, V.num_dim, V.num_elem,
                        V.num_node)
     logger.info(HEAD)
+
+    # Compute global force, it is scaled by the load factor of each frame
+    q = V.force(tractions) + F
+
     istep = 1
     for iframe in range(increments):
         kframe = iframe + 1
@@ -57,20 +72,32 @@ def StaticNonlinearSolve(V, data, node_bcs, tractions=None, F=None, period=1.,
         # Newton-Raphson loop
         for nit in range(maxiters):
 
-            # Update element states
+            # Update element states, starting from the converged state of
+            # the last frame
+            for bd in data.blk_data:
+                bd.reset()
             V.update_kinematics(data, u, dtime)
-            A = V.stiffness(data, u, data.time, dtime, kframe)
+            refactor = nit == 0 or not modified_newton
+            if refactor:
+                A = V.stiffness(data, u, data.time, dtime, kframe)
+            else:
+                V.update_material(data, u, data.time, dtime, kframe)
             R = V.residual(data, u)
-            q = V.force(tractions) + F
-
-            # Compute global force
             rhs = load_fac * q - R
 
-            # Enforce displacement boundary conditions
-            V.apply_bcs(data, node_bcs, A, rhs, u, fac=load_fac)
-
-            # --- Solve for the nodal displacement
-            du = linsolve(A, rhs)
+            # Enforce displacement boundary conditions and solve for the
+            # nodal displacement
+            if opts.reduce_bcs:
+                Af, rhs_f, expand = V.reduce_bcs(data, node_bcs, A, rhs, u,
+                                                 fac=load_fac)
+                if refactor:
+                    solver.factor(Af)
+                du = expand(solver.solve(rhs_f))
+            else:
+                V.apply_bcs(data, node_bcs, A, rhs, u, fac=load_fac)
+                if refactor:
+                    solver.factor(A)
+                du = solver.solve(rhs)
 
             # --- update displacement increment
             u += relax * du
@@ -98,6 +125,9 @@ def StaticNonlinearSolve(V, data, node_bcs, tractions=None, F=None, period=1.,
         data.time += dtime
         data += u
 
+    logger.write(solver.summary())
+    V.close()
+    profiler.report("StaticNonlinearSolve")
     logger.write("Simulation completed successfully\n")
     logger.write("=" * 78)
     return
@@ -1,7 +1,9 @@
+import numpy as np
 from numpy import float64, array
 from tools.misc import dof_id
 from tools.errors import AFEPYError
-from bc import BoundaryCondition
+from tools.numeric import issparse
+from bc import BoundaryCondition, bcsum
 
 class DirichletBC(BoundaryCondition):
     def __init__(self, V=None, mag=None, dofs=None, nodes=None,
@@ -49,6 +51,11 @@ class DirichletBC(BoundaryCondition):
     def __iter__(self):
         return iter(self.data)
 
+    def key(self):
+        """The constrained dofs and their magnitudes, so that results
+        computed from them can be cached"""
+        return array(self.data, dtype=float64).tostring()
+
     def __iadd__(self, other):
         self.data.extend(other.data)
         return self
@@ -56,3 +63,80 @@ class DirichletBC(BoundaryCondition):
     def __add__(self, other):
         self.data.extend(other.data)
         return self
+
+class DirichletBCSet(object):
+    """Constrained and free dof index arrays of a collection of DirichletBC
+
+    The index arrays are computed once so that boundary conditions can be
+    applied to dense and sparse systems without looping over the constrained
+    dofs. If a dof is constrained more than once, the last constraint wins.
+
+    """
+    def __init__(self, V, bcs):
+        rows, mag = [], []
+        for (node_id, dof, m) in bcsum(bcs):
+            if dof >= V.num_dof_per_node:
+                raise AFEPYError("incorrect dof")
+            rows.append(int(V.num_dof_per_node * node_id + dof))
+            mag.append(m)
+        rows = np.array(rows, dtype=int)
+        mag = np.array(mag, dtype=float64)
+        self.rows, i = np.unique(rows[::-1], return_index=True)
+        self.mag = mag[::-1][i]
+        self.num_dof = V.num_dof
+        self.fixed = np.zeros(self.num_dof, dtype=bool)
+        self.fixed[self.rows] = True
+        self.free = np.where(~self.fixed)[0]
+        if V.dof_order is not None:
+            # the free dofs in the renumbered order, so that the reduced
+            # system is also renumbered
+            self.free = V.dof_order[~self.fixed[V.dof_order]]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def ufac(self, data, du, fac=1.):
+        """Increment in the constrained dofs needed to satisfy the constraint
+        at load factor fac"""
+        return fac * self.mag - (data[self.rows] + du[self.rows])
+
+    def lift(self, A, b, ufac):
+        """Move the known constrained values to the right hand side"""
+        g = np.zeros(self.num_dof)
+        g[self.rows] = ufac
+        b -= A.dot(g)
+        b[self.rows] = ufac
+
+    def constrain(self, X):
+        """Zero the constrained rows and columns of X and put ones on the
+        diagonal. The sparsity structure of sparse matrices is unchanged"""
+        if X is None or not len(self.rows):
+            return
+        if not issparse(X):
+            X[self.rows, :] = 0.
+            X[:, self.rows] = 0.
+            X[self.rows, self.rows] = 1.
+            return
+        r = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+        c = X.indices
+        X.data[self.fixed[r] | self.fixed[c]] = 0.
+        diag = (r == c) & self.fixed[c]
+        if np.count_nonzero(diag) == len(self.rows):
+            X.data[diag] = 1.
+        else:
+            X[self.rows, self.rows] = 1.
+
+    def reduce(self, A, b):
+        """The free dof subsystem of A and b"""
+        if issparse(A):
+            Af = A.tocsr()[self.free][:, self.free]
+        else:
+            Af = A[np.ix_(self.free, self.free)]
+        return Af, np.asarray(b)[self.free]
+
+    def expand(self, xf, ufac):
+        """The full solution vector from the free dof solution xf"""
+        x = np.zeros(self.num_dof)
+        x[self.free] = xf
+        x[self.rows] = ufac
+        return x
@@ -2,8 +2,14 @@ import numpy as np
 from collections import OrderedDict
 from tools.logger import ConsoleLogger as logger
 from tools.errors import AFEPYError
+from tools.numeric import SparsePattern, csr_matrix, issparse
+from tools.ordering import node_ordering, dof_ordering, bandwidth, profile
+from tools.profiler import timed
 from source_term import SourceTerm
+from runtime import opts
 from bc import bcsum
+from dirichlet import DirichletBCSet
+from parallel import ParallelAssembler
 np.set_printoptions(2)
 
 class ElementBlock(OrderedDict):
@@ -11,7 +17,7 @@ class ElementBlock(OrderedDict):
 
 class FiniteElementSpace(object):
 
-    def __init__(self, mesh, dict):
+    def __init__(self, mesh, dict, sparse=None, nprocs=None, renumber=None):
 
         if not mesh.blocks:
             # look for speciall block 'All' in dict
@@ -83,6 +89,24 @@ class FiniteElementSpace(object):
         self.X = self.mesh.coords
         self.dofs = np.arange(self.num_dof).reshape(self.mesh.num_node, -1)
 
+        # sparse (CSR) assembly of global matrices
+        self.sparse = opts.sparse if sparse is None else bool(sparse)
+        if self.sparse and csr_matrix is None:
+            raise AFEPYError("sparse assembly requires scipy")
+        self._pattern = None
+        # the last DirichletBCSet and load vector, with the values of the
+        # boundary conditions they were computed from
+        self._bc_set = (None, None)
+        self._force = (None, None)
+
+        # renumbering of the dofs for the linear solvers
+        self.renumber = opts.renumber if renumber is None else renumber
+        self._dof_order = None
+
+        # number of processes used to evaluate the element kernels
+        self.nprocs = opts.nprocs if nprocs is None else opts.num_procs(nprocs)
+        self._assembler = None
+
     def __getattr__(self, key):
         """Return attribute to FiniteElementSpace instance. If it doesn't
         exist in self.__dict__, look for it in this instances mesh
@@ -97,47 +121,134 @@ class FiniteElementSpace(object):
                 raise AttributeError("'FiniteElementSpace' object has no "
                                      "attribute {0}".format(repr(key)))
 
-    def update_kinematics(self, data, u, dtime=1.):
-        """Update kinematic quantities to end of step
-
-        """
-        # loop over each block and update dstrain, strain at each integration
-        # point at each element
-        for (iblk, elems_this_blk) in enumerate(self.elems_per_block):
+    def block_dofs(self, iblk, start=0, stop=None):
+        """Global dofs of each element in block iblk, optionally only of the
+        elements start:stop of the block
 
-            for (iel, e) in enumerate(self.elements[elems_this_blk]):
+        Returns
+        -------
+        dofs : ndarray (num_elem_in_blk, num_node_per_elem * num_dof_per_node)
 
-                # displacement of element
-                u_e = np.zeros_like(self.X[e.elem_nodes])
+        """
+        eb = self.blocks[iblk]
+        elem_ids = eb.elem_ids[start:stop]
+        nodes = self.connect[elem_ids, :eb.num_node_per_elem]
+        return self.dofs[nodes].reshape(len(elem_ids), -1)
 
-                for a in range(e.num_node):
-                    row = e.num_dof_per_node * self.connect[e.elem_id, a]
-                    rows = [row + i for i in range(e.num_dof_per_node)]
-                    u_e[a, :] = u[rows]
-                X = self.X[e.elem_nodes]
-                x = X + u_e
+    def block_coords(self, iblk, u, start=0, stop=None):
+        """Reference coordinates and displacements of each element in block
+        iblk, optionally only of the elements start:stop of the block
 
-                # compute integration point data
-                shg = e.grad(X)
-                det = e.jacobian(X)
-                w = e.integration.weights
-                shgbar = e.mean_shg(w, det, shg)
+        Returns
+        -------
+        X : ndarray (num_elem_in_blk, num_node_per_elem, num_dim)
+        u_e : ndarray (num_elem_in_blk, num_node_per_elem, num_dof_per_node)
 
-                for (npt, xi) in enumerate(e.integration.points):
+        """
+        eb = self.blocks[iblk]
+        nodes = self.connect[eb.elem_ids[start:stop], :eb.num_node_per_elem]
+        u_e = np.asarray(u)[self.dofs[nodes]]
+        return self.X[nodes], u_e
+
+    def scatter(self, A, elem_dofs, values):
+        """Add element matrices values[e] to the dense matrix A at rows and
+        columns elem_dofs[e]"""
+        n = A.shape[0]
+        m = elem_dofs.shape[1]
+        rows = np.repeat(elem_dofs, m, axis=1).ravel()
+        cols = np.tile(elem_dofs, (1, m)).ravel()
+        # sum the values of repeated entries and add them in place, a dense
+        # n*n temporary would double the memory of the assembly
+        index, inverse = np.unique(rows * n + cols, return_inverse=True)
+        A.flat[index] += np.bincount(inverse, weights=values.ravel())
+
+    @property
+    def pattern(self):
+        """Sparsity pattern of the global matrices, computed on first use and
+        reused by every later assembly"""
+        if self._pattern is None:
+            elem_dofs = [self.block_dofs(i) for i in range(len(self.blocks))]
+            self._pattern = SparsePattern(self.num_dof, elem_dofs)
+        return self._pattern
+
+    @property
+    def dof_order(self):
+        """Bandwidth reducing renumbering of the dofs, or None if the dofs are
+        not renumbered.  dof_order[i] is the (original) dof numbered i in the
+        systems of equations given to the linear solvers.
+
+        Assembly and output are always in the original numbering, the
+        linear solvers permute the system and its solution.
 
-                    # Assemble B matrix.
-                    B = e.b_matrix(shg[npt], shgbar)
+        """
+        if not self.renumber:
+            return None
+        if self._dof_order is None:
+            indptr, indices = self.mesh.node_graph
+            perm = node_ordering(indptr, indices, self.renumber)
+            nb = self.num_dof_per_node
+            bw = (bandwidth(indptr, indices, block_size=nb),
+                  bandwidth(indptr, indices, perm, block_size=nb))
+            pr = (profile(indptr, indices, block_size=nb),
+                  profile(indptr, indices, perm, block_size=nb))
+            logger.info("dof renumbering ({0}): bandwidth {1} -> {2}, "
+                        "profile {3} -> {4}".format(self.renumber, bw[0], bw[1],
+                                                    pr[0], pr[1]))
+            if self.renumber == "rcm" and pr[1] >= pr[0]:
+                # eg, structured grids are already well ordered
+                logger.info("dof renumbering does not reduce the profile, "
+                            "keeping the original numbering")
+                self.renumber = None
+                return None
+            self._dof_order = dof_ordering(perm, nb)
+        return self._dof_order
+
+    def assembler(self, data):
+        """The pool of worker processes used to evaluate the element kernels
+        with data, or None if the kernels are evaluated serially"""
+        if self.nprocs < 2 or not getattr(data, "shared", False):
+            return None
+        if self._assembler is None or self._assembler.data is not data:
+            if self._assembler is not None:
+                self._assembler.close()
+            self._assembler = ParallelAssembler(self, data, self.nprocs)
+        return self._assembler
+
+    def close(self):
+        """Terminate the worker processes of the parallel assembler.  A new
+        pool is started if the element kernels are evaluated again"""
+        if self._assembler is not None:
+            self._assembler.close()
+            self._assembler = None
+
+    def evaluate(self, kernel, data, u, *params):
+        """Evaluate the element kernel on every element of every block, in
+        parallel if possible
 
-                    # strain increment
-                    de = np.dot(B, u_e.flatten())
-                    data.blk_data[iblk][1, iel, npt].dstrain[:] = de
+        Returns
+        -------
+        out : list of ndarray
+            The element arrays of each block for the stiffness and residual
+            kernels, otherwise None
 
-                    # strain
-                    eps = data.blk_data[iblk][0, iel, npt].strain[:] + de
-                    data.blk_data[iblk][1, iel, npt].strain[:] = eps
+        """
+        assembler = self.assembler(data)
+        if assembler is not None:
+            return assembler.run(kernel, u, *params)
+        func = getattr(self, "_" + kernel)
+        out = [func(data, iblk, u, 0, len(eb.elem_ids), *params)
+               for (iblk, eb) in enumerate(self.blocks)]
+        if kernel in ("stiffness", "residual"):
+            return out
+
+    @timed("kinematics")
+    def update_kinematics(self, data, u, dtime=1.):
+        """Update kinematic quantities to end of step
 
-        return
+        """
+        self.evaluate("kinematics", data, u)
 
+    @timed("material")
     def update_material(self, data, u, time=0., dtime=1., kstep=0):
         """Loop through elements in this block, update state, and add the
         element contribution to the global stiffness and, optionally, the
@@ -150,23 +261,9 @@ class FiniteElementSpace(object):
         -------
 
         """
-        for (iblk, elems_this_blk) in enumerate(self.elems_per_block):
-            for (iel, e) in enumerate(self.elements[elems_this_blk]):
-                X = self.X[e.elem_nodes, :]
-                u_e = np.zeros((e.num_node, e.num_dof_per_node))
-                for a in range(e.num_node):
-                    row = e.num_dof_per_node * self.connect[e.elem_id, a]
-                    rows = [row + i for i in range(e.num_dof_per_node)]
-                    u_e[a, :e.num_dof_per_node] = u[rows]
-                x = X + u_e
-                fdata = data.blk_data[iblk][1, iel]
-                for (npt, xi) in enumerate(e.integration.points):
-                    # call the material model at this integraton point
-                    e.update_material(fdata[npt], time, dtime, x,
-                                      npt, kstep)
-
-        return
+        self.evaluate("material", data, u, time, dtime, kstep)
 
+    @timed("stiffness")
     def stiffness(self, data, u=None, time=0., dtime=1., kstep=0):
         """Loop through elements in this block, update state, and add the
         element contribution to the global stiffness and, optionally, the
@@ -182,33 +279,16 @@ class FiniteElementSpace(object):
         if u is None:
             u = np.zeros(self.num_dof)
 
-        # zero stiffness
-        A = np.zeros((self.num_dof, self.num_dof))
-
-        for (iblk, elems_this_blk) in enumerate(self.elems_per_block):
-
-            # Update the model state and add contributions to global stiffness
-            for (iel, e) in enumerate(self.elements[elems_this_blk]):
-
-                # current coordinates of element
-                X = self.X[e.elem_nodes, :]
-                u_e = np.zeros((e.num_node, e.num_dof_per_node))
-                for a in range(e.num_node):
-                    row = e.num_dof_per_node * self.connect[e.elem_id, a]
-                    rows = [row + i for i in range(e.num_dof_per_node)]
-                    u_e[a, :e.num_dof_per_node] = u[rows]
-
-                # Allocate storage for this element's stiffness
-                fdata = data.blk_data[iblk][1, iel]
-                stiff = e.integrate2(fdata, time, dtime, X, u_e, kstep)
-
-                # Assemble global stiffness
-                # Scatter operation.
-                elem_dofs = self.dofs[e.elem_nodes].flatten()
-                A[np.ix_(elem_dofs, elem_dofs)] += stiff
+        K = self.evaluate("stiffness", data, u, time, dtime, kstep)
+        if self.sparse:
+            return self.pattern.assemble(K)
 
+        A = np.zeros((self.num_dof, self.num_dof))
+        for (iblk, stiff) in enumerate(K):
+            self.scatter(A, self.block_dofs(iblk), stiff)
         return A
 
+    @timed("residual")
     def residual(self, data, u):
         """Loop through elements in this block, update state, and add the
         element contribution to the global stiffness and, optionally, the
@@ -223,53 +303,193 @@ class FiniteElementSpace(object):
 
         """
         R = SourceTerm(self)
-        for (iblk, elems_this_blk) in enumerate(self.elems_per_block):
+        for (iblk, resid) in enumerate(self.evaluate("residual", data, u)):
+            elem_dofs = self.block_dofs(iblk)
+            R += np.bincount(elem_dofs.ravel(), weights=resid.ravel(),
+                             minlength=self.num_dof)
+        return R
 
-            # Update the model state and add contributions to global stiffness
-            for (iel, e) in enumerate(self.elements[elems_this_blk]):
+    def _kinematics(self, data, iblk, u, start, stop):
+        """Update dstrain, strain at each integration point of elements
+        start:stop of block iblk"""
+        elements = self.elements[self.elems_per_block[iblk][start:stop]]
+        bd = data.blk_data[iblk]
+        if elements[0].batch:
+            X, u_e = self.block_coords(iblk, u, start, stop)
+            de = elements[0].strain_increment_batch(X, u_e)
+            bd[1, start:stop].dstrain[:] = de
+            bd[1, start:stop].strain[:] = bd[0, start:stop].strain + de
+            return
+
+        for (iel, e) in enumerate(elements, start):
+
+            # displacement of element
+            u_e = np.zeros_like(self.X[e.elem_nodes])
+
+            for a in range(e.num_node):
+                row = e.num_dof_per_node * self.connect[e.elem_id, a]
+                rows = [row + i for i in range(e.num_dof_per_node)]
+                u_e[a, :] = u[rows]
+            X = self.X[e.elem_nodes]
+
+            # compute integration point data
+            shg = e.grad(X)
+            det = e.jacobian(X)
+            w = e.integration.weights
+            shgbar = e.mean_shg(w, det, shg)
+
+            for (npt, xi) in enumerate(e.integration.points):
+
+                # Assemble B matrix.
+                B = e.b_matrix(shg[npt], shgbar)
+
+                # strain increment
+                de = np.dot(B, u_e.flatten())
+                bd[1, iel, npt].dstrain[:] = de
+
+                # strain
+                bd[1, iel, npt].strain[:] = bd[0, iel, npt].strain[:] + de
+
+    def _material(self, data, iblk, u, start, stop, time, dtime, kstep):
+        """Update the material state at each integration point of elements
+        start:stop of block iblk"""
+        elements = self.elements[self.elems_per_block[iblk][start:stop]]
+
+        # Homogeneous blocks: one call to the material model for all points
+        if elements[0].batch and elements[0].material.batch:
+            fdata = data.blk_data[iblk][1, start:stop]
+            elements[0].update_material_batch(fdata, time, dtime, kstep)
+            return
+
+        for (iel, e) in enumerate(elements, start):
+            X = self.X[e.elem_nodes, :]
+            u_e = np.zeros((e.num_node, e.num_dof_per_node))
+            for a in range(e.num_node):
+                row = e.num_dof_per_node * self.connect[e.elem_id, a]
+                rows = [row + i for i in range(e.num_dof_per_node)]
+                u_e[a, :e.num_dof_per_node] = u[rows]
+            x = X + u_e
+            fdata = data.blk_data[iblk][1, iel]
+            for (npt, xi) in enumerate(e.integration.points):
+                # call the material model at this integraton point
+                e.update_material(fdata[npt], time, dtime, x, npt, kstep)
+
+    def _stiffness(self, data, iblk, u, start, stop, time, dtime, kstep):
+        """Update the state and compute the stiffness of elements start:stop
+        of block iblk
 
-                # current coordinates of element
-                X = self.X[e.elem_nodes, :]
-                u_e = np.zeros((e.num_node, e.num_dof_per_node))
-                for a in range(e.num_node):
-                    row = e.num_dof_per_node * self.connect[e.elem_id, a]
-                    rows = [row + i for i in range(e.num_dof_per_node)]
-                    u_e[a, :e.num_dof_per_node] = u[rows]
+        Returns
+        -------
+        stiff : ndarray (stop - start, ndof, ndof)
 
-                fdata = data.blk_data[iblk][1, iel]
-                resid = e.integrate(fdata, X, u_e)
+        """
+        elements = self.elements[self.elems_per_block[iblk][start:stop]]
 
-                # Assemble global stiffness
-                # Scatter operation.
-                elem_dofs = self.dofs[e.elem_nodes].flatten()
-                R[elem_dofs] += resid
+        # Homogeneous blocks: integrate all elements at once
+        if elements[0].batch:
+            X, u_e = self.block_coords(iblk, u, start, stop)
+            fdata = data.blk_data[iblk][1, start:stop]
+            return elements[0].integrate2_batch(elements, fdata, time, dtime,
+                                                X, u_e, kstep)
 
-        return R
+        stiff = []
+        for (iel, e) in enumerate(elements, start):
+
+            # current coordinates of element
+            X = self.X[e.elem_nodes, :]
+            u_e = np.zeros((e.num_node, e.num_dof_per_node))
+            for a in range(e.num_node):
+                row = e.num_dof_per_node * self.connect[e.elem_id, a]
+                rows = [row + i for i in range(e.num_dof_per_node)]
+                u_e[a, :e.num_dof_per_node] = u[rows]
+
+            fdata = data.blk_data[iblk][1, iel]
+            stiff.append(e.integrate2(fdata, time, dtime, X, u_e, kstep))
 
+        return np.array(stiff)
+
+    def _residual(self, data, iblk, u, start, stop):
+        """Internal force of elements start:stop of block iblk
+
+        Returns
+        -------
+        resid : ndarray (stop - start, ndof)
+
+        """
+        elements = self.elements[self.elems_per_block[iblk][start:stop]]
+        if elements[0].batch:
+            X, u_e = self.block_coords(iblk, u, start, stop)
+            fdata = data.blk_data[iblk][1, start:stop]
+            return elements[0].integrate_batch(fdata, X, u_e)
+
+        resid = []
+        for (iel, e) in enumerate(elements, start):
+
+            # current coordinates of element
+            X = self.X[e.elem_nodes, :]
+            u_e = np.zeros((e.num_node, e.num_dof_per_node))
+            for a in range(e.num_node):
+                row = e.num_dof_per_node * self.connect[e.elem_id, a]
+                rows = [row + i for i in range(e.num_dof_per_node)]
+                u_e[a, :e.num_dof_per_node] = u[rows]
+
+            fdata = data.blk_data[iblk][1, iel]
+            resid.append(e.integrate(fdata, X, u_e))
+
+        return np.array(resid)
+
+    @timed("force")
     def force(self, neumann_bcs):
-        Q = SourceTerm(self)
+        """The global load vector of the tractions neumann_bcs
+
+        Faces are integrated in groups of faces of the same element type.
+        The load vector is cached so that it is only integrated again when
+        the tractions change
+
+        """
+        neumann_bcs = list(neumann_bcs or [])
+        key = tuple(bc.key() for bc in neumann_bcs)
+        if self._force[0] == key:
+            return self._force[1].copy()
+
         logger.debug("applying traction boundary conditions...", end=" ")
+        groups = {}
         for (elem_id, face, components) in bcsum(neumann_bcs):
             elem = self.elements[elem_id]
-            face_nodes = elem.face_nodes(face)
-            x = [elem.elem_nodes[face_node] for face_node in face_nodes]
-            face_dofs = self.dofs[x].flatten()
+            nodes = [elem.elem_nodes[n] for n in elem.face_nodes(face)]
+            group = groups.setdefault((type(elem), len(nodes)), (elem, [], []))
+            group[1].append(nodes)
+            group[2].append(components)
 
-            # Coordinates of the nodes on the appropriate element face
-            coord_face = np.zeros((elem.num_face_nodes, self.num_dof_per_node))
-            for a in range(elem.num_face_nodes):
-                # global node number
-                node_num = elem.elem_nodes[face_nodes[a]]
-                coord_face[a, :] = self.X[node_num, :]
-
-            elem_trac = elem.integrate_bndry(coord_face, components)
+        Q = SourceTerm(self)
+        for (elem, nodes, components) in groups.values():
+            nodes = np.array(nodes, dtype=np.int)
+            X = self.X[nodes][:, :, :self.num_dof_per_node]
+            elem_trac = elem.integrate_bndry_batch(X, np.array(components))
+            face_dofs = self.dofs[nodes].reshape(len(nodes), -1)
 
             # Put in to the global load vector
-            Q[face_dofs] += elem_trac
+            np.add.at(Q, face_dofs.ravel(), elem_trac.ravel())
 
         logger.debug("done")
-        return Q
-
+        self._force = (key, Q)
+        return Q.copy()
+
+    def dirichlet_set(self, disp_bcs):
+        """The DirichletBCSet of the displacement boundary conditions.  Sets
+        are cached so that the constrained dofs are only found again when
+        the boundary conditions change"""
+        if isinstance(disp_bcs, DirichletBCSet):
+            return disp_bcs
+        disp_bcs = list(disp_bcs or [])
+        key = tuple(bc.key() for bc in disp_bcs)
+        if self._bc_set[0] == key:
+            return self._bc_set[1]
+        bcs = DirichletBCSet(self, disp_bcs)
+        self._bc_set = (key, bcs)
+        return bcs
+
+    @timed("bcs")
     def apply_bcs(self, data, disp_bcs, A, b, du=None, M=None, fac=1.):
 
         logger.debug("applying displacement boundary conditions...", end=" ")
@@ -277,55 +497,84 @@ class FiniteElementSpace(object):
         if du is None:
             du = np.zeros(self.num_dof)
 
-        for (node_id, dof, mag) in bcsum(disp_bcs):
-
-            # Modify rows and columns of K
-            if dof > self.num_dof_per_node:
-                raise AFEPYError("incorrect dof")
-
-            row = int(self.num_dof_per_node * node_id + dof)
-
-            # current value of displacement
-            u_cur = data[row] + du[row]
-            ufac = fac * mag - u_cur
-
-            # Modify the RHS
-            b -= [A[i, row] * ufac for i in range(self.num_dof)]
+        bcs = self.dirichlet_set(disp_bcs)
+        if len(bcs):
+            ufac = bcs.ufac(data, du, fac)
+            bcs.lift(A, b, ufac)
+            bcs.constrain(A)
+            bcs.constrain(M)
 
-            #  modify stiffness
-            A[row, :] = 0.
-            A[:, row] = 0.
-            A[row, row] = 1.
+        logger.debug("done")
+        return
 
-            if M is not None:
-                M[row, :] = 0.
-                M[:, row] = 0.
-                M[row, row] = 1.
+    @timed("bcs")
+    def reduce_bcs(self, data, disp_bcs, A, b, du=None, fac=1.):
+        """Eliminate the constrained dofs from the system of equations
 
-            b[row] = ufac
+        Returns
+        -------
+        Af : ndarray or sparse matrix
+            The free dof subsystem
+        bf : ndarray
+            The free dof right hand side
+        expand : callable
+            expand(xf) returns the full solution from the solution of the
+            free dof system
+
+        Notes
+        -----
+        As in apply_bcs, b is modified in place. A is left unchanged.
 
-        logger.debug("done")
-        return
+        """
+        if du is None:
+            du = np.zeros(self.num_dof)
+        bcs = self.dirichlet_set(disp_bcs)
+        ufac = bcs.ufac(data, du, fac)
+        bcs.lift(A, b, ufac)
+        Af, bf = bcs.reduce(A, b)
+        return Af, bf, lambda xf: bcs.expand(xf, ufac)
 
+    @timed("mass")
     def mass(self, lumped_mass=0):
-        M = np.zeros((self.num_dof, self.num_dof))
-        for (iblk, elems_this_blk) in enumerate(self.elems_per_block):
+        """The global mass matrix
 
-            # Update the model state and add contributions to global stiffness
-            for (iel, e) in enumerate(self.elements[elems_this_blk]):
+        Elements are integrated a block at a time, with the density of the
+        first element of the block
 
-                # current coordinates of element
-                X = self.X[e.elem_nodes, :]
+        """
+        if self.sparse:
+            M = self.pattern.zeros()
+        else:
+            M = np.zeros((self.num_dof, self.num_dof))
+        for (iblk, eb) in enumerate(self.blocks):
+            nodes = self.connect[eb.elem_ids, :eb.num_node_per_elem]
+            e = self.elements[eb.elem_ids[0]]
+            mel = e.mass_batch(self.X[nodes], lumped_mass=lumped_mass)
+            if self.sparse:
+                M[iblk][:] = mel
+            else:
+                self.scatter(M, self.block_dofs(iblk), mel)
+
+        if self.sparse:
+            return self.pattern.assemble(M)
 
-                # Allocate storage for this element's stiffness
-                mel = e.mass(X, lumped_mass=lumped_mass)
+        return M
 
-                # Assemble global stiffness
-                # Scatter operation.
-                elem_dofs = self.dofs[e.elem_nodes].flatten()
-                M[np.ix_(elem_dofs, elem_dofs)] += mel
+    @timed("mass")
+    def lumped_mass(self):
+        """The row sum lumped mass, as the vector of its diagonal
 
-        return M
+        """
+        m = np.zeros(self.num_dof)
+        for (iblk, eb) in enumerate(self.blocks):
+            nodes = self.connect[eb.elem_ids, :eb.num_node_per_elem]
+            e = self.elements[eb.elem_ids[0]]
+            mel = e.lumped_mass_batch(self.X[nodes])
+            elem_dofs = self.dofs[nodes]
+            m += np.bincount(elem_dofs.ravel(),
+                             weights=np.repeat(mel.ravel(), elem_dofs.shape[2]),
+                             minlength=self.num_dof)
+        return m
 
     def get_node_ids(self, nodes, nodeset, region):
         return self.mesh.get_node_ids(nodes, nodeset, region)
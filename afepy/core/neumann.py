@@ -1,4 +1,4 @@
-from numpy import array
+from numpy import array, float64
 from tools.errors import AFEPYError
 from bc import BoundaryCondition
 
@@ -28,6 +28,12 @@ class NeumannBC(BoundaryCondition):
     def __iter__(self):
         return iter(self.data)
 
+    def key(self):
+        """The faces and tractions, so that results computed from them can
+        be cached"""
+        return (array([x[:2] for x in self.data], dtype=int).tostring(),
+                array([x[2] for x in self.data], dtype=float64).tostring())
+
     def __iadd__(self, other):
         self.data.extend(other.data)
         return self
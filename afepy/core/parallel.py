@@ -0,0 +1,108 @@
+"""Process parallel element assembly
+
+The elements of each block are partitioned in to contiguous ranges that are
+processed by a pool of forked worker processes. The mesh and elements are
+inherited by the workers when they are forked. Everything that changes
+between calls -- the integration point data, the displacement, and the
+element output arrays -- lives in shared memory so that only the task
+descriptions are pickled.
+
+Workers write the element contributions of their range to disjoint slices of
+the shared output arrays, which the parent then assembles in element order.
+The assembled result does not depend on the number of processes.
+
+"""
+import atexit
+import multiprocessing as mp
+import numpy as np
+from tools.errors import AFEPYError
+from tools.numeric import shared_zeros
+
+# assembler inherited by the forked workers
+_assembler = None
+
+def _work(args):
+    try:
+        _assembler.work(*args)
+    except SystemExit as e:
+        # AFEPYError raises SystemExit, which would kill the worker
+        raise RuntimeError(str(e))
+
+class ParallelAssembler(object):
+    """Pool of worker processes evaluating the element kernels of the
+    FiniteElementSpace V with the solution data
+
+    """
+    def __init__(self, V, data, nprocs):
+        global _assembler
+        self.V = V
+        self.data = data
+        self.nprocs = nprocs
+        self.u = shared_zeros(V.num_dof)
+        self.stiff = []
+        self.resid = []
+        self.tasks = []
+        for (iblk, eb) in enumerate(V.blocks):
+            num_elem = len(eb.elem_ids)
+            m = eb.num_node_per_elem * V.num_dof_per_node
+            self.stiff.append(shared_zeros((num_elem, m, m)))
+            self.resid.append(shared_zeros((num_elem, m)))
+            n = min(nprocs, num_elem)
+            bounds = np.linspace(0, num_elem, n + 1).astype(int)
+            self.tasks.extend([(iblk, int(a), int(b))
+                               for (a, b) in zip(bounds[:-1], bounds[1:])])
+        _assembler = self
+        self.pool = mp.Pool(nprocs)
+
+    def work(self, kernel, iblk, start, stop, params):
+        V = self.V
+        if kernel == "stiffness":
+            self.stiff[iblk][start:stop] = V._stiffness(
+                self.data, iblk, self.u, start, stop, *params)
+        elif kernel == "residual":
+            self.resid[iblk][start:stop] = V._residual(
+                self.data, iblk, self.u, start, stop, *params)
+        elif kernel == "kinematics":
+            V._kinematics(self.data, iblk, self.u, start, stop, *params)
+        elif kernel == "material":
+            V._material(self.data, iblk, self.u, start, stop, *params)
+        else:
+            raise ValueError("unknown kernel {0}".format(kernel))
+
+    def run(self, kernel, u, *params):
+        """Evaluate kernel on every element
+
+        Returns
+        -------
+        out : list of ndarray
+            The element arrays of each block for the stiffness and residual
+            kernels, otherwise None
+
+        """
+        self.u[:] = u
+        tasks = [(kernel, iblk, a, b, params) for (iblk, a, b) in self.tasks]
+        try:
+            self.pool.map(_work, tasks, chunksize=1)
+        except RuntimeError as e:
+            raise AFEPYError(str(e))
+        if kernel == "stiffness":
+            return self.stiff
+        if kernel == "residual":
+            return self.resid
+
+    def close(self):
+        global _assembler
+        if self.pool is None:
+            return
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+        if _assembler is self:
+            _assembler = None
+
+@atexit.register
+def _close():
+    # the workers of an assembler that was not closed, eg, when a solve
+    # failed, are terminated at exit
+    if _assembler is not None:
+        _assembler.close()
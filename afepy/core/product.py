@@ -14,3 +14,6 @@ if isfile(f):
     RCFILE = realpath(f)
 else:
     RCFILE = os.getenv("AFEPYRC") or expanduser("~/.{0}".format(f))
+
+# Cache of parsed mesh files, etc.
+CACHE_D = os.getenv("AFEPY_CACHE_DIR") or expanduser("~/.afepy/cache")
@@ -4,7 +4,7 @@
 import os
 import multiprocessing as mp
 from tools.configurer import cfgparse
-from core.product import SUPPRESS_USER_ENV
+from core.product import SUPPRESS_USER_ENV, CACHE_D
 
 class RuntimeOptions(object):
     def __init__(self):
@@ -24,6 +24,26 @@ class RuntimeOptions(object):
         self._nprocs = 1
         self.do_not_fork = False
 
+        self._sparse = False
+        self._reduce_bcs = False
+
+        # linear solver, see tools/lapackjac.py
+        self._solver = "direct"
+        self._precond = None
+        self.solver_tol = None
+        self.solver_maxiter = None
+
+        # renumbering of the dofs of the linear systems, see tools/ordering.py
+        self._renumber = None
+
+        # cache of parsed mesh files, see mesh/cache.py
+        self._mesh_cache = True
+        self.cache_dir = CACHE_D
+
+        # timing of the phases of the solvers, see tools/profiler.py
+        self._profile = False
+        self.profile_file = None
+
         self.viz_on_completion = False
         self._switch = []
         self.rebuild_mat_lib = False
@@ -37,7 +57,18 @@ class RuntimeOptions(object):
             self.debug = cfgparse("debug", default=self._debug)
             self.switch = cfgparse("switch", default=self._switch)
             self.nprocs = cfgparse("nprocs", default=self._nprocs)
+            self.sparse = cfgparse("sparse", default=self._sparse)
+            self.reduce_bcs = cfgparse("reduce_bcs", default=self._reduce_bcs)
+            self.solver = cfgparse("solver", default=self._solver)
+            self.precond = cfgparse("precond", default=self._precond)
+            self.solver_tol = cfgparse("solver_tol", default=self.solver_tol)
+            self.renumber = cfgparse("renumber", default=self._renumber)
             self.verbosity = cfgparse("verbosity", default=self._v)
+            self.mesh_cache = cfgparse("mesh_cache", default=self._mesh_cache)
+            self.cache_dir = cfgparse("cache_dir", default=self.cache_dir)
+            self.profile = cfgparse("profile", default=self._profile)
+            self.profile_file = cfgparse("profile_file",
+                                         default=self.profile_file)
 
     @property
     def warn(self):
@@ -86,13 +117,68 @@ class RuntimeOptions(object):
 
     @property
     def nprocs(self):
-        num_procs = 1 if self.do_not_fork else self._nprocs
-        return min(mp.cpu_count(), num_procs)
+        return self.num_procs(self._nprocs)
+
+    def num_procs(self, n):
+        """The number of processes used when n are requested: at least 1 and
+        at most the number of cpus, 1 if forking is disabled"""
+        if self.do_not_fork:
+            return 1
+        return max(1, min(mp.cpu_count(), int(n)))
 
     @nprocs.setter
     def nprocs(self, n):
         self._nprocs = n
 
+    @property
+    def sparse(self):
+        return self._sparse
+    @sparse.setter
+    def sparse(self, x):
+        self._sparse = bool(x)
+
+    @property
+    def reduce_bcs(self):
+        return self._reduce_bcs
+    @reduce_bcs.setter
+    def reduce_bcs(self, x):
+        self._reduce_bcs = bool(x)
+
+    @property
+    def mesh_cache(self):
+        return self._mesh_cache
+    @mesh_cache.setter
+    def mesh_cache(self, x):
+        self._mesh_cache = bool(x)
+
+    @property
+    def solver(self):
+        return self._solver
+    @solver.setter
+    def solver(self, x):
+        self._solver = x.lower()
+
+    @property
+    def precond(self):
+        return self._precond
+    @precond.setter
+    def precond(self, x):
+        self._precond = None if not x else x.lower()
+
+    @property
+    def renumber(self):
+        return self._renumber
+    @renumber.setter
+    def renumber(self, x):
+        self._renumber = None if not x else x.lower()
+
+    @property
+    def profile(self):
+        return self._profile
+    @profile.setter
+    def profile(self, x):
+        self._profile = bool(x)
+
     @property
     def verbosity(self):
         return self._v
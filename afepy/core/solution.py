@@ -1,8 +1,9 @@
 import numpy as np
 from tools.datastructs import BlockData
+from tools.profiler import timed
 
 class SolutionSpace:
-    def __init__(self, V):
+    def __init__(self, V, stride=1):
 
         self.time = 0.
         self.time_p = 0.
@@ -13,14 +14,26 @@ class SolutionSpace:
         # dependent variable
         self.u_p = np.zeros(V.num_dof)
         self.u = np.zeros(V.num_dof)
-        self._snapshots = []
 
+        # every stride-th converged step is kept in _snapshots or, when
+        # streaming, written directly to _writer
+        self.stride = stride
+        self._snapshots = []
+        self._writer = None
+        # the last converged step was skipped by the stride, it is output
+        # when the output is finished (see flush)
+        self._unwritten = False
+
+        # integration point data are shared with the worker processes of a
+        # parallel assembly
+        self.shared = V.nprocs > 1
         self.blk_data = []
         for eb in V.blocks:
-            d = BlockData(V.elements[eb.elem_ids])
+            d = BlockData(V.elements[eb.elem_ids], shared=self.shared)
             self.blk_data.append(d)
 
         self.num_node = self.V.num_node
+        self._valence = None
         self.ndofn = self.V.num_dof_per_node
         self.num_dim = self.V.num_dim
 
@@ -41,30 +54,91 @@ class SolutionSpace:
         for d in self.blk_data:
             d.reset()
 
-    def advance_data(self, du):
+    @timed("output")
+    def advance_data(self, du, output=True):
+        """Advance the converged state by du.  Steps advanced with output
+        False are not output (nor counted for the stride), other than the
+        last step advanced, see flush"""
         self.u_p = np.array(self.u)
         self.u += du
         self.dtime = self.time - self.time_p
         self.time_p = self.time
         for d in self.blk_data:
             d.advance()
+
+        if not output:
+            self._unwritten = True
+            return
+
+        self.count += 1
+        self._unwritten = bool(self.count % self.stride)
+        if self._unwritten:
+            return
+        self.output_step()
+
+    def output_step(self):
+        """Write the current converged step or keep it in the snapshots"""
+        if self._writer is not None:
+            bd = [d[0] for d in self.blk_data]
+            self._writer.snapshot(*self.frame(self.time, self.dtime, bd, self.u))
+            return
+
         data = [bd[0].copy() for bd in self.blk_data]
         self._snapshots.append([self.time, self.dtime, data, self.u.copy()])
 
-    def snapshots(self, count=None):
+    def flush(self):
+        """Output the last converged step, if it was skipped"""
+        if self._unwritten:
+            self._unwritten = False
+            self.output_step()
+
+    def stream(self, writer, stride=None):
+        """Write each converged step to writer as it is computed instead of
+        keeping the history in memory
+
+        Parameters
+        ----------
+        writer : ExodusIIManager
+            Initialized writer, whose snapshot method is called with the
+            element averages and nodal data of each step written. If None,
+            streaming is stopped.
+        stride : int, optional
+            Write every stride-th step
+
+        """
+        if self._writer is not None:
+            # the last step belongs to the writer being replaced
+            self.flush()
+        if stride is not None:
+            self.stride = max(1, int(stride))
+        self._writer = writer
+        if writer is None:
+            self.reset_output()
+
+    @property
+    def streaming(self):
+        return self._writer is not None
+
+    def frame(self, t, dt, bd, u):
+        """Element averages and nodal data of one step"""
         node_data = np.zeros((self.num_node, len(self.node_output_vars)))
+        ave = self.average(bd)
+        node_data[:, :self.ndofn] = u.reshape(self.num_node, -1)
+        if self.node_var_indices:
+            v = self.node_var_indices
+            node_data[:, self.ndofn:] = self.project_to_nodes(bd, v)
+        return ave, node_data, t, dt
+
+    def snapshots(self, count=None):
+        self.flush()
         for (t, dt, bd, u) in self._snapshots:
-            ave = self.average(bd)
-            node_data[:, :self.ndofn] = u.reshape(self.num_node, -1)
-            if self.node_var_indices:
-                v = self.node_var_indices
-                node_data[:, self.ndofn:] = self.project_to_nodes(bd, v)
-            yield ave, node_data, t, dt
-
-        # reset node output
+            yield self.frame(t, dt, bd, u)
+        self.reset_output()
+        return
+
+    def reset_output(self):
         self.node_var_indices = []
         self.node_output_vars = [x for x in self.default_node_vars]
-        return
 
     def output(self, node=None):
         if node is None:
@@ -125,40 +199,53 @@ class SolutionSpace:
                 nodesets, sidesets, None, elem_data, elem_num_map, node_data)
 
     def average(self, blk_data):
-        """Loop through elements in this block, update variables, and compute the
-        element averages
+        """Compute the element averages of the integration point data of each
+        block
 
         Parameters
         ----------
-        elements : ndarray of objects (num_elem_in_blk,)
-            Instantiated elements in block
-        stress : ndarray (num_elem_in_blk, 2, max_gauss, ntens)
-            Stress arrays
+        blk_data : list of ndarray (num_elem_in_blk, num_int_point, num_var)
+            Integration point data of each block
+
+        Returns
+        -------
+        ave : list of ndarray (num_elem_in_blk, num_var)
 
         """
         ave = []
         for (iblk, elems_this_blk) in enumerate(self.V.elems_per_block):
-            ave.append([])
-            blkdata = blk_data[iblk]
-            for (iel, e) in enumerate(self.V.elements[elems_this_blk]):
-                ave[iblk].append(e.interpolate_to_centroid(blkdata[iel]))
-            ave[iblk] = np.array(ave[iblk])
+            e = self.V.elements[elems_this_blk[0]]
+            blkdata = np.asarray(blk_data[iblk])
+            ave.append(np.einsum("p,epv->ev", e.centroid_weights, blkdata))
         return ave
 
     def project_to_nodes(self, blk_data, v):
         """Project data to nodes via lumped projection
 
         """
-        nx = len(v)
-        a = np.zeros((self.V.mesh.num_node, nx))
-        dt = np.zeros(self.V.mesh.num_node)
+        v = list(v)
+        a = np.zeros((self.num_node, len(v)))
         for (iblk, elems_this_blk) in enumerate(self.V.elems_per_block):
-            blkdata = blk_data[iblk]
-            for (iel, e) in enumerate(self.V.elements[elems_this_blk]):
-                a[e.elem_nodes] += e.project_to_nodes(blkdata[iel], v)
-                dt[e.elem_nodes] += 1
-        a = (a.T / dt).T
-        return a
+            e = self.V.elements[elems_this_blk[0]]
+            blkdata = np.asarray(blk_data[iblk])[:, :, v]
+            vals = np.einsum("np,epv->env", e.node_weights, blkdata)
+            nodes = self.V.connect[elems_this_blk, :e.num_node].ravel()
+            vals = vals.reshape(len(nodes), -1)
+            for k in range(len(v)):
+                a[:, k] += np.bincount(nodes, weights=vals[:, k],
+                                       minlength=self.num_node)
+        return a / self.valence[:, np.newaxis]
+
+    @property
+    def valence(self):
+        """Number of elements attached to each node"""
+        if self._valence is None:
+            nodes = [self.V.connect[elems, :self.V.elements[elems[0]].num_node]
+                     for elems in self.V.elems_per_block]
+            nodes = np.concatenate([n.ravel() for n in nodes])
+            valence = np.bincount(nodes, minlength=self.num_node)
+            self._valence = np.maximum(valence, 1).astype(np.float64)
+        return self._valence
 
     def Zeros(self):
         return np.zeros_like(self.u)
@@ -67,6 +67,19 @@ class QE8FI(ContinuumElement):
 
         return B
 
+    def b_matrix_batch(self, shg, shgbar=None):
+        B = super(QE8FI, self).b_matrix_batch(shg)
+        if shgbar is None:
+            return B
+
+        # mean dilatational formulation
+        bb = (shgbar[:, None] - shg) / 2.
+        for i in range(2):
+            B[:, :, i, 0::2] += bb[:, :, 0, :]
+            B[:, :, i, 1::2] += bb[:, :, 1, :]
+
+        return B
+
     @classmethod
     def volume(cls, coords):
         return geom.elem_volume(cls.num_coord, cls.num_node,
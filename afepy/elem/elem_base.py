@@ -1,7 +1,8 @@
-from math import sqrt
 from numpy import dot, zeros, zeros_like, eye, array, sum as asum, float64
-from numpy.linalg import inv, det
-from tools.misc import getopt, dist
+from numpy import einsum, asarray, newaxis, maximum, may_share_memory
+from numpy import cross, outer
+from numpy.linalg import inv, det, norm
+from tools.misc import getopt
 from tools.errors import AFEPYError
 from tools.datastructs import ARRAY, SYMTEN, Variable
 import mesh.geom as geom
@@ -21,8 +22,16 @@ class MetaClass(type):
 class ContinuumElement(object):
     """Base class for an element.
 
+    Notes
+    -----
+    Elements that integrate their stiffness with the base class integrate2
+    set batch = True.  For these elements the stiffness, residual, and
+    kinematic updates of a whole element block are evaluated at once by the
+    *_batch methods below.
+
     """
     __metaclass__ = MetaClass
+    batch = True
 
     def initialize(self, elem_id, elem_nodes, material, **kwargs):
 
@@ -61,10 +70,9 @@ class ContinuumElement(object):
            dxdxi = dot(dNdxi, X)
            J = det(dxdxi)
         """
-        a = lambda _: det(dot(self.shape.grad(_), X))
         if xi is not None:
-            return a(xi)
-        return array([a(xi) for xi in self.integration.points])
+            return det(dot(self.shape.grad(xi), X))
+        return det(einsum("pin,nj->pij", self.integration_table.dNdxi, X))
 
     def grad(self, X):
         """Shape function derivatives with respect to global coordinates
@@ -78,9 +86,9 @@ class ContinuumElement(object):
            dxidx = inv(dxdxi)
            dNdx = dot(dxidx, dNdxi)
         """
-        a = lambda _: self.shape.grad(_)
-        b = lambda _: inv(dot(a(_), X))
-        return array([dot(b(xi), a(xi)) for xi in self.integration.points])
+        dNdxi = self.integration_table.dNdxi
+        dxdxi = einsum("pin,nj->pij", dNdxi, X)
+        return einsum("pij,pjn->pin", inv(dxdxi), dNdxi)
 
     def update_material(self, data, time, dtime, x, npt, kstep):
         ntens = self.ndi + self.nshr
@@ -173,31 +181,48 @@ class ContinuumElement(object):
             Element distributed load vector
 
         """
-        r = zeros((self.num_dof_per_node * self.num_face_nodes))
+        T = self.bndry_table
         w = self.bndry.integration.weights
-        for (npt, xi) in enumerate(self.bndry.integration.points):
+        dxdxi = einsum("pin,nj->pij", T.dNdxi, X)
 
-            # Compute shape functions and derivatives wrt local coords
-            N = self.bndry.eval(xi)
-            dNdxi = self.bndry.grad(xi)
-            dxdxi = dot(dNdxi, X)
+        # length (area) of the face per unit length (area) of the reference
+        # face at each integration point
+        if self.num_coord == 2:
+            jac = norm(dxdxi[:, 0, :2], axis=1)
+        elif self.num_coord == 3:
+            jac = norm(cross(dxdxi[:, 0, :3], dxdxi[:, 1, :3]), axis=1)
 
-            if self.num_coord == 2:
-                det = sqrt(dxdxi[0, 0] ** 2 + dxdxi[0, 1] ** 2)
+        trac_vec = asarray(trac_vec, dtype=float64)
+        r = outer(dot(w * jac, T.N), trac_vec[:self.num_dof_per_node])
+        return r.ravel()
 
-            elif self.num_coord == 3:
-                a = (dxdxi[0, 1] * dxdxi[1, 2]) - (dxdxi[1, 1] * dxdxi[0, 2])
-                b = (dxdxi[0, 0] * dxdxi[1, 2]) - (dxdxi[1, 0] * dxdxi[0, 2])
-                c = (dxdxi[0, 0] * dxdxi[1, 1]) - (dxdxi[1, 0] * dxdxi[0, 1])
-                det = sqrt(a ** 2 + b ** 2 + c ** 2)
+    def integrate_bndry_batch(self, X, trac_vec):
+        """Apply the Von Neumann (natural) BC to many faces of elements of
+        this type at once
 
-            for a in range(self.num_face_nodes):
-                for i in range(self.num_dof_per_node):
-                    row = self.num_dof_per_node * a + i
-                    traction = N[a] * trac_vec[i]
-                    r[row] += traction * w[npt] * det
+        Parameters
+        ----------
+        X : ndarray (num_face, num_face_nodes, num_coord)
+            Nodal coords of the face nodes of each face
+        trac_vec : ndarray (num_face, num_dof_per_node)
+            Traction on each face
+
+        Returns
+        -------
+        r : ndarray (num_face, num_face_nodes * num_dof_per_node)
+            Distributed load vector of each face
 
-        return r
+        """
+        T = self.bndry_table
+        w = self.bndry.integration.weights
+        dxdxi = einsum("pin,fnj->fpij", T.dNdxi, X)
+        if self.num_coord == 2:
+            jac = norm(dxdxi[:, :, 0, :2], axis=2)
+        elif self.num_coord == 3:
+            jac = norm(cross(dxdxi[:, :, 0, :3], dxdxi[:, :, 1, :3]), axis=2)
+        trac_vec = asarray(trac_vec, dtype=float64)[:, :self.num_dof_per_node]
+        r = einsum("fp,pn,fi->fni", jac * w, T.N, trac_vec)
+        return r.reshape(X.shape[0], -1)
 
     def mean_shg(self, w, det, shg):
         el_vol = dot(det, w)
@@ -210,62 +235,266 @@ class ContinuumElement(object):
                     shgbar[i, a] += shg[npt, i, a] * fac
         return shgbar
 
+    # --- Batched kernels.  Arrays are stacked over all elements of a block,
+    #     e.g., X has shape (num_elem, num_node, num_coord)
+    def grad_batch(self, X):
+        """Shape function derivatives with respect to global coordinates and
+        Jacobian determinants at each integration point of each element
+
+        Returns
+        -------
+        shg : ndarray (num_elem, num_point, num_coord, num_node)
+        det : ndarray (num_elem, num_point)
+
+        """
+        dNdxi = self.integration_table.dNdxi
+        dxdxi = einsum("pin,enj->epij", dNdxi, X)
+        shg = einsum("epij,pjn->epin", inv(dxdxi), dNdxi)
+        return shg, det(dxdxi)
+
+    def mean_shg_batch(self, w, det, shg):
+        wdet = det * w
+        el_vol = asum(wdet, axis=1)
+        fac = wdet / self.num_coord / el_vol[:, None]
+        return einsum("ep,epia->eia", fac, shg)
+
+    def b_matrix_batch(self, shg, shgbar=None):
+        """Small strain B matrix at each integration point of each element
+
+        Returns
+        -------
+        B : ndarray (num_elem, num_point, ntens, num_node * num_dof_per_node)
+
+        """
+        n = self.num_dof_per_node
+        num_elem, num_point = shg.shape[:2]
+        B = zeros((num_elem, num_point, self.ndi + self.nshr, self.num_node * n))
+        for i in range(self.num_coord):
+            B[:, :, i, i::n] = shg[:, :, i, :]
+        for (k, (i, j)) in enumerate([(0, 1), (1, 2), (0, 2)][:self.nshr]):
+            B[:, :, self.ndi + k, i::n] = shg[:, :, j, :]
+            B[:, :, self.ndi + k, j::n] = shg[:, :, i, :]
+        return B
+
+    def strain_increment_batch(self, X, u):
+        """Strain increment at each integration point of each element"""
+        shg, det = self.grad_batch(X)
+        shgbar = self.mean_shg_batch(self.integration.weights, det, shg)
+        B = self.b_matrix_batch(shg, shgbar)
+        return einsum("epki,ei->epk", B, u.reshape(u.shape[0], -1))
+
+    def integrate2_batch(self, elements, fdata, time, dtime, X, u, kstep):
+        """Assemble the stiffness of each element in a block
+
+        Parameters
+        ----------
+        elements : ndarray of objects (num_elem,)
+            The elements of the block, used for the material update
+        fdata : AttrArray (num_elem, num_point, num_var)
+            Integration point data at the end of the step
+
+        Returns
+        -------
+        Q : ndarray (num_elem, ndof, ndof)
+
+        """
+        x = X + u
+        shg, det = self.grad_batch(X)
+        w = self.integration.weights
+        shgbar = self.mean_shg_batch(w, det, shg)
+        B = self.b_matrix_batch(shg, shgbar)
+
+        if self.material.batch:
+            D = self.update_material_batch(fdata, time, dtime, kstep)
+        else:
+            ntens = self.ndi + self.nshr
+            D = zeros((len(elements), self.integration.num_point, ntens, ntens))
+            for (iel, e) in enumerate(elements):
+                for npt in range(self.integration.num_point):
+                    D[iel, npt] = e.update_material(fdata[iel, npt], time,
+                                                    dtime, x[iel], npt, kstep)
+
+        DB = einsum("epkl,eplj->epkj", D, B)
+        return einsum("epki,epkj,ep->eij", B, DB, det * w)
+
+    def update_material_batch(self, fdata, time, dtime, kstep):
+        """Update the material state at every integration point of a block
+        with a single call to the material model
+
+        Parameters
+        ----------
+        fdata : AttrArray (num_elem, num_point, num_var)
+            Integration point data at the end of the step, changed in place
+
+        Returns
+        -------
+        D : ndarray (num_elem, num_point, ntens, ntens)
+
+        """
+        ntens = self.ndi + self.nshr
+        pts = fdata.reshape(-1, fdata.shape[-1])
+        D = self.material.update_state_batch(
+            pts.strain, pts.dstrain, pts.stress, pts.statev, self.ndi,
+            self.nshr, ntens, time=time, dtime=dtime, kstep=kstep)
+        if not may_share_memory(pts, fdata):
+            # fdata is not contiguous, reshape copied the data
+            fdata[:] = pts.reshape(fdata.shape)
+        return D.reshape(fdata.shape[:2] + (ntens, ntens))
+
+    def integrate_batch(self, fdata, X, u):
+        """Assemble the internal force of each element in a block
+
+        Returns
+        -------
+        R : ndarray (num_elem, ndof)
+
+        """
+        shg, det = self.grad_batch(X)
+        w = self.integration.weights
+        B = self.b_matrix_batch(shg)
+        return einsum("epk,epki,ep->ei", fdata.stress, B, det * w)
+
+    def average_weights(self, points):
+        """Inverse distance weights of the integration points at each point
+
+        Returns
+        -------
+        w : ndarray (num_points, num_int_point)
+            Normalized weights, the average of integration point data f at
+            points is dot(w, f)
+
+        """
+        xi = array(self.integration.points, dtype=float64)
+        points = array(points, dtype=float64).reshape(-1, xi.shape[1])
+        d = norm(points[:, newaxis, :] - xi[newaxis, :, :], axis=2)
+        w = 1. / maximum(d, 1E-06)
+        return w / w.sum(axis=1)[:, newaxis]
+
+    def _weights(self, which):
+        # weights depend only on the element type, cache them per type
+        key = (type(self), which)
+        try:
+            return ContinuumElement._weight_cache[key]
+        except KeyError:
+            if which == "centroid":
+                points = self.cp
+            else:
+                points = self.xp[:self.num_node]
+            w = self.average_weights(points)
+            ContinuumElement._weight_cache[key] = w
+            return w
+    _weight_cache = {}
+
+    def _table(self, which):
+        # shape function tables depend only on the element type, cache them
+        # per type
+        key = (type(self), which)
+        try:
+            return ContinuumElement._table_cache[key]
+        except KeyError:
+            if which == "integration":
+                shape, points = self.shape, self.integration.points
+            elif which == "mass":
+                shape, points = self.shape, self.integration.mass_points
+            else:
+                shape, points = self.bndry, self.bndry.integration.points
+            table = shape.tabulate(points)
+            ContinuumElement._table_cache[key] = table
+            return table
+    _table_cache = {}
+
+    @property
+    def integration_table(self):
+        """Shape functions and derivatives at the integration points"""
+        return self._table("integration")
+
+    @property
+    def mass_table(self):
+        """Shape functions and derivatives at the mass integration points"""
+        return self._table("mass")
+
+    @property
+    def bndry_table(self):
+        """Face shape functions and derivatives at the face integration
+        points"""
+        return self._table("bndry")
+
+    @property
+    def centroid_weights(self):
+        """Weights of the integration points at the centroid, (num_int_point,)"""
+        return self._weights("centroid")[0]
+
+    @property
+    def node_weights(self):
+        """Weights of the integration points at each node,
+        (num_node, num_int_point)"""
+        return self._weights("node")
+
     def interpolate_to_centroid(self, fdata):
         """Inverse distance weighted average of integration point data at the
         element centroid"""
-        return self.average(self.cp, fdata)
+        return dot(self.centroid_weights, fdata)
 
     def project_to_nodes(self, fdata, v):
         """Inverse distance weighted average of integration point data at each
         element node"""
-        nx = len(v)
-        a = zeros((self.num_node, nx))
-        for i in range(self.num_node):
-            a[i,:] = self.average(self.xp[i], fdata, v)
-        return a
+        return dot(self.node_weights, asarray(fdata)[:, v])
 
     def average(self, point, fdata, v=None):
         """Inverse distance weighted average of integration point data at point"""
-        if v is None:
-            v = range(len(fdata[0].data))
-        nx = len(v)
-        ave = zeros(nx)
-        w = []
-        for (i, xi) in enumerate(self.integration.points):
-            d = max(dist(point, xi), 1E-06)
-            w.append(1. / d)
-            ave[:] += [fdata[i][v][x] * w[-1] for x in range(nx)]
-        ave /= asum(w)
-        return ave
+        fdata = asarray(fdata)
+        if v is not None:
+            fdata = fdata[:, v]
+        return dot(self.average_weights(point)[0], fdata)
 
     def mass(self, X, lumped_mass=0):
-        shg = self.grad(X)
-        mel = zeros((self.num_dof_per_node*self.num_node,
-                     self.num_dof_per_node*self.num_node))
-        w = self.integration.mass_weights
-        rho = self.density
+        return self.mass_batch(X[newaxis], lumped_mass=lumped_mass)[0]
 
-        #  Loop over the integration points
-        for (npt, xi) in enumerate(self.integration.mass_points):
+    def mass_batch(self, X, lumped_mass=0):
+        """Mass matrices of many elements
 
-            # Compute shape functions and derivatives wrt local coords
-            N = self.shape.eval(xi)
-            dNdxi = self.shape.grad(xi)
-            dxdxi = dot(dNdxi, X)
-            jac = det(dxdxi);
+        Parameters
+        ----------
+        X : ndarray (num_elem, num_node, num_dim)
 
-            for a in range(self.num_node):
-                for b in range(self.num_node):
-                    for i in range(self.num_dof_per_node):
-                        row = self.num_dof_per_node * a + i
-                        col = self.num_dof_per_node * b + i
-                        mel[col, row] += rho * N[b] * N[a] * w[npt] * jac
+        Returns
+        -------
+        mel : ndarray (num_elem, num_node * num_dof_per_node,
+                       num_node * num_dof_per_node)
 
-        # Evaluate a lumped mass matrix using the row sum method
-        if lumped_mass:
-            for a in range(self.num_node * self.num_dof_per_node):
-                m = asum(mel[a, :])
-                mel[a, :] = 0
-                mel[a, a] = m
+        """
+        T = self.mass_table
+        w = self.integration.mass_weights
+        jac = det(einsum("pin,enj->epij", T.dNdxi, X))
+
+        # consistent mass of the nodes, repeated for each dof of the node
+        m = self.density * einsum("pa,pb,ep->eab", T.N, T.N, w * jac)
+        num_elem, n = m.shape[:2]
+        nd = self.num_dof_per_node
+        if not lumped_mass:
+            mel = einsum("eab,ij->eaibj", m, eye(nd))
+            return mel.reshape(num_elem, n * nd, n * nd)
 
+        # Evaluate a lumped mass matrix using the row sum method
+        mel = zeros((num_elem, n * nd, n * nd))
+        i = range(n * nd)
+        mel[:, i, i] = asum(m, axis=2).repeat(nd, axis=1)
         return mel
+
+    def lumped_mass_batch(self, X):
+        """Row sum lumped mass of each node of many elements
+
+        Parameters
+        ----------
+        X : ndarray (num_elem, num_node, num_dim)
+
+        Returns
+        -------
+        m : ndarray (num_elem, num_node)
+            The mass of each node, the mass of each dof of the node
+
+        """
+        T = self.mass_table
+        w = self.integration.mass_weights
+        jac = det(einsum("pin,enj->epij", T.dNdxi, X))
+        return self.density * einsum("pa,pb,ep->ea", T.N, T.N, w * jac)
@@ -4,6 +4,7 @@ from numpy.linalg import inv, det
 from elem_base import ContinuumElement
 
 class ContinuumElementI(ContinuumElement):
+    batch = False
 
     def integrate2(self, fdata, time, dtime, X, u, kstep):
         """Integrate the stiffness using incompatible modes"""
@@ -4,6 +4,7 @@ from elem_base import ContinuumElement
 from tools.misc import getopt
 
 class ContinuumElementR(ContinuumElement):
+    batch = False
 
     def setopts(self, **elem_opts):
         self.hgstiff = getopt("hourglass stiffness", elem_opts)
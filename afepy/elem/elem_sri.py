@@ -2,6 +2,7 @@ from numpy import outer, zeros, dot, array, sum as asum
 from elem_base import ContinuumElement
 
 class ContinuumElementSRI(ContinuumElement):
+    batch = False
 
     def integrate2(self, fdata, time, dtime, X, u, kstep):
         # see base class implementation for comments
@@ -43,7 +44,7 @@ class ContinuumElementSRI(ContinuumElement):
         for (npt, xi) in enumerate(self.sri_e.integration.points):
 
             # average element quantities at this point
-            sri_data.data[:] = self.average(xi, fdata)
+            sri_data[:] = self.average(xi, fdata)
 
             # Evaluate the material
             D = self.update_material(sri_data, time, dtime, x, npt, kstep)
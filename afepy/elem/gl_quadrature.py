@@ -1,5 +1,5 @@
 """Properties and shape functions defining Gauss-Legendre quadrature"""
-from numpy import zeros
+from numpy import zeros, array
 
 class IntegrationProperties(object):
 
@@ -267,6 +267,33 @@ class IntegrationProperties(object):
 
         return w
 
+class ShapeTable(object):
+    """Shape functions and their derivatives tabulated at a fixed set of
+    points
+
+    Attributes
+    ----------
+    points : ndarray (num_point, num_coord)
+    N : ndarray (num_point, num_el_node)
+        N[p, a] is shape function a at point p
+    dNdxi : ndarray (num_point, num_coord, num_el_node)
+        dNdxi[p, i, a] is the derivative of shape function a wrt xi_i at
+        point p
+
+    The arrays are read only, tables are shared by all elements of a type.
+
+    """
+    def __init__(self, shape, points):
+        self.points = array(points, dtype=float)
+        self.N = array([shape.eval(xi).copy() for xi in self.points])
+        self.dNdxi = array([shape.grad(xi).copy() for xi in self.points])
+        for a in (self.points, self.N, self.dNdxi):
+            a.setflags(write=False)
+
+    @property
+    def num_point(self):
+        return self.points.shape[0]
+
 class ShapefunctionPrototype:
     """ Shape function definitions for several element types """
     def __init__(self, num_coord, num_el_node):
@@ -275,6 +302,16 @@ class ShapefunctionPrototype:
         self.eval = self._eval(num_coord, num_el_node)
         self.grad = self._grad(num_coord, num_el_node)
 
+    def tabulate(self, points):
+        """Evaluate the shape functions and their derivatives at points
+
+        Returns
+        -------
+        table : ShapeTable
+
+        """
+        return ShapeTable(self, points)
+
     def _eval(self, num_coord, num_el_node):
         """Formats and returns a function that can later be used to evaluate
         the shape function at xi"""
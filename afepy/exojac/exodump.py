@@ -8,7 +8,9 @@ import numpy as np
 
 from exoread import ExodusIIReader
 
-OFMTS = {"ascii": ".out", "mathematica": ".math", "ndarray": ".npy"}
+OFMTS = {"ascii": ".out", "mathematica": ".math", "ndarray": ".npy",
+         "npz": ".npz", "binary": ".bin"}
+BINARY_OFMTS = ("ndarray", "npz", "binary")
 
 class ExoDumpError(Exception):
     def __init__(self, message):
@@ -50,6 +52,10 @@ def exodump(filepath, outfile=None, variables=None, listvars=False, step=1,
     """Read the exodus file in filepath and dump the contents to a columnar data
     file
 
+    The output formats are text (ascii, mathematica), numpy's .npy (ndarray)
+    and .npz (npz, one array per column), and a binary table (binary, see
+    bindump).
+
     """
     ofmt = ofmt.lower()
     if ofmt not in OFMTS:
@@ -59,9 +65,10 @@ def exodump(filepath, outfile=None, variables=None, listvars=False, step=1,
         raise ExoDumpError("{0}: no such file".format(filepath))
 
     # setup output stream
+    mode = "wb" if ofmt in BINARY_OFMTS else "w"
     if outfile is None:
         ext = OFMTS[ofmt]
-        stream = open(os.path.splitext(filepath)[0] + ext, "w")
+        stream = open(os.path.splitext(filepath)[0] + ext, mode)
     elif outfile in ("1", "stdout"):
         stream = sys.stdout
     elif outfile in ("2", "stderr"):
@@ -69,7 +76,7 @@ def exodump(filepath, outfile=None, variables=None, listvars=False, step=1,
     elif outfile is "return":
         stream = None
     else:
-        stream = open(outfile, "w")
+        stream = open(outfile, mode)
 
     # setup variables
     if variables is None:
@@ -91,8 +98,6 @@ def exodump(filepath, outfile=None, variables=None, listvars=False, step=1,
 
     # Floating point format for numbers
     if ffmt is None: ffmt = ".18f"
-    fmt = "{0: " + ffmt + "}"
-    ffmt = lambda a, fmt=fmt: fmt.format(float(a))
 
     if ofmt == "ascii":
         asciidump(stream, ffmt, header, data)
@@ -103,6 +108,12 @@ def exodump(filepath, outfile=None, variables=None, listvars=False, step=1,
     elif ofmt == "ndarray":
         nddump(stream, ffmt, header, data)
 
+    elif ofmt == "npz":
+        npzdump(stream, ffmt, header, data)
+
+    elif ofmt == "binary":
+        bindump(stream, ffmt, header, data)
+
     stream.close()
 
     return 0
@@ -113,6 +124,8 @@ def load_data(filepath, variables=None, step=1, h=1,
         return read_vars_from_exofile(filepath, variables=variables, step=step,
                                       h=h, elem_blk=elem_blk, elem_num=elem_num,
                                       t=t)
+    if filepath.endswith(OFMTS["binary"]):
+        return loadbinary(filepath)
     return loadascii(filepath)
 
 def read_vars_from_exofile(filepath, variables=None, step=1, h=1,
@@ -148,22 +161,22 @@ def read_vars_from_exofile(filepath, variables=None, step=1, h=1,
             raise ExoDumpError("{0}: variables not in "
                                "{1}".format(", ".join(bad), filepath))
 
-    # retrieve the data from the database
+    # retrieve the data from the database, the data are read one variable
+    # (column) at a time from the records of the requested steps
     header = ["TIME"]
     header.extend([H.upper() for H in glob_var_names])
     header.extend([H.upper() for H in elem_var_names])
-    data = []
-    for i in myrange(0, exof.num_time_steps, step):
-        row = [exof.get_time(i)]
-        glob_vars_vals = exof.get_glob_vars(i, disp=1)
-        for var in glob_var_names:
-            try: row.append(glob_vars_vals[var])
-            except KeyError: continue
-        for var in elem_var_names:
-            row.append(exof.get_elem_var_time(var, elem_num, elem_blk)[i])
-        data.append(row)
+    steps = myrange(0, exof.num_time_steps, step)
+    columns = [exof.get_all_times()[steps]]
+    for var in glob_var_names:
+        columns.append(exof.get_glob_var_time(var)[steps])
+    for var in elem_var_names:
+        columns.append(exof.get_elem_var_time(var, elem_num, elem_blk)[steps])
+    dtype = np.result_type(*columns).newbyteorder("=")
+    data = np.empty((len(steps), len(columns)), dtype=dtype)
+    for (i, column) in enumerate(columns):
+        data[:, i] = column
     exof.close()
-    data = np.array(data)
 
     if len(header) != data.shape[1]:
         raise ExoDumpError("inconsistent data")
@@ -180,7 +193,12 @@ def read_vars_from_exofile(filepath, variables=None, step=1, h=1,
 
 def asciidump(stream, ffmt, header, data):
     stream.write("{0}\n".format(" ".join(header)))
-    stream.write("\n".join(" ".join(ffmt(d) for d in row) for row in data))
+    # one format for the whole row, rows are written as they are formatted
+    fmt = " ".join("{%d: %s}" % (i, ffmt) for i in range(len(header)))
+    for (i, row) in enumerate(data.tolist()):
+        if i:
+            stream.write("\n")
+        stream.write(fmt.format(*row))
     return
 
 
@@ -189,11 +207,25 @@ def nddump(stream, ffmt, header, data):
     return
 
 
+def npzdump(stream, ffmt, header, data):
+    """Each column is saved as the array with the name of its header"""
+    np.savez(stream, **dict((name, data[:, i]) for (i, name) in enumerate(header)))
+    return
+
+
+def bindump(stream, ffmt, header, data):
+    """Fixed width binary table: the header line, as written by asciidump,
+    followed by the rows of little endian 8 byte floats"""
+    stream.write("{0}\n".format(" ".join(header)))
+    stream.write(np.ascontiguousarray(data, dtype="<f8").tostring())
+    return
+
+
 def mathdump(stream, ffmt, header, data):
+    fmt = "{0: " + ffmt + "}"
     for (i, name) in enumerate(header):
-        col = data[:, i]
         stream.write("{0}={{{1}}}\n".format(
-            name, ",".join(ffmt(d) for d in data[:, i])))
+            name, ",".join(fmt.format(d) for d in data[:, i].tolist())))
     return
 
 
@@ -239,6 +271,14 @@ def loadascii(filepath):
     return head, data
 
 
+def loadbinary(filepath):
+    """Load a binary table written by bindump"""
+    with open(filepath, "rb") as fh:
+        head = fh.readline().split()
+        data = np.fromstring(fh.read(), dtype="<f8")
+    return head, data.reshape(-1, len(head))
+
+
 def loadhead(filepath, comments="#"):
     """Get the file header
 
@@ -14,13 +14,17 @@ class NotYetImplemented(Exception):
 class ExodusIIReader(object):
     """Exodus output databse reader
 
+    The file is memory mapped and the values of a variable at a step (and
+    element block) are views of the map, so that only the parts of the file
+    that are used are read.
+
     """
     def __init__(self, filepath):
         self.db = self.open_db(filepath)
         self._nvaridx = dict([(k, i) for (i, k) in enumerate(self.node_var_names)])
         self._evaridx = dict([(k, i) for (i, k) in enumerate(self.elem_var_names)])
         self._gvaridx = dict([(k, i) for (i, k) in enumerate(self.glob_var_names)])
-        pass
+        self._elem_blk_start = None
 
     def __repr__(self):
         return self.summary()
@@ -206,7 +210,7 @@ class ExodusIIReader(object):
             Times for all steps
 
         """
-        return self.db.variables[VAR_WHOLE_TIME].data[:]
+        return self.db.slab(VAR_WHOLE_TIME)
 
     def get_time(self, step):
         """reads the time value for a specified time step
@@ -222,7 +226,7 @@ class ExodusIIReader(object):
             Time at time step
 
         """
-        return self.db.variables[VAR_WHOLE_TIME].data[step]
+        return self.db.slab(VAR_WHOLE_TIME, step)
 
     def get_coord_names(self):
         """Reads the names of the coordinate arrays from the database.
@@ -390,7 +394,7 @@ class ExodusIIReader(object):
 
         """
         try:
-            data = self.db.variables[VAR_GLO_VAR].data[step]
+            data = self.db.slab(VAR_GLO_VAR, step)
         except IndexError:
             raise ExodusIIFileError("Error getting global variables at "
                                     "step {0}".format(step))
@@ -412,7 +416,7 @@ class ExodusIIReader(object):
 
         """
         i = self.global_var_index(glob_var)
-        return self.db.variables[VAR_GLO_VAR].data[:, i]
+        return self.db.slab(VAR_GLO_VAR)[:, i]
 
     def get_nodal_var(self, step, nodal_var):
         """Read nodal variable at one time step
@@ -435,7 +439,7 @@ class ExodusIIReader(object):
         if step == 0:
             step = 1
         i = self.nodal_var_index(nodal_var)
-        return self.db.variables[VAR_NOD_VAR_NEW(i+1)].data[step]
+        return self.db.slab(VAR_NOD_VAR_NEW(i+1), step)
 
     def get_nodal_var_time(self, nodal_var, node_num):
         """Reads the values of a nodal variable for a single node through a
@@ -457,7 +461,7 @@ class ExodusIIReader(object):
 
         """
         i = self.nodal_var_index(nodal_var)
-        return self.db.variables[VAR_NOD_VAR_NEW(i+1)].data[:, node_num-1]
+        return self.db.slab(VAR_NOD_VAR_NEW(i+1))[:, node_num-1]
 
     def get_elem_var(self, step, elem_var):
         """Read element variable at one time step
@@ -475,14 +479,42 @@ class ExodusIIReader(object):
         elem_var : ndarray
 
         """
-        i = self.elem_var_index(elem_var)
-        elem_var = []
-        for elem_blk_id in self.elem_blk_ids:
-            n = self.db.dimensions[DIM_NUM_EL_IN_BLK(elem_blk_id)]
-            name = VAR_ELEM_VAR(i+1, elem_blk_id)
-            elem_var.append(self.db.variables[name][step, :n])
+        elem_var = [self.get_elem_var_blk(step, elem_var, elem_blk_id)
+                    for elem_blk_id in self.elem_blk_ids]
         return np.array(elem_var)
 
+    def get_elem_var_blk(self, step, elem_var, elem_blk_id):
+        """Read element variable of one element block at one time step
+
+        Parameters
+        ----------
+        step : int
+            The time step, 0 indexing
+
+        elem_var : str
+            The element variable
+
+        elem_blk_id : int
+            The element block ID
+
+        Returns
+        -------
+        elem_var : ndarray
+            num_el_in_blk values of the element variable.  When the file is
+            memory mapped, a view of the file: only the values of the block
+            at the step are read, and only when used.
+
+        """
+        i = self.elem_var_index(elem_var)
+        j = self.elem_blk_num(elem_blk_id)
+        n = self.db.dimensions[DIM_NUM_EL_IN_BLK(j)]
+        return self.db.slab(VAR_ELEM_VAR(i+1, j), step)[:n]
+
+    def var_offset(self, name, step):
+        """Byte offset in the file of the values at step of the record
+        variable name (a VAR_NOD_VAR_NEW, VAR_ELEM_VAR or VAR_GLO_VAR)"""
+        return self.db.record_offset(name, step)
+
     def get_elem_var_time(self, elem_var, elem_num, elem_blk_id=None):
         """Read element variable through time
 
@@ -503,24 +535,138 @@ class ExodusIIReader(object):
         """
         i = self.elem_var_index(elem_var)
         if elem_blk_id is None:
-            # find element block number that has this element assume that
-            # elements are numbered contiguously with element block
-            num_els = [self.db.dimensions[DIM_NUM_EL_IN_BLK(j+1)]
-                       for j in range(self.num_elem_blk)]
-            n = 0
-            for (j, num_el) in enumerate(num_els):
-                n += num_el
-                if elem_num < n + 1:
-                    break
-            # j is now the element block id, now find the element number
-            # relative the element block
-            e = elem_num - sum(num_els[:j])
-            elem_blk_id = j + 1
+            blk_nums, offsets = self.locate_elems(elem_num)
+            elem_blk_id, e = blk_nums[0], offsets[0] + 1
         else:
             e = elem_num
 
         name = VAR_ELEM_VAR(i+1, elem_blk_id)
-        return self.db.variables[name].data[:, e-1]
+        return self.db.slab(name)[:, e-1]
+
+    def locate_elems(self, elem_nums):
+        """Find the element blocks of elements
+
+        Parameters
+        ----------
+        elem_nums : array_like of int
+            Internal IDs (see Element Number Map) of the elements
+
+        Returns
+        -------
+        elem_blk_nums : ndarray of int
+            The element block number (1 based) of each element
+
+        offsets : ndarray of int
+            The index (0 based) of each element in its element block
+
+        Notes
+        -----
+        Elements are numbered contiguously with element block.  The first
+        element of each block is found once and kept.  An ExodusIIFileError
+        is raised for element numbers not in 1..num_elem.
+
+        """
+        if self._elem_blk_start is None:
+            num_els = [self.db.dimensions[DIM_NUM_EL_IN_BLK(j+1)]
+                       for j in range(self.num_elem_blk)]
+            self._elem_blk_start = np.cumsum([0] + num_els)
+        start = self._elem_blk_start
+        elem_nums = np.atleast_1d(np.asarray(elem_nums, dtype=np.int64))
+        bad = (elem_nums < 1) | (elem_nums > start[-1])
+        if np.any(bad):
+            raise ExodusIIFileError("{0}: element number not in 1..{1}".format(
+                elem_nums[bad][0], start[-1]))
+        j = np.searchsorted(start[1:], elem_nums)
+        return j + 1, elem_nums - start[j] - 1
+
+    def get_nodal_var_history(self, nodal_var, node_nums=None, steps=None):
+        """Read the values of a nodal variable for many nodes through time
+
+        Parameters
+        ----------
+        nodal_var : str
+            The desired nodal variable
+
+        node_nums : array_like of int, optional
+            The internal IDs (see Node Number Map) of the desired nodes, all
+            nodes by default
+
+        steps : int, slice, or array_like of int, optional
+            The time steps, 0 indexing, all steps by default
+
+        Returns
+        -------
+        var_vals : ndarray, (nsteps, nnodes)
+            var_vals[k, n] is the value at the kth step of the nth node
+
+        """
+        i = self.nodal_var_index(nodal_var)
+        if node_nums is None:
+            node_nums = np.arange(1, self.num_nodes+1)
+        nodes = np.atleast_1d(np.asarray(node_nums, dtype=np.int64)) - 1
+        return self._gather(VAR_NOD_VAR_NEW(i+1), steps, nodes)
+
+    def get_elem_var_history(self, elem_var, elem_nums=None, steps=None):
+        """Read the values of an element variable for many elements through
+        time
+
+        Parameters
+        ----------
+        elem_var : str
+            The desired element variable
+
+        elem_nums : array_like of int, optional
+            The internal IDs (see Element Number Map) of the desired elements,
+            all elements by default
+
+        steps : int, slice, or array_like of int, optional
+            The time steps, 0 indexing, all steps by default
+
+        Returns
+        -------
+        var_vals : ndarray, (nsteps, nelems)
+            var_vals[k, n] is the value at the kth step of the nth element
+
+        Notes
+        -----
+        The values of each element block are gathered from the file in one
+        pass over the requested steps.
+
+        """
+        i = self.elem_var_index(elem_var)
+        if elem_nums is None:
+            elem_nums = np.arange(1, self.num_elem+1)
+        blk_nums, offsets = self.locate_elems(elem_nums)
+        steps = self._steps(steps)
+        nsteps = len(np.arange(self.num_time_steps)[steps])
+        blk_vals = []
+        for j in np.unique(blk_nums):
+            k = np.where(blk_nums == j)[0]
+            vals = self._gather(VAR_ELEM_VAR(i+1, j), steps, offsets[k])
+            blk_vals.append((k, vals))
+        dtype = blk_vals[0][1].dtype if blk_vals else DTYPE_FLT
+        var_vals = np.empty((nsteps, len(blk_nums)), dtype=dtype)
+        for (k, vals) in blk_vals:
+            var_vals[:, k] = vals
+        return var_vals
+
+    def _steps(self, steps):
+        """steps as a slice or an array of steps"""
+        if steps is None:
+            return slice(None)
+        if isinstance(steps, (int, long, np.integer)):
+            return slice(steps, steps+1 if steps != -1 else None)
+        if isinstance(steps, slice):
+            return steps
+        return np.atleast_1d(np.asarray(steps, dtype=np.int64))
+
+    def _gather(self, name, steps, index):
+        """Values of the record variable name at the steps (rows) and
+        index (columns)"""
+        steps = self._steps(steps)
+        if isinstance(steps, slice):
+            return self.db.slab(name, steps)[:, index]
+        return self.db.slab(name)[np.ix_(steps, index)]
 
     def get_node_set_ids(self):
         return self.node_set_ids
@@ -58,7 +58,10 @@ class Genesis(object):
         self.db.close()
 
     def update(self):
-        pass
+        """Write the records written so far to the file, so that they can be
+        read before the file is closed"""
+        if self.db.data_mode:
+            self.db.sync()
 
     @property
     def filename(self):
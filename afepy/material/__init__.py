@@ -1,34 +1,45 @@
+"""Material models
+
+Material models are the MaterialModel (and AbaqusMaterial) subclasses found
+in the material library directories and in the user's "materials"
+configuration. The material files are indexed on first use, not on import,
+and the index is kept in the cache directory so that only new or modified
+files (by modification time) are parsed again. A material's module is
+imported only when Material first asks for it.
+
+"""
 import re
 import os
+import json
+import tempfile
 from tools.configurer import cfgparse
 from tools.errors import AFEPYError
 from tools.logger import Logger
 import tools.xpyclbr as xpyclbr
 from tools.misc import load_file
 from core.product import MAT_LIB_DIRS, SUPPRESS_USER_ENV
+from core.runtime import opts
 
-def find_materials():
-    """Find material models
-
-    """
-    logger = Logger("console")
+# bump when the layout of the index changes
+INDEX_VERSION = 1
+INDEX = "materials.json"
 
-    errors = []
-    mat_libs = {}
-    rx = re.compile(r"(?:^|[\\b_\\.-])[Mm]at")
-    a = ["MaterialModel", "AbaqusMaterial"]
-    # gather and verify all files
-    search_dirs = [d for d in MAT_LIB_DIRS]
+def search_dirs():
+    """The material library directories and user material files"""
+    dirs = [d for d in MAT_LIB_DIRS]
     if not SUPPRESS_USER_ENV:
         for user_mat in cfgparse("materials"):
             user_mat = os.path.realpath(user_mat)
-            if user_mat not in search_dirs:
-                search_dirs.append(user_mat)
+            if user_mat not in dirs:
+                dirs.append(user_mat)
+    return dirs
 
-    # go through each item in search_dirs and generate a list of material
-    # interface files. if item is a directory gather all files that match rx;
-    # if it's a file, add it to the list of material files
-    for item in search_dirs:
+def find_material_files(logger):
+    """Candidate material interface files in the search directories. For a
+    directory, these are the python files whose names match rx"""
+    rx = re.compile(r"(?:^|[\\b_\\.-])[Mm]at")
+    mat_files = []
+    for item in search_dirs():
         if os.path.isfile(item):
             d, files = os.path.split(os.path.realpath(item))
             files = [files]
@@ -36,43 +47,139 @@ def find_materials():
             d = item
             files = [f for f in os.listdir(item) if rx.search(f)]
         else:
-            logger.warn("{0} no such directory or file, skipping".format(d),
-                               report_who=1)
+            logger.warn("{0} no such directory or file, skipping".format(item),
+                        report_who=1)
             continue
-        files = [f for f in files if f.endswith(".py")]
+        files = [f for f in sorted(files) if f.endswith(".py")]
 
         if not files:
             logger.warn("{0}: no mat files found".format(d), report_who=1)
 
-        # go through files and determine if it's an interface file. if it is,
-        # load it and add it to mat_libs
-        for f in files:
-            module = f[:-3]
-            try:
-                libs = xpyclbr.readmodule(module, [d], ancestors=a)
-            except AttributeError as e:
-                errors.append(e.args[0])
-                logger.error(e.args[0])
-                continue
-            for lib in libs:
-                if lib in mat_libs:
-                    logger.error("{0}: duplicate material".format(lib))
-                    errors.append(lib)
+        mat_files.extend([os.path.join(d, f) for f in files])
+    return mat_files
+
+def read_index(filename):
+    """The cached index of material files, {file: {mtime, classes}}"""
+    try:
+        with open(filename) as fh:
+            index = json.load(fh)
+        if index["version"] != INDEX_VERSION:
+            return {}
+        return index["files"]
+    except (IOError, OSError, ValueError, KeyError):
+        return {}
+
+def write_index(filename, files):
+    """Write the index of material files, replacing the old index in one
+    step so that concurrent runs never read a partial index"""
+    d = os.path.dirname(filename)
+    try:
+        if not os.path.isdir(d):
+            os.makedirs(d)
+        fd, tmp = tempfile.mkstemp(dir=d)
+        with os.fdopen(fd, "w") as fh:
+            json.dump({"version": INDEX_VERSION, "files": files}, fh)
+        os.rename(tmp, filename)
+    except (IOError, OSError):
+        pass
+
+class MaterialDB(object):
+    """Mapping of material name to material class, built on first use"""
+    ancestors = ["MaterialModel", "AbaqusMaterial"]
+
+    def __init__(self):
+        self._index = None
+        self._classes = {}
+
+    @property
+    def index(self):
+        """Mapping of material name to (file, class name)"""
+        if self._index is None:
+            self._index = self.find_materials()
+        return self._index
+
+    def find_materials(self):
+        """Find material models
+
+        """
+        logger = Logger("console")
+        index_file = os.path.join(opts.cache_dir, INDEX)
+        cached = read_index(index_file)
+
+        errors = []
+        files = {}
+        mat_files = find_material_files(logger)
+        for filename in mat_files:
+            mtime = os.path.getmtime(filename)
+            entry = cached.get(filename)
+            if entry is None or entry["mtime"] != mtime:
+                try:
+                    classes = self.read_classes(filename)
+                except AttributeError as e:
+                    errors.append(e.args[0])
+                    logger.error(e.args[0])
+                    continue
+                entry = {"mtime": mtime, "classes": classes}
+            files[filename] = entry
+
+        mat_libs = {}
+        for filename in [f for f in mat_files if f in files]:
+            for (name, class_name) in files[filename]["classes"]:
+                if name in mat_libs:
+                    logger.error("{0}: duplicate material".format(name))
+                    errors.append(name)
                     continue
-                module = load_file(libs[lib].file)
-                mat_class = getattr(module, libs[lib].class_name)
-                if not mat_class.name:
-                    raise AFEPYError("{0}: material name attribute "
-                                     "not defined".format(lib))
-                libs[lib].mat_class = mat_class
-                mat_libs.update({mat_class.name.lower(): libs[lib]})
+                mat_libs[str(name)] = (str(filename), str(class_name))
+
+        if errors:
+            raise AFEPYError(", ".join(errors))
+
+        if files != cached:
+            write_index(index_file, files)
+
+        return mat_libs
+
+    def read_classes(self, filename):
+        """The material classes defined in filename, [(name, class name)]
+
+        The module is imported to find the name of each material, the classes
+        are kept so that they are not imported again by get.
+
+        """
+        d, f = os.path.split(filename)
+        libs = xpyclbr.readmodule(f[:-3], [d], ancestors=self.ancestors)
+        if not libs:
+            return []
+        module = load_file(filename)
+        classes = []
+        for lib in sorted(libs):
+            mat_class = getattr(module, libs[lib].class_name)
+            if not mat_class.name:
+                raise AFEPYError("{0}: material name attribute "
+                                 "not defined".format(lib))
+            self._classes[(filename, lib)] = mat_class
+            classes.append((mat_class.name.lower(), lib))
+        return classes
+
+    def get(self, name, default=None):
+        """The material class name, imported on first request"""
+        try:
+            filename, class_name = self.index[name.lower()]
+        except KeyError:
+            return default
+        key = (filename, class_name)
+        if key not in self._classes:
+            module = load_file(filename)
+            self._classes[key] = getattr(module, class_name)
+        return self._classes[key]
 
-    if errors:
-        raise AFEPYError(", ".join(errors))
+    def __contains__(self, name):
+        return name.lower() in self.index
 
-    return mat_libs
+    def keys(self):
+        return sorted(self.index.keys())
 
-matdb = find_materials()
+matdb = MaterialDB()
 
 materials = {}
 
@@ -85,7 +192,7 @@ def Material(model=None, parameters=None, name=None, density=None):
         else:
             raise AFEPYError("Maximum number of materials exceeded")
 
-    material = matdb.get(model.lower()).mat_class
+    material = matdb.get(model)
     if material is None:
         raise AFEPYError("'{0}' is not a material".format(model))
     if isinstance(parameters, dict):
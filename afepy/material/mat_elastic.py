@@ -3,12 +3,14 @@ import numpy as np
 from material.material import MaterialModel
 from material.completion import EC_BULK, EC_SHEAR
 from tools.datastructs import ARRAY, SYMTEN
+from tools.logger import ConsoleLogger as logger
 
 class Elastic(MaterialModel):
     """Plane strain elastic material"""
     name = "elastic"
     param_names = ("E", "NU")
     properties = [EC_BULK, EC_SHEAR]
+    batch = True
 
     def setup(self):
         self.E, self.v = self.parameters
@@ -33,10 +35,8 @@ class Elastic(MaterialModel):
                       [0,   0,   0,   0,   0,   c44]], dtype=np.float64)
         return C
 
-    def update_state(self, time, dtime, temp, dtemp, energy, rho, F0, F,
-        strain, dstrain, elec_field, user_field, ndi, nshr, ntens, coords,
-        elem_num, gauss_point, step_num, stress, ddsdde, xtra):
-
+    def tangent(self, ndi, nshr):
+        """Tangent stiffness for the ndi direct and nshr shear components"""
         if nshr == 1:
             # Modify the stiffness for 2D according to:
             # 1) Plane strain: Remove rows and columns of the stiffness
@@ -47,18 +47,28 @@ class Elastic(MaterialModel):
             if ndi == 2:
                 # plane stress
                 # Invert the stiffness to get the compliance
-                idx = [[[0], [1], [3]], [0, 1, 3]]
-                ddsdde[:] = np.linalg.inv(np.linalg.inv(self.C)[idx])
+                idx = np.ix_([0, 1, 3], [0, 1, 3])
+                return np.linalg.inv(np.linalg.inv(self.C)[idx])
             elif ndi == 3:
                 # plane strain
-                idx = [[[0], [1], [2], [3]], [0, 1, 2, 3]]
-                ddsdde[:] = self.C[idx]
+                idx = np.ix_([0, 1, 2, 3], [0, 1, 2, 3])
+                return self.C[idx]
             else:
                 logger.raise_error("unknown ndi, nshr combo")
-        else:
-            ddsdde[:] = self.C
+        return self.C
 
+    def update_state(self, time, dtime, temp, dtemp, energy, rho, F0, F,
+        strain, dstrain, elec_field, user_field, ndi, nshr, ntens, coords,
+        elem_num, gauss_point, step_num, stress, ddsdde, xtra):
+
+        ddsdde[:] = self.tangent(ndi, nshr)
         dstress = np.dot(ddsdde, dstrain)
         stress[:ntens] += dstress
 
         return
+
+    def update_state_batch(self, strain, dstrain, stress, statev, ndi, nshr,
+                           ntens, time=0., dtime=1., coords=None, kstep=0):
+        D = self.tangent(ndi, nshr)
+        stress[:, :ntens] += np.dot(dstrain, D.T)
+        return np.tile(D, (stress.shape[0], 1, 1))
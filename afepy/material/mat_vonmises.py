@@ -1,12 +1,15 @@
 import numpy as np
 
-from material import Material
-from tools.io import logger
-I6 = np.array([1.0, 1.0, 1.0, 0.0, 0.0, 0.0])
-
-class VonMises(Material):
+from material.material import MaterialModel
+from material.completion import EC_BULK, EC_SHEAR
+from tools.datastructs import ARRAY, SYMTEN
+from tools.errors import AFEPYError
+from tools.logger import ConsoleLogger as logger
+
+class VonMises(MaterialModel):
+    """Von Mises plasticity with linear isotropic/kinematic hardening"""
     name = "vonmises"
-    param_names = ["K",    # Linear elastic bulk modulus
+    param_names = ("K",    # Linear elastic bulk modulus
                    "G",    # Linear elastic shear modulus
                    "Y0",   # yield stress in uniaxial tension
                            #    (yield in tension) = sqrt(3) * (yield in shear)
@@ -16,11 +19,9 @@ class VonMises(Material):
                            #    BETA = 0 for isotropic hardening
                            #    0 < BETA < 1 for mixed hardening
                            #    BETA = 1 for kinematic hardening
-                  ]
-    param_defaults = [0.0, 0.0, 1.0e30, 0.0, 0.0]
-
-    def __init__(self, *args, **kwargs):
-        logger.error("Von Mises not finished")
+                  )
+    properties = [EC_BULK, EC_SHEAR]
+    batch = True
 
     def setup(self):
         """Set up the von Mises material
@@ -28,112 +29,96 @@ class VonMises(Material):
         """
         # Check inputs
         errors = []
-        K, G, Y0, H, BETA= self.params
+        K, G, Y0, H, BETA = self.parameters
         if K <= 0.0: errors.append("Bulk modulus K must be positive")
         if G <= 0.0: errors.append("Shear modulus G must be positive")
         nu = (3.0 * K - 2.0 * G) / (6.0 * K + 2.0 * G)
         if nu > 0.5: errors.append("Poisson's ratio > .5")
         if nu < -1.0: errors.append("Poisson's ratio < -1.")
-        if nu < 0.0: logger.warn("#---- WARNING: negative Poisson's ratio")
+        if nu < 0.0: logger.warn("negative Poisson's ratio")
         if Y0 == 0.0: Y0 = 1.0e99
 
         if errors:
-            logger.error("The following errors were encountered during "
-                         "setup:\n{0}".format("\n".join(errors)))
+            raise AFEPYError("The following errors were encountered during "
+                             "setup:\n{0}".format("\n".join(errors)))
 
         self.bulk_modulus = K
         self.shear_modulus = G
-        self.params["Y0"] = Y0
-        self.params["H"] = H
-        self.params["BETA"] = BETA
+        self.Y0, self.H, self.beta = Y0, H, BETA
 
         # Register State Variables
+        self.register_variable("STRESS", SYMTEN)
+        self.register_variable("DSTRAIN", SYMTEN)
         self.sv_names = ["EQPS", "Y",
-                         "BS_XX", "BS_YY", "BS_ZZ", "BS_XY", "BS_XZ", "BS_YZ"]
+                         "BS_XX", "BS_YY", "BS_ZZ", "BS_XY", "BS_YZ", "BS_XZ"]
         sv_values = [0.0, Y0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
-
-        self.register_xtra_variables(self.sv_names)
-        self.set_initial_state(sv_values)
-
-    def update_state(self, dt, d, stress, xtra, *args, **kwargs):
-        """Compute updated stress given strain increment
-
-        Parameters
-        ----------
-        dt : float
-            Time step
-
-        d : array_like
-            Deformation rate
-
-        stress : array_like
-            Stress at beginning of step
-
-        xtra : array_like
-            Extra variables
-
-        Returns
-        -------
-        S : array_like
-            Updated stress
-
-        xtra : array_like
-            Updated extra variables
-
-        """
-        G, K = self.shear_modulus, self.bulk_modulus
-        idx = lambda x: self.sv_names.index(x.upper())
-        bs = np.array([xtra[idx('BS_XX')], xtra[idx('BS_YY')], xtra[idx('BS_ZZ')],
-                       xtra[idx('BS_XY')], xtra[idx('BS_YZ')], xtra[idx('BS_XZ')]])
-        yn = xtra[idx('Y')]
-
-        de = d * dt
-
-        iso = de[:3].sum() / 3.0 * I6
-        dev = de - iso
-
-        stress_trial = stress + 3.0 * K * iso
-        stress_trial += 2.0 * G * dev
-
-        xi_trial = stress_trial - bs
-        xi_trial_eqv = np.sqrt(3.0 / 2.0) * self.eqv(xi_trial)
-
-        if xi_trial_eqv <= yn:
-            return stress_trial, xtra
-        else:
-            N = xi_trial - xi_trial[:3].sum() / 3.0 * I6
-            N = np.sqrt(2.0 / 3.0) * N / xi_trial_eqv
-            deqps = (xi_trial_eqv - yn) / (3.0 * G + self.params["H"])
-            dps = np.sqrt(3.0 / 2.0) * deqps * N
-
-            radius = 2.0 * G * np.sqrt(3.0 / 2.0) * deqps * N
-            stress_final = stress_trial - radius
-            bs = bs + 2.0 / 3.0 * self.params["H"] * self.params["BETA"] * dps
-
-            xtra[idx('EQPS')] += deqps
-            xtra[idx('Y')] += self.params["H"] * (1.0 - self.params["BETA"]) * deqps
-            xtra[idx('BS_XX')] = bs[0]
-            xtra[idx('BS_YY')] = bs[1]
-            xtra[idx('BS_ZZ')] = bs[2]
-            xtra[idx('BS_XY')] = bs[3]
-            xtra[idx('BS_YZ')] = bs[4]
-            xtra[idx('BS_XZ')] = bs[5]
-            return stress_final, xtra
-
-    def eqv(self, sig):
-        s = sig - sig[:3].sum() / 3.0 * I6
-        return np.sqrt(np.dot(s[:3], s[:3]) + 2 * np.dot(s[3:], s[3:]))
-
-    def jacobian(self, dt, d, stress, xtra, v, *args):
-        """Return the constant stiffness
-        dt : float
-            time step
-
-        d : array_like
-            Deformation rate
-
-        stress : array_like
-            Stress at beginning of step
+        self.register_variable("STATEV", ARRAY, keys=self.sv_names,
+                               ivals=sv_values)
+
+    def tangent(self, ndi, nshr):
+        """Elastic stiffness"""
+        if ndi != 3:
+            raise AFEPYError("von Mises model requires 3 direct stress "
+                             "components")
+        ntens = ndi + nshr
+        K, G = self.bulk_modulus, self.shear_modulus
+        C = np.zeros((ntens, ntens))
+        C[:3, :3] = K - 2. / 3. * G
+        C[range(3), range(3)] = K + 4. / 3. * G
+        C[range(3, ntens), range(3, ntens)] = G
+        return C
+
+    def update_state(self, time, dtime, temp, dtemp, energy, rho, F0, F,
+        strain, dstrain, elec_field, user_field, ndi, nshr, ntens, coords,
+        elem_num, gauss_point, step_num, stress, ddsdde, xtra):
+        ddsdde[:] = self.update_state_batch(
+            strain[np.newaxis], dstrain[np.newaxis], stress[np.newaxis],
+            xtra[np.newaxis], ndi, nshr, ntens, time, dtime)[0]
+
+    def update_state_batch(self, strain, dstrain, stress, statev, ndi, nshr,
+                           ntens, time=0., dtime=1., coords=None, kstep=0):
+        """Radial return of many material points at once
+
+        Notes
+        -----
+        Shear strains are engineering strains. The stiffness returned is the
+        algorithmic (consistent) tangent of the radial return.
 
         """
-        return self.constant_jacobian(v)
+        K, G, H, beta = self.bulk_modulus, self.shear_modulus, self.H, self.beta
+        C = self.tangent(ndi, nshr)
+
+        # elastic trial stress
+        trial = stress + np.dot(dstrain, C.T)
+
+        # deviator of the shifted trial stress and its equivalent value
+        bs = statev[:, 2:2+ntens]
+        xi = trial - bs
+        s = xi.copy()
+        s[:, :3] -= xi[:, :3].sum(axis=1)[:, np.newaxis] / 3.
+        eqv = np.sqrt(1.5 * ((s[:, :3] ** 2).sum(axis=1) +
+                             2. * (s[:, 3:] ** 2).sum(axis=1)))
+
+        # return yielded points to the yield surface
+        y = statev[:, 1]
+        yielded = eqv > y
+        deqps = np.where(yielded, (eqv - y) / (3. * G + H), 0.)
+        n = s * (deqps / np.where(yielded, eqv, 1.))[:, np.newaxis]
+
+        stress[:] = trial - 3. * G * n
+        bs += H * beta * n
+        statev[:, 0] += deqps
+        statev[:, 1] += H * (1. - beta) * deqps
+
+        # consistent tangent at the yielded points
+        D = np.tile(C, (stress.shape[0], 1, 1))
+        if np.any(yielded):
+            theta = 1. - 3. * G * deqps[yielded] / eqv[yielded]
+            thetabar = 3. * G / (3. * G + H) - (1. - theta)
+            N = s[yielded] / (np.sqrt(2. / 3.) * eqv[yielded])[:, np.newaxis]
+            V = np.zeros((ntens, ntens))
+            V[:3, :3] = K
+            D[yielded] = (V + theta[:, np.newaxis, np.newaxis] * (C - V) -
+                          2. * G * thetabar[:, np.newaxis, np.newaxis] *
+                          np.einsum("pi,pj->pij", N, N))
+        return D
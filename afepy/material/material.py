@@ -14,6 +14,7 @@ class MaterialModel(object):
     """Base material class"""
     matmodel = 1
     num_statev = 0
+    batch = False
     __metaclass__ = MetaClass
 
     def __call__(self, time, dtime, temp, dtemp, energy, F0, F,
@@ -63,6 +64,33 @@ class MaterialModel(object):
         raise NotImplementedError("update_state must be defined by individual "
                                   "materials and not the base class")
 
+    def update_state_batch(self, strain, dstrain, stress, statev, ndi, nshr,
+                           ntens, time=0., dtime=1., coords=None, kstep=0):
+        """Update the state of many material points at once
+
+        Parameters
+        ----------
+        strain, dstrain : ndarray
+            Strain and strain increment, shape (n, ntens)
+        stress : ndarray
+            Stress, shape (n, ntens), updated in place
+        statev : ndarray or None
+            State variables, shape (n, num_statev), updated in place
+
+        Returns
+        -------
+        D : ndarray
+            Material stiffness, shape (n, ntens, ntens)
+
+        Notes
+        -----
+        Models implementing this method set the class attribute batch = True.
+        The element layer otherwise calls update_state one point at a time.
+
+        """
+        raise NotImplementedError("update_state_batch not defined by "
+                                  "{0}".format(self.name))
+
     def setup(self, *args, **kwargs):
         pass
 
@@ -0,0 +1,167 @@
+"""On-disk cache of parsed mesh files
+
+The result of parsing a mesh file (see readers.py) is stored in a directory
+of the cache named by the hash of the file's contents, so that a changed
+source file is never read from a stale entry. Arrays are stored as .npy
+files and are memory mapped (copy on write) when read back; everything else
+is stored in the directory's index file, mesh.json.
+
+The cache is controlled by the runtime options, eg
+
+    opts.mesh_cache = False   # always parse the mesh file
+    opts.cache_dir = "/scratch/afepy"
+
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+from core.runtime import opts
+from tools.misc import Namespace
+from tools.logger import ConsoleLogger as logger
+
+# bump when the layout of the cached data changes
+CACHE_VERSION = 1
+INDEX = "mesh.json"
+
+def file_hash(filename, chunk_size=1 << 20):
+    """Hash of the contents of filename"""
+    h = hashlib.sha1()
+    with open(filename, "rb") as fh:
+        while True:
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_entry(filename, kind):
+    key = "{0}-{1}-v{2}".format(kind, file_hash(filename), CACHE_VERSION)
+    return os.path.join(opts.cache_dir, "meshes", key)
+
+def cached_parse(filename, parse, kind):
+    """Parse the mesh file filename with parse, reading the result from the
+    cache if it is there and adding it to the cache if it is not
+
+    Parameters
+    ----------
+    filename : str
+        The mesh file
+    parse : callable
+        parse(filename) returns the parsed mesh Namespace
+    kind : str
+        The kind of file, eg "xml", used in the cache key
+
+    """
+    if not opts.mesh_cache:
+        return parse(filename)
+
+    entry = cache_entry(filename, kind)
+    if os.path.isfile(os.path.join(entry, INDEX)):
+        try:
+            mesh = load(entry)
+            logger.debug("mesh {0} read from cache {1}".format(filename, entry))
+            return mesh
+        except (IOError, OSError, ValueError, KeyError) as e:
+            logger.debug("failed to read mesh cache {0}: {1}".format(entry, e))
+
+    mesh = parse(filename)
+    try:
+        dump(mesh, entry)
+    except (IOError, OSError, TypeError) as e:
+        logger.debug("failed to write mesh cache {0}: {1}".format(entry, e))
+    return mesh
+
+def dump(mesh, entry):
+    """Write the parsed mesh to the cache directory entry
+
+    The directory is first written under a temporary name and then renamed,
+    so that concurrent runs never see a partially written entry.
+
+    """
+    parent = os.path.dirname(entry)
+    if not os.path.isdir(parent):
+        try:
+            os.makedirs(parent)
+        except OSError:
+            if not os.path.isdir(parent):
+                raise
+    tmp = tempfile.mkdtemp(dir=parent)
+    try:
+        index = {"version": CACHE_VERSION,
+                 "mesh": _dump_namespace(mesh, tmp, "mesh")}
+        with open(os.path.join(tmp, INDEX), "w") as fh:
+            json.dump(index, fh)
+        os.rename(tmp, entry)
+    except OSError:
+        # another process wrote the entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+    except:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+def load(entry):
+    """Read the parsed mesh from the cache directory entry"""
+    with open(os.path.join(entry, INDEX)) as fh:
+        index = json.load(fh)
+    if index["version"] != CACHE_VERSION:
+        raise ValueError("mesh cache version mismatch")
+    return _load_namespace(index["mesh"], entry)
+
+def clear():
+    """Remove all cached meshes"""
+    shutil.rmtree(os.path.join(opts.cache_dir, "meshes"), ignore_errors=True)
+
+def _dump_namespace(ns, d, prefix):
+    """Describe the Namespace ns, writing its arrays to directory d"""
+    items = {}
+    for key in ns.keys:
+        val = getattr(ns, key)
+        name = "{0}.{1}".format(prefix, key)
+        if isinstance(val, dict):
+            keys, vals = zip(*val.items()) if val else ((), ())
+            np.save(os.path.join(d, name + ".keys.npy"), np.array(keys))
+            np.save(os.path.join(d, name + ".vals.npy"), np.array(vals))
+            items[key] = {"type": "dict", "file": name}
+        elif isinstance(val, (list, tuple)) and \
+             all(isinstance(x, Namespace) for x in val):
+            items[key] = {"type": "namespaces",
+                          "items": [_dump_namespace(x, d, "{0}.{1}".format(name, i))
+                                    for (i, x) in enumerate(val)]}
+        elif isinstance(val, (np.ndarray, list, tuple)):
+            np.save(os.path.join(d, name + ".npy"), np.asarray(val))
+            items[key] = {"type": "array", "file": name}
+        else:
+            if isinstance(val, np.generic):
+                val = val.item()
+            items[key] = {"type": "scalar", "value": val}
+    return {"id": ns._id, "items": items}
+
+def _load_namespace(desc, d):
+    kwds = {}
+    for (key, item) in desc["items"].items():
+        if item["type"] == "dict":
+            f = os.path.join(d, item["file"])
+            keys = np.load(f + ".keys.npy").tolist()
+            vals = np.load(f + ".vals.npy").tolist()
+            kwds[key] = dict(zip(keys, vals))
+        elif item["type"] == "namespaces":
+            kwds[key] = [_load_namespace(x, d) for x in item["items"]]
+        elif item["type"] == "array":
+            f = os.path.join(d, item["file"] + ".npy")
+            try:
+                kwds[key] = np.load(f, mmap_mode="c").view(np.ndarray)
+            except ValueError:
+                # empty arrays cannot be mapped
+                kwds[key] = np.load(f)
+        else:
+            val = item["value"]
+            if isinstance(val, type(u"")):
+                val = str(val)
+            kwds[key] = val
+    return Namespace(str(desc["id"]), **kwds)
@@ -1,3 +1,4 @@
+import numpy as np
 from numpy import zeros, int32, array, float64
 from numpy.linalg import det
 
@@ -113,6 +114,13 @@ def num_face_nodes(num_coord, num_el_node):
          (3,4): 3, (3,10): 6, (3,8): 4, (3,20): 8}[(num_coord, num_el_node)]
     return n
 
+def num_faces(num_coord, num_el_node):
+    """Number of faces of an element"""
+    n = {(2,3): 3, (2,4): 4,
+         (2,6): 3, (2,8): 4,
+         (3,4): 4, (3,10): 4, (3,8): 6, (3,20): 6}[(num_coord, num_el_node)]
+    return n
+
 def face(num_coord, num_el_node, region):
     R = region.upper()
     if num_coord == 2:
@@ -121,7 +129,7 @@ def face(num_coord, num_el_node, region):
 
     elif num_coord == 3:
         if num_el_node in (8, 20):
-            d = {"ILO": 3, "IHI": 1, "JLO": 0, "JHI": 2, "KLO": 4, "KHI": 5}
+            d = {"ILO": 5, "IHI": 3, "JLO": 2, "JHI": 4, "KLO": 0, "KHI": 1}
 
     return d[R]
 
@@ -196,3 +204,79 @@ def face_nodes(num_coord, num_el_node, face_num):
                 nodes[:] = [3, 7, 4, 0, 19, 15, 16, 11]
 
     return nodes
+
+def contains_point(num_coord, num_el_node, X, x, tol=1E-08, maxiter=20):
+    """Which of the elements with nodal coordinates X contain the point x
+
+    The natural coordinates of x are found in each element, barycentric
+    coordinates for triangles and tetrahedra and the inverse of the
+    isoparametric map for quadrilaterals and hexahedra.  The geometry of
+    quadratic elements is approximated by their corner nodes.
+
+    Parameters
+    ----------
+    X : ndarray (num_elem, num_el_node, num_coord)
+        Nodal coordinates of the elements, all of the same type
+
+    x : ndarray (num_coord,)
+        The point
+
+    tol : float
+        Tolerance on the natural coordinates, points on the boundary of an
+        element are contained in it
+
+    Returns
+    -------
+    inside : ndarray of bool (num_elem,)
+
+    Examples
+    --------
+    A point in the bounding box of a skewed quadrilateral, but not in it
+
+    >>> X = np.array([[[0., 0.], [1., 0.], [2., 1.], [0., 1.]]])
+    >>> contains_point(2, 4, X, np.array([1.5, .2]))
+    array([False])
+    >>> contains_point(2, 4, X, np.array([1.5, .8]))
+    array([ True])
+
+    """
+    d = num_coord
+    if num_el_node in (3, 6) or (d == 3 and num_el_node in (4, 10)):
+        # simplex: x = X0 + sum(lam_i * (Xi - X0))
+        X = X[:, :d+1, :d]
+        A = np.transpose(X[:, 1:] - X[:, :1], (0, 2, 1))
+        lam, ok = _solve(A, x[:d] - X[:, 0])
+        return ok & np.all(lam >= -tol, axis=1) & (lam.sum(axis=1) <= 1. + tol)
+
+    # quadrilateral or hexahedron, Newton iterations of the (bi/tri)linear
+    # map of the corner nodes
+    nc = 2 ** d
+    X = X[:, :nc, :d]
+    c = elem_corner_coord(d, num_el_node)[:nc]
+    xi = np.zeros((X.shape[0], d))
+    ok = np.ones(X.shape[0], dtype=bool)
+    for it in range(maxiter):
+        f = 1. + xi[:, np.newaxis, :] * c
+        N = np.prod(f, axis=2) / nc
+        dN = np.empty(f.shape)
+        for j in range(d):
+            dN[:, :, j] = c[:, j] * np.prod(np.delete(f, j, axis=2), axis=2) / nc
+        r = x[:d] - np.einsum("ea,eai->ei", N, X)
+        J = np.einsum("eai,eaj->eij", X, dN)
+        dxi, converged = _solve(J, r)
+        ok &= converged
+        xi += dxi
+        if np.amax(np.abs(dxi)) < 1E-12:
+            break
+    return ok & np.all(np.abs(xi) <= 1. + tol, axis=1)
+
+def _solve(A, b):
+    """Solve the stacked systems A[e] x[e] = b[e], systems that are singular
+    are not solved and are flagged False"""
+    d = A.shape[-1]
+    ok = np.abs(np.linalg.det(A)) > 1E-300
+    A = np.where(ok[:, np.newaxis, np.newaxis], A, np.eye(d))
+    x = np.linalg.solve(A, b[:, :, np.newaxis])[:, :, 0]
+    ok &= np.all(np.isfinite(x), axis=1)
+    x[~ok] = 0.
+    return x, ok
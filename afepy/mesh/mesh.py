@@ -6,6 +6,7 @@ except ImportError:
     OrderedDict = dict
 
 import readers as readers
+import cache as cache
 from utils import *
 from consts import *
 
@@ -71,6 +72,51 @@ class MeshBase(object):
         self.elem_ids = np.arange(connect.shape[0], dtype=np.int)
         self.elem_num_map = elem_num_map
 
+        # search structures, built on first use
+        self._node_index = None
+        self._node_elem_graph = None
+        self._node_graph = None
+        self._elem_blk = None
+        self._elem_box = None
+
+    @property
+    def node_index(self):
+        """Bucket grid of the nodal coordinates"""
+        if self._node_index is None:
+            self._node_index = BucketGrid(self.coords)
+        return self._node_index
+
+    @property
+    def node_elem_graph(self):
+        """Node to element adjacency (indptr, indices), the elements connected
+        to node i are indices[indptr[i]:indptr[i+1]]"""
+        if self._node_elem_graph is None:
+            self._node_elem_graph = node_elem_graph(self.connect, self.num_node)
+        return self._node_elem_graph
+
+    @property
+    def node_graph(self):
+        """Node to node adjacency (indptr, indices), the nodes sharing an
+        element with node i are indices[indptr[i]:indptr[i+1]]"""
+        if self._node_graph is None:
+            self._node_graph = node_graph(self.connect, self.num_node)
+        return self._node_graph
+
+    def elems_of_nodes(self, nodes):
+        """The elements connected to any of nodes"""
+        indptr, indices = self.node_elem_graph
+        return np.unique(gather(indptr, indices, nodes))
+
+    @property
+    def elem_blk_index(self):
+        """Element to block lookup, elem_blk_index[e] is the index of the
+        block containing element e, or -1 if e is not in a block"""
+        if self._elem_blk is None:
+            self._elem_blk = -np.ones(self.num_cell, dtype=np.int)
+            for (i, eb) in enumerate(self.element_blocks):
+                self._elem_blk[eb.elem_ids] = i
+        return self._elem_blk
+
     @property
     def mesh(self):
         return self
@@ -184,11 +230,7 @@ class MeshBase(object):
                 elements = np.array(range(self.num_cell), dtype=np.int)
 
             elif elements.lower() == "unassigned":
-                assigned = []
-                for elem_blk in self.element_blocks:
-                    assigned.extend(elem_blk.elem_ids)
-                elements = list(set(self.elem_ids) - set(assigned))
-                elements = np.array(elements, dtype=np.int)
+                elements = np.where(self.elem_blk_index < 0)[0]
 
             else:
                 raise AFEPYError("{0}: unrecognized option".format(elements))
@@ -199,22 +241,15 @@ class MeshBase(object):
             elements = np.array(elements, dtype=np.int)
 
         self.blocks[name] = ElementBlock(name, elements, exo_id)
+        self._elem_blk = None
         return self.blocks[name]
 
     def run_diagnostics(self):
         self.find_orphans()
 
     def find_orphans(self):
-        orphans = []
-        for elem_id in range(self.num_cell):
-            orphaned = True
-            for elem_blk in self.element_blocks:
-                if elem_id in elem_blk.elem_ids:
-                    orphaned = False
-                    break
-            if orphaned:
-                orphans.append(elem_id)
-        if orphans:
+        orphans = np.where(self.elem_blk_index < 0)[0]
+        if len(orphans):
             o = ", ".join("{0}".format(x) for x in orphans)
             raise AFEPYError("Orphaned elements detected.  All elements "
                              "must be assigned to an element block.  "
@@ -269,17 +304,14 @@ class MeshBase(object):
         return self.nodesets[name]
 
     def nodes_in_region(self, region, tol=None):
-        found_nodes = []
+        nodes = None
         #tjfulle: tol should be based on characteristic element length
         tol = tol or 1.E-08
         for r in region.split("&&"):
             axis, pos = self.get_axis_pos(r)
-            nodes, els = self.members_at_position(axis, pos, tol=tol)
-            found_nodes.append(set(nodes))
-        nodes = found_nodes[0]
-        for others in found_nodes[1:]:
-            nodes = nodes & others
-        return list(nodes)
+            found = self.node_index.query_plane(axis, pos, tol)
+            nodes = found if nodes is None else np.intersect1d(nodes, found)
+        return nodes.tolist()
 
     def Sideset(self, name, surfaces=None, exo_id=None, region=None, mapped=1):
         """Assign side sets to the mesh
@@ -332,21 +364,15 @@ class MeshBase(object):
 
         if region is not None:
             # look for acceptable domain names
-            if self.type != "grid":
-                exit("cannot yet set sideset by region")
-
             try:
                 axis = DOMAINS[region.upper()]
             except KeyError:
-                raise AFEPYError("{0}: invalid sideset region".format(surfaces))
-
-            nodes, els = self.members_at_position(axis[0], self.extremum[axis])
+                raise AFEPYError("{0}: invalid sideset region".format(region))
 
-            # Side sets are defined on an element face.  Loop through elements,
-            # store the element number, face number, and the traction
-            face = geom.face(self.num_coord, self.connect.shape[1], region)
-            for elem_num in els:
-                sset_surfs.extend([elem_num, face])
+            # Side sets are defined on an element face, find the faces on
+            # the boundary of the mesh
+            surfs = self.faces_at_position(axis[0], self.extremum[axis])
+            sset_surfs.extend(surfs.ravel())
 
         sset_surfs = np.array(sset_surfs).reshape(-1, 2)
         self.sidesets[name] = Sideset(name, exo_id, sset_surfs)
@@ -382,7 +408,71 @@ class MeshBase(object):
             position
 
         """
-        return members_at_position(self.coords, self.connect, axis, pos, tol=tol)
+        nodes = self.node_index.query_plane(axis, pos, tol)
+        return nodes, self.elems_of_nodes(nodes)
+
+    def faces_at_position(self, axis, pos, tol=1E-08):
+        """Returns the element faces whose nodes all lie on the plane
+        x[axis] == pos
+
+        Returns
+        -------
+        surfaces : ndarray (num_face, 2)
+            surfaces[i] is the (element, face) pair of the ith face, ordered
+            by element
+
+        """
+        nodes, elems = self.members_at_position(axis, pos, tol=tol)
+        on_plane = np.zeros(self.num_node + 1, dtype=bool)
+        on_plane[nodes] = True
+        conn = self.connect[elems]
+
+        # elements with different numbers of nodes have different faces
+        num_el_node = np.sum(conn >= 0, axis=1)
+        surfs = []
+        for n in np.unique(num_el_node):
+            these = num_el_node == n
+            for face_num in range(geom.num_faces(self.num_coord, n)):
+                face_nodes = geom.face_nodes(self.num_coord, n, face_num)
+                found = np.all(on_plane[conn[these][:, face_nodes]], axis=1)
+                surfs.extend([(e, face_num) for e in elems[these][found]])
+        surfs = np.array(sorted(surfs), dtype=np.int).reshape(-1, 2)
+        return surfs
+
+    def elems_at_point(self, x, tol=1E-08):
+        """Returns the elements that contain the point x
+
+        Candidates are the elements whose bounding box contains x, they are
+        kept if the natural coordinates of x in the element are inside the
+        element (to within tol).  Points on a shared boundary are contained
+        in each element sharing it.
+
+        """
+        if self._elem_box is None:
+            conn = np.where(self.connect >= 0, self.connect,
+                            self.connect[:, :1])
+            X = self.coords[conn]
+            lo, hi = X.min(axis=1), X.max(axis=1)
+            self._elem_box = (lo, hi, np.max(hi - lo))
+        lo, hi, size = self._elem_box
+
+        # nodes of elements containing x are no farther than the largest
+        # element from x
+        x = np.asarray(x, dtype=np.float64)
+        nodes = self.node_index.query_box(x - size - tol, x + size + tol)
+        elems = self.elems_of_nodes(nodes)
+        inside = np.all((lo[elems] - tol <= x) & (x <= hi[elems] + tol), axis=1)
+        elems = elems[inside]
+
+        # elements with different numbers of nodes have different geometries
+        conn = self.connect[elems]
+        num_el_node = np.sum(conn >= 0, axis=1)
+        inside = np.zeros(len(elems), dtype=bool)
+        for n in np.unique(num_el_node):
+            these = np.where(num_el_node == n)[0]
+            X = self.coords[conn[these, :n]]
+            inside[these] = geom.contains_point(self.num_coord, n, X, x, tol)
+        return elems[inside]
 
     def check_elem_block(self, elem_block_id, prop=None):
         if elem_block_id not in self.blocks:
@@ -459,7 +549,10 @@ class MeshBase(object):
     @classmethod
     def from_xml(cls, filename=None, string=None):
 
-        xmesh = readers.parse_xml(filename=filename, string=string)
+        if filename is not None:
+            xmesh = cache.cached_parse(filename, readers.parse_xml, "xml")
+        else:
+            xmesh = readers.parse_xml(string=string)
         mesh = cls("unstructured", xmesh.num_dim, xmesh.coords, xmesh.connect,
                    xmesh.node_num_map, xmesh.elem_num_map)
 
@@ -478,7 +571,7 @@ class MeshBase(object):
     @classmethod
     def from_genesis(cls, filename):
 
-        gmesh = readers.parse_genesis(filename)
+        gmesh = cache.cached_parse(filename, readers.parse_genesis, "genesis")
         mesh = cls("unstructured", gmesh.num_dim, gmesh.coords, gmesh.connect,
                    gmesh.node_num_map, gmesh.elem_num_map)
 
@@ -499,3 +592,8 @@ class MeshBase(object):
         from writers import XML
         a = XML.from_mesh(self)
         a.write(filename)
+
+    def tovtk(self, filename, compress=False):
+        from writers import VTK
+        a = VTK.from_mesh(self, compress=compress)
+        a.write(filename)
@@ -2,8 +2,12 @@ import os
 import re
 import gzip
 import numpy as np
-import xml.dom.minidom as xdom
+from io import BytesIO
 from os.path import splitext
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 
 from consts import *
 from geom import DOMAINS, get_elem_type
@@ -37,17 +41,20 @@ def parse_xml(filename=None, string=None):
         raise AFEPYError("parse_xml must receive only 1 of "
                          "filename or string argument")
     if string:
-        doc = xdom.parseString(string)
+        if not isinstance(string, bytes):
+            string = string.encode("utf-8")
+        source = BytesIO(string)
     elif filename.endswith(".gz"):
-        f = gzip.open(filename, "rb")
-        doc = xdom.parseString(f.read())
-        f.close()
+        source = gzip.open(filename, "rb")
     else:
-        doc = xdom.parse(filename)
+        source = open(filename, "rb")
+    try:
+        root, arrays = iterparse_mesh(source)
+    finally:
+        source.close()
 
-    root = doc.getElementsByTagName("Mesh")[0]
     (num_dim, nodes, conn, nsdict, ssdict, blkdict,
-     node_num_map, elem_num_map) = parse_xml_mesh(root)
+     node_num_map, elem_num_map) = parse_xml_mesh(root, arrays)
 
     # format sidesets
     sidesets = []
@@ -71,7 +78,70 @@ def parse_xml(filename=None, string=None):
                      nodesets=nodesets, elem_num_map=elem_num_map,
                      blocks=blocks)
 
-def parse_xml_mesh(mesh):
+def iterparse_mesh(source):
+    """Incrementally parse the Mesh document read from the file object source
+
+    Returns
+    -------
+    mesh : Element
+        The Mesh element
+    arrays : dict
+        arrays[el] is the array of data of the Vertices or Connectivity
+        element el
+
+    Notes
+    -----
+    The text of the Vertices and Connectivity elements, the bulk of the
+    document, is converted to an array as soon as the element is read and
+    then dropped from the tree.
+
+    """
+    root = None
+    arrays = {}
+    try:
+        for (event, el) in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = el
+                continue
+            if el.tag == "Vertices":
+                arrays[el] = text_to_array(el.text, np.float64)
+                el.text = None
+            elif el.tag == "Connectivity":
+                offsets = Int(el.get("offsets", "0"))
+                arrays[el] = text_to_array(el.text, np.int32, offsets + 1)
+                el.text = None
+    except ET.ParseError as e:
+        raise AFEPYError("failed to parse mesh: {0}".format(e))
+    if root is None or root.tag != "Mesh":
+        raise AFEPYError("expected Mesh document")
+    return root, arrays
+
+def text_to_array(text, dtype, num_col=None):
+    """Convert the whitespace (or comma) separated text to a 2D array
+
+    Parameters
+    ----------
+    text : str
+        One row per line
+    dtype : dtype
+        The array data type
+    num_col : int
+        Number of columns, defaults to the number of items on the first
+        nonblank line
+
+    """
+    text = (text or "").replace(",", " ")
+    if num_col is None:
+        first = text.lstrip()
+        i = first.find("\n")
+        num_col = len((first if i < 0 else first[:i]).split())
+    data = np.fromstring(text, dtype=dtype, sep=" ")
+    if not num_col or data.size % num_col:
+        raise AFEPYError("expected {0} columns of data".format(num_col))
+    return data.reshape(-1, num_col)
+
+def parse_xml_mesh(mesh, arrays):
     """Parse the (single) Mesh element
 
     Notes
@@ -85,15 +155,15 @@ def parse_xml_mesh(mesh):
 
     """
     mesh_types = ("DEFAULT", "GRID")
-    grid = mesh.getAttribute("type")
     mesh_type = get_attribute(mesh, "type", "DEFAULT").upper()
     if mesh_type not in mesh_types:
         raise AFEPYError("{0}: unrecognized mesh type".format(mesh_type))
 
     if mesh_type == "DEFAULT":
-        node_num_map, nodes, num_dim = parse_nodes(mesh)
-        elem_num_map, conn, eblx = parse_conn(mesh, num_dim, node_num_map)
+        node_nums, nodes, num_dim = parse_nodes(mesh, arrays)
+        elem_num_map, conn, eblx = parse_conn(mesh, num_dim, node_nums, arrays)
         nodes = nodes[:, :num_dim]
+        node_num_map = dict(zip(node_nums.tolist(), range(len(node_nums))))
 
     elif mesh_type == "GRID":
         num_dim, nodes, conn, node_num_map, elem_num_map = parse_grid_mesh(mesh)
@@ -116,20 +186,20 @@ def parse_grid_mesh(mesh):
 
     """
     # get the grid
-    grid = mesh.getElementsByTagName("Grid")
+    grid = mesh.findall("Grid")
     if not grid:
         raise AFEPYError("No Mesh.Grid element found")
     if len(grid) > 1:
         raise AFEPYError("Only 1 Mesh.Grid element supported")
 
     grid = grid[0]
-    shape = grid.getAttribute("shape")
+    shape = grid.get("shape")
     if not shape:
         raise AFEPYError("no shape attribute found for Mesh.Grid")
     shape = tolist(shape, dtype=Int)
     num_dim = len(shape)
 
-    lengths = grid.getAttribute("lengths")
+    lengths = grid.get("lengths")
     if not lengths:
         raise AFEPYError("no lengths attribute found for Mesh.Grid")
     lengths = tolist(lengths, dtype=Float)
@@ -141,9 +211,14 @@ def parse_grid_mesh(mesh):
     elem_num_map = dict([(i+1, i) for i in range(conn.shape[0])])
     return num_dim, nodes, conn, node_num_map, elem_num_map
 
-def parse_nodes(mesh):
+def parse_nodes(mesh, arrays):
     """Parse the (single) Nodes element
 
+    Returns
+    -------
+    node_nums : ndarray of int
+        node_nums[i] is the node number (in the input file) of node i
+
     Notes
     -----
     <Vertices dimension="int">
@@ -152,34 +227,29 @@ def parse_nodes(mesh):
     </Vertices>
 
     """
-    els = mesh.getElementsByTagName("Vertices")
+    els = mesh.findall("Vertices")
     if not els:
-        return
+        raise AFEPYError("No Mesh.Vertices element found")
     if len(els) > 1:
         raise AFEPYError("Only one Vertices block supported")
-    dimension = els[0].getAttribute("dimension")
+    dimension = els[0].get("dimension")
     if dimension is None:
         raise AFEPYError("Missing Vertices.dimension attribute")
     dimension = Int(dimension)
-    nodes = child_data_to_array(els[0], np.float64)
+    nodes = arrays[els[0]]
 
     # nodes given as
     # node_num  x   y   [z]
-    # reorder them in ascending node number
-    node_nums = []
-    for node_num in np.array(nodes[:, 0], dtype=np.int):
-        if node_num in node_nums:
-            raise AFEPYError("{0}: duplicate node number".format(node_num))
-        node_nums.append(node_num)
-    node_nums = np.array(node_nums)
-    node_num_map = {}
-    for (i, n) in enumerate(node_nums):
-        node_num_map[n] = i
+    node_nums = np.array(nodes[:, 0], dtype=np.int)
+    unique_nums, counts = np.unique(node_nums, return_counts=True)
+    if np.any(counts > 1):
+        node_num = unique_nums[counts > 1][0]
+        raise AFEPYError("{0}: duplicate node number".format(node_num))
     nodes = nodes[:, 1:dimension+1]
-    return node_num_map, nodes, dimension
+    return node_nums, nodes, dimension
 
-def parse_conn(mesh, num_dim, node_num_map):
-    """Parse the (single) Connectivity element
+def parse_conn(mesh, num_dim, node_nums, arrays):
+    """Parse the Connectivity elements
 
     Notes
     -----
@@ -189,46 +259,47 @@ def parse_conn(mesh, num_dim, node_num_map):
     </Connectivity>
 
     """
-    els = mesh.getElementsByTagName("Connectivity")
+    els = mesh.findall("Connectivity")
     if not els:
-        return
+        raise AFEPYError("No Mesh.Connectivity element found")
+
+    # map from node number to node index
+    index = -np.ones(node_nums.max() + 1, dtype=np.int32)
+    index[node_nums] = np.arange(len(node_nums), dtype=np.int32)
 
     N = 0
     _conn = []
-    elem_num_map = {}
-    num_elem = 0
+    _elem_nums = []
     blx = {}
     for el in els:
-        offsets = Int(el.getAttribute("offsets"))
-        conn = child_data_to_array(el, np.int32)
+        offsets = Int(el.get("offsets"))
+        conn = arrays[el]
         elem_nums = conn[:, 0]
         conn = conn[:, 1:]
-        for (i, nodes) in enumerate(conn):
-            elem_num_map[elem_nums[i]] = num_elem
-            for (j, n) in enumerate(nodes):
-                try:
-                    nodes[j] = node_num_map[n]
-                except KeyError:
-                    raise AFEPYError("{0}: node not defined".format(n))
-            conn[i] = nodes
-            num_elem += 1
         if conn.shape[1] != offsets:
             raise AFEPYError("incorrect offsets")
-        _conn.append(conn)
+        undefined = (conn < 0) | (conn >= len(index))
+        undefined[~undefined] = index[conn[~undefined]] < 0
+        if np.any(undefined):
+            raise AFEPYError("{0}: node not defined".format(conn[undefined][0]))
+        _conn.append(index[conn])
+        _elem_nums.append(elem_nums)
         N = max(N, offsets)
-        block = el.getAttribute("block")
+        block = el.get("block")
         if block:
             blx[block] = {"name": block,
                           "exo_id": BLOCK_ID_START+500+len(blx),
                           "elem_type": get_elem_type(num_dim, offsets),
                           "elements": elem_nums}
 
+    elem_nums = np.concatenate(_elem_nums)
+    elem_num_map = dict(zip(elem_nums.tolist(), range(len(elem_nums))))
+
+    connect = -np.ones((len(elem_nums), N), dtype=np.int32)
     elem_num = 0
-    connect = -np.ones((num_elem, N), dtype=np.int32)
     for item in _conn:
-        for (i, nodes) in enumerate(item):
-            connect[elem_num, :len(nodes)] = nodes
-            elem_num += 1
+        connect[elem_num:elem_num+item.shape[0], :item.shape[1]] = item
+        elem_num += item.shape[0]
 
     return elem_num_map, connect, blx
 
@@ -243,12 +314,12 @@ def parse_ns(mesh, coords, conn, node_num_map):
     </Nodeset>
 
     """
-    els = mesh.getElementsByTagName("Nodeset")
+    els = mesh.findall("Nodeset")
     if not els:
         return
     nsdict = {}
     for el in els:
-        attributes = dict(el.attributes.items())
+        attributes = dict(el.items())
         exo_id = attributes.get("exo_id")
         if exo_id is not None:
             exo_id = Int(exo_id)
@@ -305,12 +376,12 @@ def parse_ss(mesh, elem_num_map):
     </Sideset>
 
     """
-    els = mesh.getElementsByTagName("Sideset")
+    els = mesh.findall("Sideset")
     if not els:
         return
     ssdict = {}
     for el in els:
-        attributes = dict(el.attributes.items())
+        attributes = dict(el.items())
         exo_id = attributes.get("exo_id")
         if exo_id is not None:
             exo_id = Int(exo_id)
@@ -366,14 +437,14 @@ def parse_blocks(mesh, num_dim, connect, elem_num_map):
              ...
 
     """
-    els = mesh.getElementsByTagName("ElementBlock")
+    els = mesh.findall("ElementBlock")
     if not els:
         return {}
 
     blocks = {}
     assigned = []
     for el in els:
-        attributes = dict(el.attributes.items())
+        attributes = dict(el.items())
         exo_id = attributes.get("exo_id")
         if exo_id is not None:
             exo_id = Int(exo_id)
@@ -437,7 +508,7 @@ def parse_blocks(mesh, num_dim, connect, elem_num_map):
                                  "same number of nodes".format(name))
 
         blocks[name]["elements"] = np.array(elems, dtype=np.int)
-        elem_type = el.getAttribute("elem_type")
+        elem_type = el.get("elem_type", "")
         if not elem_type.strip():
             elem_type = get_elem_type(num_dim, num_node_per_elem)
         blocks[name]["elem_type"] = elem_type
@@ -447,25 +518,21 @@ def parse_blocks(mesh, num_dim, connect, elem_num_map):
 
 def child_nodes_to_dict(el, dtype=None, upcase=False):
     node_dict = {}
-    for child in el.childNodes:
-        if child.nodeType == child.TEXT_NODE:
-            continue
-        data = " ".join(x.strip() for x in child.firstChild.data.split("\n")
+    for child in el:
+        data = " ".join(x.strip() for x in (child.text or "").split("\n")
                         if x.split())
         if dtype is not None:
             data = dtype(data)
         if upcase:
-            name = child.nodeName.upper()
+            name = child.tag.upper()
         else:
-            name = child.nodeName
+            name = child.tag
         node_dict[name] = data
     return node_dict
 
 
 def find_region(el):
-    if el.nodeType != el.ELEMENT_NODE:
-        return
-    data = " ".join(el.firstChild.data.split("\n")).strip()
+    data = " ".join((el.text or "").split("\n")).strip()
     return DOMAINS.get(data.upper())
 
 
@@ -477,11 +544,8 @@ def child_data_to_array(el, dtype, flatten=False):
 
 
 def child_data_to_list(el, flatten=False, dtype=str):
-    if el.nodeType != el.ELEMENT_NODE:
-        return
     data = []
-    elc = el.firstChild
-    for line in elc.data.split("\n"):
+    for line in (el.text or "").split("\n"):
         if not line.split():
             continue
         data.append([dtype(x) for x in re.split("[\, ]", line) if x.split()])
@@ -493,8 +557,7 @@ def child_data_to_list(el, flatten=False, dtype=str):
 def get_attribute(element, attr, default, dtype=str):
     if dtype == int: dtype = Int
     elif dtype == float: dtype = Float
-    try: val = element.attributes[attr].value
-    except KeyError: val = default
+    val = element.get(attr, default)
     return dtype(val)
 
 def tolist(string, dtype=str):
@@ -110,7 +110,17 @@ def members_at_position(nodes, conn, axis, pos, tol=1E-08):
     pos : float
         position
 
+    Examples
+    --------
+    Nodes not used by any element are found, with no elements
+
+    >>> nodes = np.array([[0., 0.], [1., 0.], [1., 1.], [0., 1.], [2., 0.]])
+    >>> members_at_position(nodes, [[0, 1, 2, 3]], 1, 0.)
+    (array([0, 1, 4]), array([0]))
+
     """
+    num_node = len(nodes)
+
     # find the nodes.
     # where returns a tuple of arrays, one for each
     # dimension of coords, containing the indices where the condition is
@@ -118,9 +128,140 @@ def members_at_position(nodes, conn, axis, pos, tol=1E-08):
     # in the node number - which corresponds to its row - we only take the
     # first component
     nodes = np.where(np.abs(nodes[:, axis] - pos) < tol)[0]
-    elements = [i for node in nodes for (i, el) in enumerate(conn)
-                if node >= 0 and node in el]
-    return nodes, np.unique(elements)
+    indptr, indices = node_elem_graph(conn, num_node=num_node)
+    return nodes, np.unique(gather(indptr, indices, nodes))
+
+
+def node_elem_graph(conn, num_node=None):
+    """Node to element adjacency in compressed sparse row form
+
+    Parameters
+    ----------
+    conn : ndarray (num_elem, max_node_per_elem)
+        Element connectivity, padded with negative node numbers
+
+    Returns
+    -------
+    indptr, indices : ndarray of int
+        The elements connected to node i are indices[indptr[i]:indptr[i+1]],
+        in ascending order
+
+    """
+    conn = np.asarray(conn)
+    elems = np.repeat(np.arange(conn.shape[0]), conn.shape[1])
+    nodes = conn.ravel()
+    defined = nodes >= 0
+    elems, nodes = elems[defined], nodes[defined]
+    if num_node is None:
+        num_node = nodes.max() + 1 if len(nodes) else 0
+    order = np.argsort(nodes, kind="mergesort")
+    indptr = np.zeros(num_node + 1, dtype=np.int)
+    indptr[1:] = np.cumsum(np.bincount(nodes, minlength=num_node))
+    return indptr, elems[order]
+
+
+def node_graph(conn, num_node=None):
+    """Node to node adjacency in compressed sparse row form, two nodes are
+    adjacent if they share an element
+
+    Returns
+    -------
+    indptr, indices : ndarray of int
+        The nodes adjacent to node i (not including i) are
+        indices[indptr[i]:indptr[i+1]], in ascending order
+
+    """
+    conn = np.asarray(conn)
+    m = conn.shape[1]
+    rows = np.repeat(conn, m, axis=1).ravel()
+    cols = np.tile(conn, (1, m)).ravel()
+    keep = (rows >= 0) & (cols >= 0) & (rows != cols)
+    rows, cols = rows[keep], cols[keep]
+    if num_node is None:
+        num_node = conn.max() + 1 if conn.size else 0
+    key = np.unique(rows * num_node + cols)
+    indptr = np.zeros(num_node + 1, dtype=np.int)
+    indptr[1:] = np.cumsum(np.bincount(key // num_node, minlength=num_node))
+    return indptr, key % num_node
+
+
+def gather(indptr, indices, rows):
+    """The concatenation of rows of the compressed sparse row structure
+    (indptr, indices)"""
+    rows = np.asarray(rows, dtype=np.int)
+    start = indptr[rows]
+    count = indptr[rows + 1] - start
+    # position of each gathered item in indices
+    offset = np.repeat(start - np.cumsum(count) + count, count)
+    return indices[offset + np.arange(count.sum())]
+
+
+class BucketGrid(object):
+    """Uniform grid of buckets over a cloud of points, used to find the
+    points in a box (or near a point, or on a plane) without visiting every
+    point
+
+    Parameters
+    ----------
+    points : ndarray (num_point, num_dim)
+    bucket_size : int
+        The average number of points per bucket
+
+    """
+    def __init__(self, points, bucket_size=8):
+        self.points = np.asarray(points, dtype=np.float64)
+        num_point, num_dim = self.points.shape
+        self.lo = self.points.min(axis=0)
+        span = self.points.max(axis=0) - self.lo
+        n = max(1, int(round((num_point / float(bucket_size)) ** (1. / num_dim))))
+        self.shape = np.where(span > 0., n, 1)
+        self.h = np.where(span > 0., span / self.shape, 1.)
+
+        # sort the points by bucket and store the buckets in compressed
+        # sparse row form
+        keys = np.ravel_multi_index(self.bucket(self.points).T, self.shape)
+        self.order = np.argsort(keys, kind="mergesort")
+        self.indptr = np.searchsorted(keys[self.order],
+                                      np.arange(np.prod(self.shape) + 1))
+
+    def bucket(self, x):
+        """Bucket coordinates of the points x"""
+        i = np.floor((x - self.lo) / self.h)
+        return np.clip(i, 0, self.shape - 1).astype(np.int)
+
+    def query_box(self, lo, hi):
+        """Points in the box lo <= x <= hi, in ascending order
+
+        lo and hi may contain infinite components
+
+        """
+        lo = np.asarray(lo, dtype=np.float64)
+        hi = np.asarray(hi, dtype=np.float64)
+        ilo, ihi = self.bucket(np.vstack((lo, hi)))
+        axes = [np.arange(a, b + 1) for (a, b) in zip(ilo, ihi)]
+        keys = np.ravel_multi_index([a.ravel() for a in
+                                     np.meshgrid(*axes, indexing="ij")],
+                                    self.shape)
+        candidates = gather(self.indptr, self.order, keys)
+        x = self.points[candidates]
+        inside = np.all((x >= lo) & (x <= hi), axis=1)
+        return np.sort(candidates[inside])
+
+    def query_point(self, x, tol):
+        """Points within distance tol of the point x"""
+        x = np.asarray(x, dtype=np.float64)
+        candidates = self.query_box(x - tol, x + tol)
+        d = np.sqrt(np.sum((self.points[candidates] - x) ** 2, axis=1))
+        return candidates[d <= tol]
+
+    def query_plane(self, axis, pos, tol):
+        """Points whose axis coordinate is within tol of pos"""
+        lo = np.empty(self.points.shape[1])
+        lo.fill(-np.inf)
+        hi = -lo
+        lo[axis], hi[axis] = pos - tol, pos + tol
+        nodes = self.query_box(lo, hi)
+        return nodes[np.abs(self.points[nodes, axis] - pos) < tol]
 
 
 def bounding_box(coords):
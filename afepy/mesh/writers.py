@@ -1,7 +1,11 @@
+import sys
+import zlib
 import numpy as np
 import xml.dom.minidom as xdom
 from os.path import splitext
+from xml.sax.saxutils import quoteattr
 from readers import parse_xml
+from tools.misc import Namespace
 
 INDENT = 2
 def arrtostr2(a, fmt=" .18f", indent="", newl="\n"):
@@ -13,132 +17,254 @@ def arrtostr(a, fmt=" .18f", newl="\n", indent=""):
     return "{0}{3}{1}{0}{2}".format(newl, a1, indent[:-INDENT], indent)
 
 
-class VTK:
+# VTK cell type of each (num_dim, num_node_per_elem)
+VTK_CELL_TYPES = {(1, 2): 3,   # VTK_LINE
+                  (2, 3): 5,   # VTK_TRIANGLE
+                  (2, 4): 9,   # VTK_QUAD
+                  (2, 6): 22,  # VTK_QUADRATIC_TRIANGLE
+                  (2, 8): 23,  # VTK_QUADRATIC_QUAD
+                  (3, 4): 10,  # VTK_TETRA
+                  (3, 8): 12,  # VTK_HEXAHEDRON
+                  (3, 6): 13,  # VTK_WEDGE
+                  (3, 5): 14,  # VTK_PYRAMID
+                  (3, 10): 24, # VTK_QUADRATIC_TETRA
+                  (3, 20): 25, # VTK_QUADRATIC_HEXAHEDRON
+                  }
 
-    @classmethod
-    def vtk_cell_types(cls, num_dim, num_node_per_elem):
-        return {(2, 3): 5, # VTK_TRIANGLE
-                (2, 4): 9, # VTK_QUAD
-                (3, 4): 10, # VTK_TETRA
-                (3, 8): 12, # VTK_HEXAHEDRON
-                (3, 6): 13, # VTK_WEDGE
-                (3, 5): 14, # VTK_PYRAMID
-                }[(num_dim, num_node_per_elem)]
+# VTK names of numpy types
+VTK_TYPES = {"i1": "Int8", "u1": "UInt8", "i2": "Int16", "u2": "UInt16",
+             "i4": "Int32", "u4": "UInt32", "i8": "Int64", "u8": "UInt64",
+             "f4": "Float32", "f8": "Float64"}
+
+
+class AppendedData(object):
+    """The binary data arrays of the appended data section of a VTK XML file
+
+    Each array is written as a UInt64 header followed by the array's bytes.
+    If compressed, the array is split in to blocks that are compressed with
+    zlib and the header holds the number of blocks, the (uncompressed) block
+    size and size of the last block, and the compressed size of each block
+    (vtkZLibDataCompressor's layout).
 
-    def __init__(self, nodes, connect, blocks, sidesets, nodesets):
+    """
+    def __init__(self, compress=False, block_size=1 << 15):
+        self.compress = compress
+        self.block_size = block_size
+        self.blocks = []
+        self.offset = 0
+
+    def add(self, a):
+        """Append the array a, returns its offset in the appended data"""
+        raw = np.ascontiguousarray(a).tostring()
+        if not self.compress:
+            block = np.array([len(raw)], dtype=np.uint64).tostring() + raw
+        else:
+            n = self.block_size
+            chunks = [raw[k:k+n] for k in range(0, len(raw), n)]
+            chunks = [zlib.compress(c) for c in chunks]
+            last = len(raw) - n * (len(chunks) - 1) if chunks else 0
+            header = [len(chunks), n, last] + [len(c) for c in chunks]
+            block = np.array(header, dtype=np.uint64).tostring() + "".join(chunks)
+        offset = self.offset
+        self.blocks.append(block)
+        self.offset += len(block)
+        return offset
+
+    def write(self, fh):
+        for block in self.blocks:
+            fh.write(block)
+
+
+class VTU(object):
+    """Unstructured grid in VTK's XML (.vtu) format with the data arrays
+    written in binary to the appended data section of the file
+
+    Parameters
+    ----------
+    nodes : ndarray (num_node, num_dim)
+        Nodal coordinates
+    connect : ndarray (num_elem, max_node_per_elem)
+        Element connectivity, padded with negative node numbers
+    compress : bool
+        Compress the data arrays with zlib
+
+    Notes
+    -----
+    Data arrays are added with add_point_data, add_cell_data, and
+    add_field_data and are written straight from their numpy buffers.
+
+    """
+    def __init__(self, nodes, connect, compress=False):
+        nodes = np.asarray(nodes, dtype=np.float64)
+        connect = np.asarray(connect)
         num_node, num_dim = nodes.shape
-        num_elem, num_node_per_elem = connect.shape
-        elem_type = self.vtk_cell_types(num_dim, num_node_per_elem)
+        self.points = np.zeros((num_node, 3))
+        self.points[:, :num_dim] = nodes
+
+        defined = connect >= 0
+        num_node_per_elem = defined.sum(axis=1)
+        self.connectivity = connect[defined].astype(np.int64)
+        self.offsets = np.cumsum(num_node_per_elem).astype(np.int64)
+        try:
+            self.types = np.array([VTK_CELL_TYPES[(num_dim, n)]
+                                   for n in num_node_per_elem], dtype=np.uint8)
+        except KeyError as e:
+            raise ValueError("no VTK cell type for {0}".format(e.args[0]))
+
+        self.compress = compress
+        self.point_data = []
+        self.cell_data = []
+        self.field_data = []
+
+    @property
+    def num_point(self):
+        return self.points.shape[0]
+
+    @property
+    def num_cell(self):
+        return self.types.shape[0]
+
+    def add_point_data(self, name, a):
+        a = np.asarray(a)
+        if a.shape[0] != self.num_point:
+            raise ValueError("{0}: expected data at {1} points".format(
+                name, self.num_point))
+        self.point_data.append((name, a))
+
+    def add_cell_data(self, name, a):
+        a = np.asarray(a)
+        if a.shape[0] != self.num_cell:
+            raise ValueError("{0}: expected data at {1} cells".format(
+                name, self.num_cell))
+        self.cell_data.append((name, a))
+
+    def add_field_data(self, name, a):
+        self.field_data.append((name, np.asarray(a)))
 
-        self.doc = xdom.Document()
-        root = self.doc.createElementNS("VTK", "VTKFile")
-        root.setAttribute("type", "UnstructuredGrid")
-        root.setAttribute("version", "0.1")
-        root.setAttribute("byte_order", "LittleEndian")
-        self.doc.appendChild(root)
-
-        # Unstructured grid element
-        usgrid = self.doc.createElementNS("VTK", "UnstructuredGrid")
-        root.appendChild(usgrid)
-
-        # Piece 0 (only one)
-        piece = self.doc.createElementNS("VTK", "Piece")
-        piece.setAttribute("NumberOfPoints", str(num_node))
-        piece.setAttribute("NumberOfCells", str(num_elem))
-        usgrid.appendChild(piece)
-
-        # Points
-        points = self.doc.createElementNS("VTK", "Points")
-        piece.appendChild(points)
-
-        # Point location data
-        point_coords = self.doc.createElementNS("VTK", "DataArray")
-        point_coords.setAttribute("type", "Float32")
-        point_coords.setAttribute("format", "ascii")
-        point_coords.setAttribute("NumberOfComponents", "3")
-        points.appendChild(point_coords)
-
-        if num_dim == 2:
-            z = np.zeros(num_node)
-            nodes = np.column_stack((nodes, z))
-        string = arrtostr2(nodes, indent=10*" ")
-        point_coords_data = self.doc.createTextNode(string)
-        point_coords.appendChild(point_coords_data)
-
-        # Cells
-        cells = self.doc.createElementNS("VTK", "Cells")
-        piece.appendChild(cells)
-
-        # Cell connectivity
-        cell_connectivity = self.doc.createElementNS("VTK", "DataArray")
-        cell_connectivity.setAttribute("type", "Int32")
-        cell_connectivity.setAttribute("Name", "connectivity")
-        cell_connectivity.setAttribute("format", "ascii")
-        cells.appendChild(cell_connectivity)
-        string = arrtostr2(connect, "d", indent=10*" ")
-        connectivity = self.doc.createTextNode(string)
-        cell_connectivity.appendChild(connectivity)
-
-        cell_offsets = self.doc.createElementNS("VTK", "DataArray")
-        cell_offsets.setAttribute("type", "Int32")
-        cell_offsets.setAttribute("Name", "offsets")
-        cell_offsets.setAttribute("format", "ascii")
-        cells.appendChild(cell_offsets)
-        o = [(i + 1) * num_node_per_elem for i in range(num_elem)]
-        string =  arrtostr(o, "d", indent=10*" ")
-        offsets = self.doc.createTextNode(string)
-        cell_offsets.appendChild(offsets)
-
-        cell_types = self.doc.createElementNS("VTK", "DataArray")
-        cell_types.setAttribute("type", "UInt8")
-        cell_types.setAttribute("Name", "types")
-        cell_types.setAttribute("format", "ascii")
-        cells.appendChild(cell_types)
-        o = [elem_type for i in range(num_elem)]
-        string = arrtostr(o, "d", indent=10*" ")
-        types = self.doc.createTextNode(string)
-        cell_types.appendChild(types)
-
-        fd = self.doc.createElementNS("VTK", "FieldData")
-        root.appendChild(fd)
+    def write(self, filename):
+        appended = AppendedData(compress=self.compress)
+
+        def data_array(a, name=None, indent=8, tuples=False):
+            a = np.asarray(a)
+            if a.dtype.kind == "b":
+                a = a.astype(np.uint8)
+            elif a.dtype.kind in "iu" and a.dtype.itemsize < 4:
+                a = a.astype(np.int32)
+            a = a.astype(a.dtype.newbyteorder("="))
+            attrs = [("type", VTK_TYPES[a.dtype.str[1:]])]
+            if name is not None:
+                attrs.append(("Name", name))
+            if a.ndim > 1:
+                attrs.append(("NumberOfComponents",
+                              str(int(np.prod(a.shape[1:])))))
+            if tuples:
+                attrs.append(("NumberOfTuples", str(a.shape[0])))
+            attrs.append(("format", "appended"))
+            attrs.append(("offset", str(appended.add(a))))
+            attrs = " ".join("{0}={1}".format(k, quoteattr(v))
+                             for (k, v) in attrs)
+            return "{0}<DataArray {1}/>".format(" " * indent, attrs)
+
+        lines = ['<?xml version="1.0"?>']
+        attrs = ('type="UnstructuredGrid" version="1.0" byte_order="{0}" '
+                 'header_type="UInt64"'.format(
+                     "LittleEndian" if sys.byteorder == "little"
+                     else "BigEndian"))
+        if self.compress:
+            attrs += ' compressor="vtkZLibDataCompressor"'
+        lines.append("<VTKFile {0}>".format(attrs))
+        lines.append("  <UnstructuredGrid>")
+        if self.field_data:
+            lines.append("    <FieldData>")
+            lines.extend([data_array(a, name, 6, tuples=True)
+                          for (name, a) in self.field_data])
+            lines.append("    </FieldData>")
+        lines.append('    <Piece NumberOfPoints="{0}" NumberOfCells="{1}">'.format(
+            self.num_point, self.num_cell))
+        for (tag, data) in (("PointData", self.point_data),
+                            ("CellData", self.cell_data)):
+            if not data:
+                continue
+            lines.append("      <{0}>".format(tag))
+            lines.extend([data_array(a, name) for (name, a) in data])
+            lines.append("      </{0}>".format(tag))
+        lines.append("      <Points>")
+        lines.append(data_array(self.points))
+        lines.append("      </Points>")
+        lines.append("      <Cells>")
+        lines.append(data_array(self.connectivity, "connectivity"))
+        lines.append(data_array(self.offsets, "offsets"))
+        lines.append(data_array(self.types, "types"))
+        lines.append("      </Cells>")
+        lines.append("    </Piece>")
+        lines.append("  </UnstructuredGrid>")
+        lines.append('  <AppendedData encoding="raw">')
+
+        with open(filename, "wb") as fh:
+            fh.write("\n".join(lines) + "\n   _")
+            appended.write(fh)
+            fh.write("\n  </AppendedData>\n</VTKFile>\n")
+
+
+class VTK(VTU):
+    """The mesh, with its element blocks, side sets, and node sets as field
+    data, as a VTK unstructured grid"""
+
+    @classmethod
+    def vtk_cell_types(cls, num_dim, num_node_per_elem):
+        return VTK_CELL_TYPES[(num_dim, num_node_per_elem)]
+
+    def __init__(self, nodes, connect, blocks, sidesets, nodesets,
+                 compress=False):
+        super(VTK, self).__init__(nodes, connect, compress=compress)
 
         for block in blocks:
-            name = "ElementBlock_{0}".format(block.id)
-            string = arrtostr(block.elements, "d", indent=10*" ")
-            blkel = self.doc.createElementNS("VTK", "DataArray")
-            blkel.setAttribute("type", "Int32")
-            blkel.setAttribute("Name", name)
-            blkel.setAttribute("NumberOfTuples", str(len(block.elements)))
-            ids = self.doc.createTextNode(string)
-            blkel.appendChild(ids)
-            fd.appendChild(blkel)
+            name = "ElementBlock_{0}".format(block.exo_id)
+            self.add_field_data(name, np.asarray(block.elements, dtype=np.int32))
 
         for sideset in sidesets:
-            name = "Sideset_{0}".format(sideset.id)
-            string = arrtostr2(sideset.data, "d", indent=10*" ")
-            ssel = self.doc.createElementNS("VTK", "DataArray")
-            ssel.setAttribute("type", "Int32")
-            ssel.setAttribute("Name", name)
-            ssel.setAttribute("NumberOfTuples", str(len(sideset.data)*2))
-            ids = self.doc.createTextNode(string)
-            ssel.appendChild(ids)
-            fd.appendChild(ssel)
+            name = "Sideset_{0}".format(sideset.exo_id)
+            data = np.asarray(sideset.data, dtype=np.int32).ravel()
+            self.add_field_data(name, data)
 
         for nodeset in nodesets:
-            name = "Nodeset_{0}".format(nodeset.id)
-            string = arrtostr(nodeset.data, "d", indent=10*" ")
-            nsel = self.doc.createElementNS("VTK", "DataArray")
-            nsel.setAttribute("type", "Int32")
-            nsel.setAttribute("Name", name)
-            nsel.setAttribute("NumberOfTuples", str(len(nodeset.data)))
-            ids = self.doc.createTextNode(string)
-            nsel.appendChild(ids)
-            fd.appendChild(nsel)
+            name = "Nodeset_{0}".format(nodeset.exo_id)
+            self.add_field_data(name, np.asarray(nodeset.data, dtype=np.int32))
 
-    def write(self, filename):
-        with open(filename, "w") as fh:
-            fh.write(self.doc.toprettyxml(indent=" "*INDENT))
-        #doc.writexml(open(filename, "w"), indent="  ", newl='\n')
+    @classmethod
+    def from_mesh(cls, mesh, compress=False):
+        blocks = [Namespace("ElementBlock", exo_id=eb.exo_id,
+                            elements=eb.elem_ids)
+                  for eb in mesh.blocks.values()]
+        sidesets = [Namespace("Sideset", exo_id=ss.exo_id, data=ss.surfaces)
+                    for ss in mesh.sidesets.values()]
+        nodesets = [Namespace("Nodeset", exo_id=ns.exo_id, data=ns.node_ids)
+                    for ns in mesh.nodesets.values()]
+        return cls(mesh.coords, mesh.connect, blocks, sidesets, nodesets,
+                   compress=compress)
+
+
+def write_pvd(filename, datasets):
+    """Write the ParaView collection of the time series datasets
+
+    Parameters
+    ----------
+    filename : str
+        The .pvd file
+    datasets : list of (float, str)
+        The time and file name of each dataset, file names are relative to
+        the directory of the .pvd file
+
+    """
+    lines = ['<?xml version="1.0"?>',
+             '<VTKFile type="Collection" version="0.1">',
+             '  <Collection>']
+    for (time, f) in datasets:
+        lines.append('    <DataSet timestep="{0!r}" part="0" file={1}/>'.format(
+            float(time), quoteattr(f)))
+    lines.extend(['  </Collection>', '</VTKFile>', ''])
+    with open(filename, "w") as fh:
+        fh.write("\n".join(lines))
 
 
 class XML:
@@ -202,11 +328,12 @@ class XML:
     def from_mesh(cls, mesh):
         return cls(mesh.coords, mesh.connect, mesh.node_num_map, mesh.elem_num_map)
 
-def meshtovtk(filename):
+def meshtovtk(filename, compress=False):
     mesh = parse_xml(filename)
     vtkfile = splitext(filename)[0] + ".vtu"
     vtkmesh = VTK(mesh.coords, mesh.connect,
-                  mesh.blocks, mesh.sidesets, mesh.nodesets)
+                  mesh.blocks, mesh.sidesets, mesh.nodesets,
+                  compress=compress)
     vtkmesh.write(vtkfile)
 
 def pvgrid(pvobj, filename):
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+"""Regression checks of the assembly, boundary conditions, linear solvers,
+and mesh utilities
+
+Each check compares two ways of computing the same thing, eg, dense and
+sparse assembly.
+
+"""
+import os
+import sys
+import zlib
+import shutil
+import tempfile
+import numpy as np
+import xml.dom.minidom as xdom
+
+D, F = os.path.split(os.path.realpath(__file__))
+sys.path.insert(0, os.path.dirname(D))
+from afepy import *
+from core.runtime import opts
+from tools.lapackjac import make_solver
+from mesh.utils import BucketGrid
+from mesh.writers import VTK_TYPES
+from meshes import plane_patch_xml
+
+MIXED = """
+<Mesh>
+<Vertices dimension="2">
+ 1 1 0
+ 2 2 0
+ 3 2 1
+ 4 1 1
+ 5 0 0
+ 6 0 1
+ 7 .5 .5
+</Vertices>
+<Connectivity block="Triangles" offsets="3">
+ 1 5 1 7
+ 2 1 4 7
+ 3 7 4 6
+ 4 5 7 6
+</Connectivity>
+<Connectivity block="Quad" offsets="4">
+ 5 1 2 3 4
+</Connectivity>
+</Mesh>
+"""
+
+def main():
+    test_dense_sparse_assembly()
+    test_reduced_full_solve()
+    test_solvers()
+    test_bucket_grid()
+    test_elems_at_point()
+    test_mesh_cache()
+    test_vtu()
+
+def models(sparse=False):
+    """Finite element spaces, displacement and traction boundary conditions
+    of a few small problems"""
+    mat = Material(name="Mat-1", model="elastic", parameters=[1.0E+03, 2.5E-01],
+                   density=2.)
+
+    mesh = Mesh(file=plane_patch_xml)
+    mesh.ElementBlock(name="All", elements="all")
+    mesh.Sideset(name="RHS", surfaces=[[2, 2], [4, 2]])
+    V = FiniteElementSpace(mesh, {"All": FiniteElement("QE4", mat)},
+                           sparse=sparse)
+    yield (V, [DirichletBC(V, nodes=[1, 4, 7], dofs="X"),
+               DirichletBC(V, nodes=[1], dofs="Y")],
+           [NeumannBC(V, sideset="RHS", traction=[1., 0.])])
+
+    mesh = Mesh(type="grid", dimension=3, nx=4, ny=4, nz=4, lx=1., ly=1., lz=1.)
+    mesh.ElementBlock(name="All", elements="all")
+    mesh.Sideset(name="top", region="KHI")
+    V = FiniteElementSpace(mesh, {"All": FiniteElement("HEX8", mat)},
+                           sparse=sparse)
+    yield (V, [DirichletBC(V, region="KLO", dofs="Z"),
+               DirichletBC(V, nodes=[1], dofs="XY"),
+               DirichletBC(V, nodes=[17], dofs="Y"),
+               DirichletBC(V, region="KHI", dofs="Z", mag=.02)],
+           [NeumannBC(V, sideset="top", traction=[0., 1., 1.])])
+
+    mesh = Mesh(string=MIXED)
+    V = FiniteElementSpace(mesh, {"Quad": FiniteElement("QE4", mat),
+                                  "Triangles": FiniteElement("TRIE3", mat)},
+                           sparse=sparse)
+    yield (V, [DirichletBC(V, nodes=[5], dofs="XY"),
+               DirichletBC(V, nodes=[6], dofs="X")],
+           [NeumannBC(V, ((5, 2),), traction=[2., 0.])])
+
+def dense(A):
+    return A.toarray() if hasattr(A, "toarray") else np.asarray(A)
+
+def test_dense_sparse_assembly():
+    """Dense and sparse assembly give the same global arrays"""
+    for (m1, m2) in zip(models(sparse=False), models(sparse=True)):
+        (V1, bcs1, t1), (V2, bcs2, t2) = m1, m2
+        u1, u2 = SolutionSpace(V1), SolutionSpace(V2)
+        du = np.random.RandomState(0).rand(V1.num_dof) * 1.E-03
+        V1.update_kinematics(u1, du)
+        V2.update_kinematics(u2, du)
+        A1, A2 = V1.stiffness(u1, du), V2.stiffness(u2, du)
+        assert not hasattr(A1, "toarray") and hasattr(A2, "toarray")
+        assert np.allclose(A1, dense(A2), rtol=1.E-12, atol=1.E-12)
+        assert np.allclose(A1, A1.T)
+        for lumped_mass in (0, 1):
+            M1 = V1.mass(lumped_mass=lumped_mass)
+            M2 = V2.mass(lumped_mass=lumped_mass)
+            assert np.allclose(M1, dense(M2), rtol=1.E-12, atol=1.E-12)
+        assert np.allclose(np.diag(V1.mass(lumped_mass=1)), V1.lumped_mass())
+        assert np.allclose(V1.force(t1), V2.force(t2))
+        assert np.allclose(V1.residual(u1, du), V2.residual(u2, du))
+
+def test_reduced_full_solve():
+    """Solving the system with the constrained rows replaced and solving the
+    reduced free dof system give the same solution"""
+    for sparse in (False, True):
+        for (V, bcs, tractions) in models(sparse=sparse):
+            u = SolutionSpace(V)
+            du = np.zeros(V.num_dof)
+            A = V.stiffness(u, du)
+            q = V.force(tractions)
+
+            A1, b1 = A.copy(), np.asarray(q).copy()
+            V.apply_bcs(u, bcs, A1, b1, du)
+            x1 = linsolve(A1, b1)
+
+            b2 = np.asarray(q).copy()
+            Af, bf, expand = V.reduce_bcs(u, bcs, A, b2, du)
+            assert Af.shape[0] == V.num_dof - len(V.dirichlet_set(bcs))
+            x2 = expand(linsolve(Af, bf))
+            assert np.allclose(x1, x2, rtol=1.E-10, atol=1.E-12)
+
+            # the constraints are satisfied
+            bcset = V.dirichlet_set(bcs)
+            assert np.allclose(x1[bcset.rows], bcset.mag)
+
+def test_solvers():
+    """The registered linear solvers agree, with and without a renumbering
+    of the unknowns"""
+    V, bcs, tractions = list(models(sparse=True))[1]
+    u = SolutionSpace(V)
+    A = V.stiffness(u)
+    b = np.asarray(V.force(tractions)).copy()
+    Af, bf, expand = V.reduce_bcs(u, bcs, A, b)
+    x = np.linalg.solve(dense(Af), bf)
+    perm = np.random.RandomState(1).permutation(len(bf))
+    for (name, precond) in (("direct", None), ("lu", None),
+                            ("cholesky", None), ("cg", "jacobi"),
+                            ("cg", "ilu"), ("gmres", "jacobi")):
+        for (Ak, p) in ((Af, None), (Af, perm), (dense(Af), None)):
+            if precond == "ilu" and not hasattr(Ak, "toarray"):
+                continue
+            solver = make_solver(name, precond=precond, tol=1.E-12, perm=p)
+            assert np.allclose(solver(Ak, bf), x, rtol=1.E-8, atol=1.E-12), \
+                (name, precond, p is None)
+
+def test_bucket_grid():
+    """BucketGrid queries find the same points as a brute force search"""
+    rng = np.random.RandomState(2)
+    for num_dim in (2, 3):
+        points = rng.rand(500, num_dim)
+        points[:20, 0] = .5
+        grid = BucketGrid(points)
+        for k in range(10):
+            lo = rng.rand(num_dim) * .8
+            hi = lo + rng.rand(num_dim) * .4
+            found = np.all((points >= lo) & (points <= hi), axis=1)
+            assert np.array_equal(grid.query_box(lo, hi), np.where(found)[0])
+
+            x, tol = rng.rand(num_dim), .1
+            d = np.sqrt(np.sum((points - x) ** 2, axis=1))
+            assert np.array_equal(np.sort(grid.query_point(x, tol)),
+                                  np.where(d <= tol)[0])
+        plane = grid.query_plane(0, .5, 1.E-08)
+        assert np.array_equal(plane, np.arange(20))
+
+def test_elems_at_point():
+    """Points inside a mesh of skewed elements are in exactly one element"""
+    rng = np.random.RandomState(3)
+    for num_dim in (2, 3):
+        if num_dim == 2:
+            mesh = Mesh(type="grid", dimension=2, nx=5, ny=4, lx=1., ly=1.)
+        else:
+            mesh = Mesh(type="grid", dimension=3, nx=3, ny=3, nz=3,
+                        lx=1., ly=1., lz=1.)
+        X = mesh.coords
+        lo, hi = X.min(axis=0), X.max(axis=0)
+        interior = np.all((X > lo + 1.E-08) & (X < hi - 1.E-08), axis=1)
+        X[interior] += (rng.rand(interior.sum(), X.shape[1]) - .5) * .15
+        for x in lo + rng.rand(100, num_dim) * (hi - lo):
+            assert len(mesh.elems_at_point(x)) == 1
+        for e in range(mesh.num_cell):
+            centroid = X[mesh.connect[e]].mean(axis=0)
+            assert list(mesh.elems_at_point(centroid)) == [e]
+
+def test_mesh_cache():
+    """A mesh file is parsed once, changed files are parsed again"""
+    cache_dir, mesh_cache = opts.cache_dir, opts.mesh_cache
+    d = tempfile.mkdtemp()
+    try:
+        opts.cache_dir, opts.mesh_cache = d, True
+        filename = os.path.join(d, "mixed.xml")
+        with open(filename, "w") as fh:
+            fh.write(MIXED)
+        m1 = Mesh(file=filename)
+        entries = os.listdir(os.path.join(d, "meshes"))
+        assert len(entries) == 1
+        m2 = Mesh(file=filename)
+        assert os.listdir(os.path.join(d, "meshes")) == entries
+        assert np.array_equal(m1.coords, m2.coords)
+        assert np.array_equal(m1.connect, m2.connect)
+        assert list(m1.elem_blk_ids) == list(m2.elem_blk_ids)
+
+        with open(filename, "w") as fh:
+            fh.write(MIXED.replace(" 3 2 1", " 3 2 1.5"))
+        m3 = Mesh(file=filename)
+        assert len(os.listdir(os.path.join(d, "meshes"))) == 2
+        assert np.allclose(m3.coords[2, :2], [2., 1.5])
+    finally:
+        opts.cache_dir, opts.mesh_cache = cache_dir, mesh_cache
+        shutil.rmtree(d)
+
+def read_vtu(filename):
+    """The attributes of the Piece and the data arrays of a .vtu file written
+    by mesh.writers.VTU"""
+    with open(filename, "rb") as fh:
+        head, appended = fh.read().split('<AppendedData encoding="raw">', 1)
+    appended = appended[appended.index("_") + 1:]
+    doc = xdom.parseString(head + "</VTKFile>")
+    compressed = doc.documentElement.getAttribute("compressor")
+    dtypes = dict((v, k) for (k, v) in VTK_TYPES.items())
+    arrays = {}
+    for node in doc.getElementsByTagName("DataArray"):
+        offset = int(node.getAttribute("offset"))
+        if not compressed:
+            n = int(np.frombuffer(appended[offset:offset+8], np.uint64)[0])
+            raw = appended[offset+8:offset+8+n]
+        else:
+            num_block = int(np.frombuffer(appended[offset:offset+8],
+                                          np.uint64)[0])
+            header = np.frombuffer(appended[offset:offset+8*(3+num_block)],
+                                   np.uint64).astype(int)
+            pos, raw = offset + 8 * (3 + num_block), ""
+            for size in header[3:]:
+                raw += zlib.decompress(appended[pos:pos+size])
+                pos += size
+        a = np.frombuffer(raw, dtype=dtypes[node.getAttribute("type")])
+        ncomp = node.getAttribute("NumberOfComponents")
+        if ncomp:
+            a = a.reshape(-1, int(ncomp))
+        name = node.getAttribute("Name") or node.parentNode.tagName
+        arrays[name] = a
+    piece = doc.getElementsByTagName("Piece")[0]
+    return dict(piece.attributes.items()), arrays
+
+def test_vtu():
+    """The .vtu files hold the mesh and the solution of every step"""
+    V, bcs, tractions = list(models())[0]
+    u = SolutionSpace(V)
+    StaticLinearSolve(V, u, bcs, tractions)
+    disp = np.zeros((V.num_node, 3))
+    disp[:, :V.num_dim] = u.u.reshape(V.num_node, -1)
+    d = tempfile.mkdtemp()
+    try:
+        for compress in (False, True):
+            pvd = os.path.join(d, "job.pvd")
+            VTKFile(pvd, compress=compress) << u
+            steps = xdom.parse(pvd).getElementsByTagName("DataSet")
+            assert [float(s.getAttribute("timestep")) for s in steps] == [0., 1.]
+            f = os.path.join(d, steps[-1].getAttribute("file"))
+            piece, arrays = read_vtu(f)
+            assert int(piece["NumberOfPoints"]) == V.num_node
+            assert int(piece["NumberOfCells"]) == V.num_cell
+            assert np.allclose(arrays["Points"][:, :V.num_dim], V.X)
+            assert np.array_equal(arrays["connectivity"], V.connect.ravel())
+            assert np.allclose(arrays["Displacement"], disp)
+    finally:
+        shutil.rmtree(d)
+
+if __name__ == "__main__":
+    sys.exit(main())
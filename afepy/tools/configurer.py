@@ -33,6 +33,9 @@ def Int(it):
 def Float(it):
     return float(it)
 
+def String(it):
+    return it.strip()
+
 def List(it):
     return [x.strip() for x in it if x.split()]
 
@@ -51,7 +54,17 @@ options = {"materials": {"N": "+", "type": ListOfFiles, "default": []},
                  "sqa": {"N": "?", "type":        Bool, "default": None},
                "debug": {"N": "?", "type":        Bool, "default": None},
            "verbosity": {"N": "?", "type":         Int, "default": None},
-              "nprocs": {"N": "?", "type":         Int, "default": None}}
+              "nprocs": {"N": "?", "type":         Int, "default": None},
+              "sparse": {"N": "?", "type":        Bool, "default": None},
+          "reduce_bcs": {"N": "?", "type":        Bool, "default": None},
+              "solver": {"N": "?", "type":      String, "default": None},
+             "precond": {"N": "?", "type":      String, "default": None},
+          "solver_tol": {"N": "?", "type":       Float, "default": None},
+            "renumber": {"N": "?", "type":      String, "default": None},
+          "mesh_cache": {"N": "?", "type":        Bool, "default": None},
+           "cache_dir": {"N": "?", "type":      String, "default": None},
+             "profile": {"N": "?", "type":        Bool, "default": None},
+        "profile_file": {"N": "?", "type":      String, "default": None}}
 
 
 def write(message):
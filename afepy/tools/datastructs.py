@@ -1,5 +1,6 @@
-from copy import copy
-from numpy import zeros, array, asarray, ndarray, empty, object as npobject
+from numpy import array, ndarray, empty, float64
+from tools.errors import AFEPYError
+from tools.numeric import shared_zeros
 
 SCALAR = 0
 VECTOR = 1
@@ -41,49 +42,72 @@ class Variable:
         self.keys = keys
         self.ivals = ivals
 
-class AttrArray:
-    """Array like object to hold material data. Data are accessible by either
-    index or attribute name. For example, the stress array is accessible by
+def layout(variables, num_dim, ndi, nshr):
+    """Column layout of the variables in a data array
+
+    Returns
+    -------
+    names : list of str
+        Lower case variable names
+    keys : list of str
+        Component names, one per column
+    ix : dict
+        Map from variable name to column slice and from component name to
+        column index
+    ivals : ndarray
+        Initial values of each column
+
+    """
+    ix = {}
+    keys = []
+    ivals = []
+    start = 0
+    names = [v.name.lower() for v in variables]
+    for v in variables:
+        vkeys = xkeys(v.name, v.type, v.keys, num_dim, ndi, nshr)
+        keys.extend(vkeys)
+        nc = len(vkeys)
+        ix[v.name.lower()] = slice(start, start+nc)
+        ix.update([(k, i+start) for (i, k) in enumerate(vkeys)])
+        if v.ivals is not None:
+            assert len(v.ivals) == nc
+            ivals.extend(v.ivals)
+        else:
+            ivals.extend([0.] * nc)
+        start += nc
+    return names, keys, ix, array(ivals, dtype=float64)
+
+class AttrArray(ndarray):
+    """Array to hold material data. The last axis holds the variables, which
+    are accessible by either index or attribute name. For example, the stress
+    array is accessible by
 
     a = AttrArray(...)
     a.stress
 
+    Indexing an AttrArray returns a view that keeps the attribute names, so
+    that a[iel, npt].stress is a view in to the data of a.
+
     """
-    def __init__(self, *args):
-        if args:
-            variables, num_dim, ndi, nshr = args
-            self._ix = {}
-            self.keys = []
-            start = 0
-            data = []
-            self.names = [v.name.lower() for v in variables]
-            for v in variables:
-                keys = xkeys(v.name, v.type, v.keys, num_dim, ndi, nshr)
-                self.keys.extend(keys)
-                nc = len(keys)
-                self._ix[v.name.lower()] = slice(start, start+nc)
-                self._ix.update([(k, i+start) for (i, k) in enumerate(keys)])
-                if v.ivals is not None:
-                    assert len(v.ivals) == nc
-                    data.extend(v.ivals)
-                else:
-                    data.extend([0.] * nc)
-                start += nc
-            self.data = array(data)
-
-    def __str__(self):
-        s = ", ".join("{0:g}".format(x) for x in self.data)
-        s = ", ".join(self.names)
-        return "AttrArray({0})".format(s)
-
-    def __repr__(self):
-        return self.__str__()
-
-    def __len__(self):
-        return len(self.data)
-
-    def __coerce__(self):
-        return self.data.__coerce__()
+    def __new__(cls, variables, num_dim, ndi, nshr, shape=(), shared=False):
+        names, keys, ix, ivals = layout(variables, num_dim, ndi, nshr)
+        shape = tuple(shape) + (len(keys),)
+        if shared:
+            obj = shared_zeros(shape).view(cls)
+        else:
+            obj = empty(shape, dtype=float64).view(cls)
+        obj[...] = ivals
+        obj.names = names
+        obj.keys = keys
+        obj._ix = ix
+        return obj
+
+    def __array_finalize__(self, obj):
+        if obj is None:
+            return
+        self.names = getattr(obj, "names", [])
+        self.keys = getattr(obj, "keys", [])
+        self._ix = getattr(obj, "_ix", {})
 
     def _idx(self, arg):
         if isinstance(arg, (int, slice)):
@@ -94,80 +118,55 @@ class AttrArray:
             return None
 
     def __getattr__(self, key):
+        if key.startswith("_"):
+            raise AttributeError(key)
         idx = self._idx(key)
         if idx is None:
             if key.lower() == "statev":
                 return None
             raise AFEPYError("{0} is not a valid variable".format(key))
-        try:
-            return self.data.__getitem__(idx)
-        except ValueError:
-            return self.__dict__[key]
-
-    def __getitem__(self, i):
-        return self.data.__getitem__(i)
-
-    def __setitem__(self, key, value):
-        idx = self._idx(key)
-        self.data.__setitem__(idx, value)
+        return self.view(ndarray)[..., idx]
 
-    def __copy__(self):
-        cls = self.__class__
-        result = cls()
-        result._ix = dict(self._ix.items())
-        result.names = list(self.names)
-        result.keys = list(self.keys)
-        result.data = self.data.copy()
-        return result
-
-    def copy(self):
-        return self.__copy__()
-
-class BlockData:
+class BlockData(object):
     """Data container for element block data
 
-    """
-    def __init__(self, elements):
+    The data at every integration point of every element in the block are
+    stored in a single (2, num_elem, num_int_pts, num_var) array. Index 0 of
+    the first axis holds the data at the beginning of the step and index 1
+    the data at the end. Indexing returns AttrArray views in to the store,
+    eg, data[1, iel, npt].stress, data[1].stress
 
+    If shared is True, the store is allocated in shared memory so that it can
+    be updated by forked worker processes.
 
+    """
+    def __init__(self, elements, shared=False):
         num_elem = len(elements)
         num_int_pts = elements[0].integration.num_point
-        self.data = empty((2, num_elem, num_int_pts), dtype=npobject)
-        self.data.fill(0.)
-
         varz = elements[0].variables
         nc = elements[0].num_coord
         ndi = elements[0].ndi
         nshr = elements[0].nshr
-        for i in range(num_elem):
-            for j in range(num_int_pts):
-                self.data[0, i, j] = AttrArray(varz, nc, ndi, nshr)
-                self.data[1, i, j] = AttrArray(varz, nc, ndi, nshr)
-
-        self.keys = list(self.data[0, 0, 0].keys)
+        self.data = AttrArray(varz, nc, ndi, nshr,
+                              shape=(2, num_elem, num_int_pts),
+                              shared=shared)
+        self.keys = list(self.data.keys)
 
     def __getitem__(self, arg):
         return self.data.__getitem__(arg)
 
-    def recursive_copy(self, i, j, key=None):
-        _, num_elem, num_int_pts = self.data.shape
-        for a in range(num_elem):
-            for b in range(num_int_pts):
-                if key is None:
-                    self.data[i, a, b] = self.data[j, a, b].copy()
-                else:
-                    x = getattr(self.data[i, a, b], key)
-                    y = getattr(self.data[j, a, b], key)
-                    x[:] = y.copy()
+    def _copy(self, i, j, key=None):
+        if key is None:
+            self.data[i] = self.data[j]
+        else:
+            x = getattr(self.data[i], key)
+            x[...] = getattr(self.data[j], key)
 
     def advance(self, key=None):
-        self.recursive_copy(0, 1, key=key)
+        self._copy(0, 1, key=key)
 
     def reset(self, key=None):
-        self.recursive_copy(1, 0, key=key)
-
-    def __getitemx__(self, arg):
-        return self.data[arg]
+        self._copy(1, 0, key=key)
 
 if __name__ == "__main__":
     class C: pass
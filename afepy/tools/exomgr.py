@@ -4,12 +4,35 @@ import numpy as np
 import datetime
 
 from exojac import ExodusIIFile as ExoFile
+from tools.profiler import timed
 
 class ExodusIIFile:
+    """Write a SolutionSpace to an ExodusII file
+
+    Either after the solution
+
+        file = ExodusIIFile("job.exo")
+        file << u.output(node=["stress"])
+
+    or, to keep memory bounded for long runs, by streaming each converged
+    step to the file as it is computed
+
+        file = ExodusIIFile("job.exo")
+        file.stream(u.output(node=["stress"]), stride=10)
+        StaticNonlinearSolve(V, u, ...)
+        file.close()
+
+    """
     def __init__(self, filename):
         self.exo = ExodusIIManager(filename)
+        self.u = None
 
     def __lshift__(self, u):
+        if u is self.u:
+            # streamed, the snapshots are already written
+            self.close()
+            return
+
         self.exo.put_init(*u.genesis)
 
         # Compute element averages to write to the database
@@ -17,6 +40,20 @@ class ExodusIIFile:
             self.exo.snapshot(*snapshot)
         self.exo.finish()
 
+    def stream(self, u, stride=None):
+        """Write the initial state of u now and each stride-th converged step
+        of u as it is computed"""
+        self.exo.put_init(*u.genesis)
+        u.stream(self.exo, stride=stride)
+        self.u = u
+        return self
+
+    def close(self):
+        if self.u is not None:
+            self.u.stream(None)
+            self.u = None
+        self.exo.finish()
+
 class ExodusIIManager(object):
     """The main ExodusII manager
 
@@ -25,6 +62,7 @@ class ExodusIIManager(object):
         self.filename = filename
         pass
 
+    @timed("output")
     def put_init(self, num_dim, coords, conn, elem_blks,
                  node_sets, side_sets, all_glob_data, all_element_data,
                  elem_num_map, node_data, title=None, d=None):
@@ -189,12 +227,14 @@ class ExodusIIManager(object):
         self.count += 1
         pass
 
+    @timed("output")
     def finish(self):
         # udpate and close the file
         self.exofile.update()
         self.exofile.close()
         return
 
+    @timed("output")
     def snapshot(self, ave, node_data, time, dtime):
         """Dump information from current time step to results file
 
@@ -1,64 +1,442 @@
+"""Linear solvers
+
+Solvers are registered by name in SOLVERS and instantiated with make_solver.
+The solver used by the application solvers is selected through the runtime
+options, eg
+
+    opts.solver = "cg"
+    opts.precond = "amg"
+
+Available solvers are
+
+    direct    dense Cholesky/LU, sparse LU (the default)
+    cholesky  sparse Cholesky (scikit-sparse) or symmetrically ordered LU
+    lu        dense or sparse LU
+    cg        preconditioned conjugate gradient
+    gmres     preconditioned GMRES
+
+and the preconditioners for the iterative solvers are jacobi, ilu, and amg.
+
+Solvers created with a permutation (eg, FiniteElementSpace.dof_order) solve
+the symmetrically permuted system and return the solution in the original
+numbering. Dense symmetric systems of small bandwidth, as produced by a
+bandwidth reducing renumbering, are factored in banded storage.
+
+"""
+import time
+import inspect
+import warnings
+try:
+    from scipy.linalg import cho_factor, cho_solve, lu_factor, lu_solve
+    from scipy.linalg import cholesky_banded, cho_solve_banded
+except ImportError:
+    cho_factor = None
+try:
+    from scipy.sparse.linalg import splu, spilu, cg, gmres, LinearOperator
+except ImportError:
+    splu = None
 try:
-    import scipy.linalg.flapack as flapack
+    from sksparse.cholmod import cholesky as cholmod
 except ImportError:
-    flapack = None
+    cholmod = None
+import numpy as np
 from numpy import asarray
 import numpy.linalg as la
+from core.runtime import opts
 from tools.errors import AFEPYError
+from tools.numeric import issparse, coo_matrix, csr_matrix
 from tools.logger import ConsoleLogger as logger
+from tools.profiler import timed
+
+SOLVERS = {}
+PRECONDITIONERS = {}
+
+def register_solver(cls):
+    SOLVERS[cls.name] = cls
+    return cls
+
+def register_precond(name):
+    def decorator(func):
+        PRECONDITIONERS[name] = func
+        return func
+    return decorator
+
+def make_solver(name=None, **kwargs):
+    """Instantiate the linear solver 'name'. Options not given are taken from
+    the runtime options
 
-def linsolve(A, b, symmetric=True):
-    """Interface to the lapack dposv solve function in scipy.linalg
+    """
+    if name is None:
+        name = opts.solver
+    kwargs.setdefault("precond", opts.precond)
+    kwargs.setdefault("tol", opts.solver_tol)
+    kwargs.setdefault("maxiter", opts.solver_maxiter)
+    try:
+        cls = SOLVERS[name.lower()]
+    except KeyError:
+        raise AFEPYError("{0}: unknown linear solver, choose from "
+                         "{1}".format(name, ", ".join(sorted(SOLVERS))))
+    return cls(**kwargs)
+
+def linsolve(A, b, symmetric=True, solver=None):
+    """Solve the system of equations A x = b
 
     Parameters
     ----------
-    A : ndarray
+    A : ndarray or sparse matrix
         Real, symmetric, positive-definite matrix (the stiffness matrix)
     b : ndarray
         RHS of system of equations
+    symmetric : bool
+        Whether A is symmetric
+    solver : str
+        Name of the solver, defaults to opts.solver
 
     Returns
     -------
-    c : ndarray
     x : ndarray
         Solution to A x = b
-    info : int
-        info < 0 -> bad input
-        info = 0 -> solution is in x
-        ifno > 0 -> singular matrix
 
     Notes
     -----
-    dposv solves the system of equations A x = b using lapack's dposv
-    procedure. This interface function is used to avoid the overhead of
-    calling down in to scipy, converting arrays to fortran order, etc.
+    For repeated solves with the same matrix, create the solver with
+    make_solver, factor A once, and call the solver's solve method.
 
     """
-    try:
-        F = b.asarray()
-    except AttributeError:
-        F = asarray(b)
-
-    use_np_solve = not symmetric or flapack == None
-    x, info = None, 1
-    if not use_np_solve:
-        c, x, info = flapack.dposv(A, F, lower=0, overwrite_a=0, overwrite_b=0)
-        if info < 0:
-            raise AFEPYError("illegal value in {0}-th argument of "
-                             "internal dposv".format(-info))
-        if info != 0:
-            use_np_solve = True
-
-    if use_np_solve:
+    return make_solver(solver, symmetric=symmetric)(A, b)
+
+def _lstsq(A):
+    def solve(b):
         try:
-            x = la.solve(A, F)
-            info = 0
+            return la.solve(A, b), 0
         except la.LinAlgError:
             pass
-
-    if info > 0:
         logger.warn("linsolve failed, using least squares "
                     "to solve system")
-        x = la.lstsq(A, F)[0]
+        return la.lstsq(A, b)[0], 0
+    return solve
+
+def dense_bandwidth(A):
+    """Half bandwidth of the dense matrix A"""
+    i, j = np.nonzero(A)
+    return int(np.abs(i - j).max()) if len(i) else 0
+
+def banded_factor(A, bw):
+    """Cholesky factor the symmetric dense matrix A of half bandwidth bw in
+    (upper) banded storage"""
+    n = A.shape[0]
+    ab = np.zeros((bw + 1, n))
+    for k in range(bw + 1):
+        ab[bw - k, k:] = np.diagonal(A, k)
+    c = cholesky_banded(ab, check_finite=False)
+    return lambda b: (cho_solve_banded((c, False), b, check_finite=False), 0)
+
+def dense_factor(A, symmetric=True):
+    """Factor the dense matrix A
+
+    Returns
+    -------
+    solve : callable
+        solve(b) returns (x, 0)
+
+    """
+    A = asarray(A)
+    if cho_factor is None:
+        return _lstsq(A)
+
+    if symmetric:
+        bw = dense_bandwidth(A)
+        if 4 * bw < A.shape[0]:
+            try:
+                return banded_factor(A, bw)
+            except la.LinAlgError:
+                pass
+        try:
+            c = cho_factor(A, check_finite=False)
+            return lambda b: (cho_solve(c, b, check_finite=False), 0)
+        except la.LinAlgError:
+            pass
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        lu = lu_factor(A, check_finite=False)
+    if np.all(np.diag(lu[0]) != 0.):
+        return lambda b: (lu_solve(lu, b, check_finite=False), 0)
+
+    # singular matrix
+    return _lstsq(A)
+
+def permute(A, perm):
+    """The symmetric permutation A[perm][:, perm] of the dense or sparse
+    matrix A"""
+    if A.shape[0] != len(perm):
+        raise AFEPYError("permutation does not match the size of the system")
+    if issparse(A):
+        return A.tocsr()[perm][:, perm]
+    return asarray(A)[np.ix_(perm, perm)]
+
+class LinearSolver(object):
+    """Base class for linear solvers
+
+    The matrix is first factored (or otherwise prepared) with factor and the
+    system then solved for one or more right hand sides with solve. The
+    factorization is kept so that it can be reused for as long as the matrix
+    is unchanged, eg, by a modified Newton iteration.
+
+    Timing and iteration counts are accumulated over the life of the solver
+    and are reported by summary.
+
+    """
+    name = None
+    needs_scipy = True
+
+    def __init__(self, symmetric=True, precond=None, tol=None, maxiter=None,
+                 block_size=1, perm=None):
+        if self.needs_scipy and splu is None:
+            raise AFEPYError("{0} solver requires scipy".format(self.name))
+        self.symmetric = symmetric
+        self.precond = precond
+        self.tol = 1.E-10 if tol is None else tol
+        self.maxiter = maxiter
+        self.block_size = block_size
+        self.perm = None if perm is None else np.asarray(perm)
+        self.num_factor = 0
+        self.num_solve = 0
+        self.iterations = 0
+        self.factor_time = 0.
+        self.solve_time = 0.
+        self._solve = None
+
+    def __call__(self, A, b):
+        return self.factor(A).solve(b)
+
+    @timed("factor")
+    def factor(self, A):
+        ti = time.time()
+        if self.perm is not None:
+            A = permute(A, self.perm)
+        self._solve = self._factor(A)
+        self.num_factor += 1
+        self.factor_time += time.time() - ti
+        return self
+
+    @timed("solve")
+    def solve(self, b):
+        if self._solve is None:
+            raise AFEPYError("{0}: solve called before factor".format(self.name))
+        try:
+            F = b.asarray()
+        except AttributeError:
+            F = asarray(b)
+        ti = time.time()
+        if self.perm is None:
+            x, num_iter = self._solve(F)
+        else:
+            y, num_iter = self._solve(F[self.perm])
+            x = np.empty_like(y)
+            x[self.perm] = y
+        dt = time.time() - ti
+        self.num_solve += 1
+        self.iterations += num_iter
+        self.solve_time += dt
+        logger.debug("{0}: solved {1} equations in {2:.3E}s, {3} "
+                     "iterations".format(self.name, F.shape[0], dt, num_iter))
+        return x
+
+    def _factor(self, A):
+        raise NotImplementedError
+
+    def summary(self):
+        name = self.name
+        if self.precond:
+            name = "{0} ({1})".format(name, self.precond)
+        return ("Linear solver: {0}, {1} factorizations in {2:.3E}s, {3} "
+                "solves in {4:.3E}s, {5} iterations".format(
+                    name, self.num_factor, self.factor_time, self.num_solve,
+                    self.solve_time, self.iterations))
+
+@register_solver
+class DirectSolver(LinearSolver):
+    name = "direct"
+    needs_scipy = False
+
+    def _factor(self, A):
+        if issparse(A):
+            lu = splu(A.tocsc())
+            return lambda b: (lu.solve(b), 0)
+        return dense_factor(A, self.symmetric)
+
+@register_solver
+class CholeskySolver(LinearSolver):
+    """Sparse Cholesky factorization. If scikit-sparse is not available, the
+    matrix is factored by LU with a symmetric fill reducing ordering"""
+    name = "cholesky"
+
+    def _factor(self, A):
+        if not issparse(A):
+            return dense_factor(A, symmetric=True)
+        if cholmod is not None:
+            factor = cholmod(A.tocsc())
+            return lambda b: (factor(b), 0)
+        lu = splu(A.tocsc(), permc_spec="MMD_AT_PLUS_A")
+        return lambda b: (lu.solve(b), 0)
+
+@register_solver
+class LUSolver(LinearSolver):
+    name = "lu"
+
+    def _factor(self, A):
+        if issparse(A):
+            lu = splu(A.tocsc())
+            return lambda b: (lu.solve(b), 0)
+        return dense_factor(A, symmetric=False)
+
+class IterativeSolver(LinearSolver):
+    method = None
+
+    def _factor(self, A):
+        M = None
+        if self.precond:
+            try:
+                func = PRECONDITIONERS[self.precond.lower()]
+            except KeyError:
+                raise AFEPYError("{0}: unknown preconditioner, choose from "
+                                 "{1}".format(self.precond,
+                                              ", ".join(sorted(PRECONDITIONERS))))
+            M = func(A, block_size=self.block_size)
+        method = self.method
+        # the relative tolerance is rtol in newer versions of scipy
+        tol = "rtol" if "rtol" in inspect.getargspec(method).args else "tol"
+        def solve(b):
+            count = [0]
+            def callback(*args):
+                count[0] += 1
+            kwds = {tol: self.tol, "atol": 0., "maxiter": self.maxiter,
+                    "M": M, "callback": callback}
+            x, info = method(A, b, **kwds)
+            if info < 0:
+                raise AFEPYError("{0}: illegal input or "
+                                 "breakdown".format(self.name))
+            if info > 0:
+                logger.warn("{0}: failed to converge to tolerance in {1} "
+                            "iterations".format(self.name, count[0]))
+            return x, count[0]
+        return solve
+
+@register_solver
+class CGSolver(IterativeSolver):
+    name = "cg"
+    method = staticmethod(cg) if splu is not None else None
+
+@register_solver
+class GMRESSolver(IterativeSolver):
+    name = "gmres"
+    method = staticmethod(gmres) if splu is not None else None
+
+def _inv_diag(A):
+    d = np.array(A.diagonal(), dtype=float)
+    d[d == 0.] = 1.
+    return 1. / d
+
+@register_precond("jacobi")
+def jacobi_precond(A, **kwargs):
+    """Diagonal (Jacobi) preconditioner"""
+    dinv = _inv_diag(A)
+    return LinearOperator(A.shape, matvec=lambda r: dinv * r.ravel())
+
+@register_precond("ilu")
+def ilu_precond(A, drop_tol=1.E-4, fill_factor=10., **kwargs):
+    """Incomplete LU preconditioner"""
+    ilu = spilu(csr_matrix(A).tocsc(), drop_tol=drop_tol,
+                fill_factor=fill_factor)
+    return LinearOperator(A.shape, matvec=ilu.solve)
+
+def _spectral_radius(A, dinv, num_iter=15):
+    """Estimate the spectral radius of dinv * A by power iteration"""
+    v = np.random.RandomState(0).rand(A.shape[0])
+    rho = 1.
+    for i in range(num_iter):
+        w = dinv * A.dot(v)
+        rho = la.norm(w)
+        if rho == 0.:
+            return 1.
+        v = w / rho
+    return rho
+
+def aggregate(A, block_size=1):
+    """Greedy aggregation of the nodes of the graph of A
+
+    Returns
+    -------
+    agg : ndarray of int
+        agg[i] is the aggregate of node i
+    num_agg : int
+        Number of aggregates
+
+    """
+    nb = block_size
+    nn = A.shape[0] // nb
+    a = A.tocoo()
+    C = coo_matrix((np.ones(a.nnz), (a.row // nb, a.col // nb)),
+                   shape=(nn, nn)).tocsr()
+    indptr, indices = C.indptr, C.indices
+
+    # roots: nodes whose entire neighborhood is unaggregated
+    agg = -np.ones(nn, dtype=int)
+    num_agg = 0
+    for i in range(nn):
+        nbrs = indices[indptr[i]:indptr[i+1]]
+        if np.all(agg[nbrs] < 0):
+            agg[nbrs] = num_agg
+            agg[i] = num_agg
+            num_agg += 1
+
+    # remaining nodes join a neighboring aggregate
+    for i in np.where(agg < 0)[0]:
+        a = agg[indices[indptr[i]:indptr[i+1]]]
+        a = a[a >= 0]
+        if len(a):
+            agg[i] = a[0]
+        else:
+            agg[i] = num_agg
+            num_agg += 1
+
+    return agg, num_agg
+
+@register_precond("amg")
+def amg_precond(A, block_size=1, **kwargs):
+    """Two level smoothed aggregation preconditioner
+
+    Nodes (blocks of block_size dofs) are aggregated greedily, the tentative
+    prolongator interpolates each dof component constantly over an aggregate
+    and is smoothed with one damped Jacobi sweep. The coarse problem is
+    factored directly and a damped Jacobi sweep is used as pre and post
+    smoother so that the preconditioner is symmetric.
+
+    """
+    A = csr_matrix(A)
+    n = A.shape[0]
+    nb = block_size if n % block_size == 0 else 1
+    agg, num_agg = aggregate(A, nb)
+
+    dof = np.arange(n)
+    cols = agg[dof // nb] * nb + dof % nb
+    T = csr_matrix((np.ones(n), (dof, cols)), shape=(n, num_agg * nb))
+
+    dinv = _inv_diag(A)
+    rho = _spectral_radius(A, dinv)
+    omega = 4. / 3. / rho
+    Dinv = csr_matrix((dinv, (dof, dof)), shape=(n, n))
+    P = (T - omega * Dinv.dot(A.dot(T))).tocsr()
+    Ac = P.T.dot(A.dot(P)).tocsc()
+    lu = splu(Ac)
+    Pt = P.T.tocsr()
 
-    return x
+    ws = 1. / rho
+    def apply(r):
+        r = r.ravel()
+        x = ws * dinv * r
+        x += P.dot(lu.solve(Pt.dot(r - A.dot(x))))
+        x += ws * dinv * (r - A.dot(x))
+        return x
+    return LinearOperator(A.shape, matvec=apply)
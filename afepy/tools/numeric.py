@@ -1,8 +1,12 @@
 TINY = 1.E-12
+import multiprocessing as mp
 import numpy as np
 try:
-    from scipy.sparse import coo_matrix
+    from scipy.sparse import coo_matrix, csr_matrix, issparse
 except ImportError:
+    csr_matrix = None
+    def issparse(a):
+        return False
     class coo_matrix:
         def __init__(self, (data, (row, col)), shape):
             self.a = np.zeros(shape)
@@ -99,3 +103,64 @@ class SparseVector(object):
         arr = coo_matrix((self.data, (self.row, [0]*len(self.row))),
                          shape=(self.shape,1))
         return np.array(arr.todense()).ravel()
+
+def shared_zeros(shape):
+    """Array of zeros in shared memory. Changes made by forked processes to
+    the array are seen by the parent"""
+    shape = tuple(np.atleast_1d(shape))
+    n = int(np.prod(shape))
+    buf = mp.RawArray("d", max(n, 1))
+    return np.frombuffer(buf, dtype=np.float64, count=n).reshape(shape)
+
+class SparsePattern(object):
+    """Sparsity pattern of a matrix assembled from blocks of element matrices
+
+    Parameters
+    ----------
+    n : int
+        Number of rows (and columns) of the assembled matrix
+    elem_dofs : list of ndarray
+        elem_dofs[i][e, :] are the global dofs of element e of block i
+
+    Notes
+    -----
+    The (row, col) triplets of every element matrix are computed once and
+    mapped on to the entries of a CSR matrix.  Later assemblies only sum the
+    element values in to the cached structure, duplicates are summed once.
+
+    """
+    def __init__(self, n, elem_dofs):
+        self.shape = (n, n)
+        self.blocks = []
+        rows, cols = [], []
+        for ed in elem_dofs:
+            ed = np.asarray(ed, dtype=np.int64)
+            num_elem, m = ed.shape
+            self.blocks.append((num_elem, m))
+            rows.append(np.repeat(ed, m, axis=1).ravel())
+            cols.append(np.tile(ed, (1, m)).ravel())
+        key = np.concatenate(rows) * n + np.concatenate(cols)
+        key, self.map = np.unique(key, return_inverse=True)
+        self.nnz = key.shape[0]
+        self.indices = (key % n).astype(np.int32)
+        self.indptr = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(key // n, minlength=n), out=self.indptr[1:])
+
+    def zeros(self):
+        """COO value buffers, one (num_elem, m, m) array per block"""
+        return [np.zeros((num_elem, m, m)) for (num_elem, m) in self.blocks]
+
+    def assemble(self, values):
+        """Sum the element values in to a CSR matrix
+
+        Parameters
+        ----------
+        values : list of ndarray
+            values[i][e] is the element matrix of element e of block i, as
+            returned by zeros
+
+        """
+        v = np.concatenate([np.ravel(x) for x in values])
+        data = np.bincount(self.map, weights=v, minlength=self.nnz)
+        return csr_matrix((data, self.indices.copy(), self.indptr.copy()),
+                          shape=self.shape)
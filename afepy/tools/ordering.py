@@ -0,0 +1,151 @@
+"""Bandwidth and fill reducing orderings of the nodes of a mesh
+
+The orderings are computed from the node adjacency graph of the mesh (see
+Mesh.node_graph) and are used to renumber the dofs of the linear systems
+handed to the solvers. The renumbering is selected through the runtime
+options, eg
+
+    opts.renumber = "rcm"
+
+Available orderings are
+
+    rcm  reverse Cuthill-McKee, reduces the bandwidth and profile
+    nd   nested dissection, reduces the fill of a direct factorization
+         (requires scipy)
+
+An ordering perm lists the nodes in their new order, ie, node perm[i] is
+numbered i.
+
+"""
+import numpy as np
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import (reverse_cuthill_mckee,
+                                      connected_components, shortest_path)
+except ImportError:
+    csr_matrix = None
+from tools.errors import AFEPYError
+
+ORDERINGS = ("rcm", "nd")
+
+def node_ordering(indptr, indices, method):
+    """The ordering method of the graph (indptr, indices)"""
+    method = method.lower()
+    if method == "rcm":
+        return rcm(indptr, indices)
+    if method == "nd":
+        if csr_matrix is None:
+            raise AFEPYError("nested dissection ordering requires scipy")
+        return nested_dissection(indptr, indices)
+    raise AFEPYError("{0}: unknown ordering, choose from "
+                     "{1}".format(method, ", ".join(ORDERINGS)))
+
+def dof_ordering(perm, num_dof_per_node):
+    """Expand the node ordering perm to the dofs. The dofs of a node are
+    kept together and in their original order"""
+    n = num_dof_per_node
+    return (n * np.asarray(perm)[:, np.newaxis] + np.arange(n)).ravel()
+
+def _graph(indptr, indices):
+    n = len(indptr) - 1
+    return csr_matrix((np.ones(len(indices)), indices, indptr), shape=(n, n))
+
+def rcm(indptr, indices):
+    """Reverse Cuthill-McKee ordering of the graph (indptr, indices)"""
+    if csr_matrix is not None:
+        perm = reverse_cuthill_mckee(_graph(indptr, indices),
+                                     symmetric_mode=True)
+        return np.asarray(perm, dtype=np.int)
+
+    # breadth first search of each component from a node of minimum degree,
+    # visiting neighbors in order of increasing degree
+    n = len(indptr) - 1
+    degree = np.diff(indptr)
+    order = np.empty(n, dtype=np.int)
+    visited = np.zeros(n, dtype=bool)
+    k = 0
+    for root in np.argsort(degree, kind="mergesort"):
+        if visited[root]:
+            continue
+        visited[root] = True
+        order[k] = root
+        head, k = k, k + 1
+        while head < k:
+            i = order[head]
+            head += 1
+            nbrs = indices[indptr[i]:indptr[i+1]]
+            nbrs = nbrs[~visited[nbrs]]
+            nbrs = nbrs[np.argsort(degree[nbrs], kind="mergesort")]
+            visited[nbrs] = True
+            order[k:k+len(nbrs)] = nbrs
+            k += len(nbrs)
+    return order[::-1].copy()
+
+def nested_dissection(indptr, indices, min_size=64):
+    """Nested dissection ordering of the graph (indptr, indices)
+
+    The graph is split by the middle level of a breadth first search from a
+    pseudo-peripheral node. The two halves are ordered recursively and the
+    separator is numbered last. Parts smaller than min_size are ordered by
+    reverse Cuthill-McKee.
+
+    """
+    G = _graph(indptr, indices)
+    order = []
+
+    def dissect(nodes):
+        sub = G[nodes][:, nodes]
+        if len(nodes) <= min_size:
+            order.extend(nodes[rcm(sub.indptr, sub.indices)])
+            return
+        num_comp, labels = connected_components(sub, directed=False)
+        if num_comp > 1:
+            for c in range(num_comp):
+                dissect(nodes[labels == c])
+            return
+
+        # levels of a breadth first search from a pseudo-peripheral node
+        level = shortest_path(sub, unweighted=True, indices=0)
+        root = np.argmax(level)
+        level = shortest_path(sub, unweighted=True, indices=root)
+        depth = int(level.max())
+        if depth < 2:
+            order.extend(nodes[rcm(sub.indptr, sub.indices)])
+            return
+
+        # the separating level divides the nodes in (roughly) half
+        mid = int(np.sort(level)[len(nodes) // 2])
+        mid = min(max(mid, 1), depth - 1)
+        dissect(nodes[level < mid])
+        dissect(nodes[level > mid])
+        order.extend(nodes[level == mid])
+
+    dissect(np.arange(G.shape[0]))
+    return np.array(order, dtype=np.int)
+
+def _lowest_neighbor(indptr, indices, perm):
+    """The lowest (new) number of the neighbors of each node, and of the node
+    itself, in the numbering perm"""
+    n = len(indptr) - 1
+    new = np.arange(n) if perm is None else np.argsort(perm)
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    lowest = new.copy()
+    np.minimum.at(lowest, rows, new[indices])
+    return new, lowest
+
+def bandwidth(indptr, indices, perm=None, block_size=1):
+    """Half bandwidth of the matrix of the graph (indptr, indices) with the
+    nodes numbered by perm and block_size dofs per node"""
+    new, lowest = _lowest_neighbor(indptr, indices, perm)
+    if not len(new):
+        return 0
+    return block_size * int((new - lowest).max()) + block_size - 1
+
+def profile(indptr, indices, perm=None, block_size=1):
+    """Profile (number of entries in the lower envelope, not counting the
+    diagonal) of the matrix of the graph (indptr, indices) with the nodes
+    numbered by perm and block_size dofs per node"""
+    new, lowest = _lowest_neighbor(indptr, indices, perm)
+    nb = block_size
+    return (nb * nb * int((new - lowest).sum()) +
+            len(new) * nb * (nb - 1) // 2)
@@ -0,0 +1,142 @@
+"""Timing of the phases of a simulation
+
+The wall time and number of calls of each phase of a simulation (kinematics
+update, material update, stiffness and residual assembly, application of
+boundary conditions, linear solve, output, ...) are accumulated when
+profiling is switched on through the runtime options
+
+    opts.profile = True
+    opts.profile_file = "job.prof.json"   # optional
+
+The application solvers reset the timers when they start and, when they
+finish, write the timing table to the log and the timings to profile_file
+(by default afepy.prof.json in the simulation directory).
+
+The time of a phase called from within another phase is subtracted from the
+"self" time of the calling phase, so that the self times add up to the
+profiled time. The material state is updated by the stiffness kernel when
+the stiffness is assembled, that time is included in the stiffness phase.
+
+"""
+import os
+import json
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from core.runtime import opts
+from tools.logger import ConsoleLogger as logger
+
+PROFILE_FILE = "afepy.prof.json"
+
+class Profiler(object):
+    """Accumulated wall time and call count of each phase"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = OrderedDict()
+        self.total = OrderedDict()
+        self.self_time = OrderedDict()
+        self.stack = []
+        self.start = time.time()
+
+    @property
+    def enabled(self):
+        return opts.profile
+
+    def phase(self, name):
+        """Context manager timing the phase name"""
+        return _Phase(self, name)
+
+    def enter(self, name):
+        self.stack.append([name, time.time(), 0.])
+
+    def exit(self):
+        name, ti, nested = self.stack.pop()
+        dt = time.time() - ti
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.total[name] = self.total.get(name, 0.) + dt
+        self.self_time[name] = self.self_time.get(name, 0.) + dt - nested
+        if self.stack:
+            self.stack[-1][2] += dt
+
+    def timings(self):
+        """The timings, {"wall": ..., "phases": {name: {calls, total, self}}}"""
+        phases = OrderedDict()
+        for name in self.calls:
+            phases[name] = OrderedDict([("calls", self.calls[name]),
+                                        ("total", self.total[name]),
+                                        ("self", self.self_time[name])])
+        return OrderedDict([("wall", time.time() - self.start),
+                            ("phases", phases)])
+
+    def table(self):
+        """The timings formatted as a table"""
+        t = self.timings()
+        wall = t["wall"]
+        lines = ["{0:<16} {1:>8} {2:>11} {3:>11} {4:>6}".format(
+                 "Phase", "Calls", "Total (s)", "Self (s)", "%")]
+        other = wall
+        for (name, p) in t["phases"].items():
+            pct = 100. * p["self"] / wall if wall else 0.
+            lines.append("{0:<16} {1:>8d} {2:>11.3E} {3:>11.3E} {4:>6.1f}".format(
+                         name, p["calls"], p["total"], p["self"], pct))
+            other -= p["self"]
+        pct = 100. * other / wall if wall else 0.
+        lines.append("{0:<16} {1:>8} {2:>11} {3:>11.3E} {4:>6.1f}".format(
+                     "other", "", "", other, pct))
+        lines.append("{0:<16} {1:>8} {2:>11.3E}".format("wall", "", wall))
+        return "\n".join(lines)
+
+    def report(self, solver=None):
+        """Write the timing table to the log and the timings to the profile
+        file"""
+        if not self.enabled:
+            return
+        logger.write("Profile{0}:".format("" if solver is None else
+                                          " of " + solver))
+        logger.write(self.table())
+        t = self.timings()
+        if solver is not None:
+            t["solver"] = solver
+        filename = opts.profile_file or PROFILE_FILE
+        filename = os.path.join(opts.simulation_dir, filename)
+        try:
+            with open(filename, "w") as fh:
+                json.dump(t, fh, indent=2)
+        except (IOError, OSError) as e:
+            logger.warn("failed to write profile {0}: {1}".format(filename, e))
+
+class _Phase(object):
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.on = False
+
+    def __enter__(self):
+        # a phase called from within itself is timed once
+        p = self.profiler
+        self.on = p.enabled and not any(s[0] == self.name for s in p.stack)
+        if self.on:
+            p.enter(self.name)
+        return self
+
+    def __exit__(self, *args):
+        if self.on:
+            self.profiler.exit()
+        return False
+
+profiler = Profiler()
+
+def timed(name):
+    """Decorator timing each call of the function as phase name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not opts.profile:
+                return func(*args, **kwargs)
+            with profiler.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
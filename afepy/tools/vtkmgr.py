@@ -0,0 +1,132 @@
+import os
+import numpy as np
+
+from mesh.writers import VTU, write_pvd
+from tools.profiler import timed
+
+class VTKFile:
+    """Write a SolutionSpace to a ParaView collection (.pvd) of binary VTK
+    unstructured grid (.vtu) files, one file per step
+
+    Used in the same way as ExodusIIFile, either after the solution
+
+        file = VTKFile("job.pvd")
+        file << u.output(node=["stress"])
+
+    or by streaming each converged step as it is computed
+
+        file = VTKFile("job.pvd")
+        file.stream(u.output(node=["stress"]), stride=10)
+        StaticNonlinearSolve(V, u, ...)
+        file.close()
+
+    The step files job_0000.vtu, job_0001.vtu, ... are written next to
+    job.pvd.
+
+    """
+    def __init__(self, filename, compress=True):
+        self.vtk = VTKManager(filename, compress=compress)
+        self.u = None
+
+    def __lshift__(self, u):
+        if u is self.u:
+            # streamed, the snapshots are already written
+            self.close()
+            return
+
+        self.vtk.put_init(*u.genesis)
+        for snapshot in u.snapshots():
+            self.vtk.snapshot(*snapshot)
+        self.vtk.finish()
+
+    def stream(self, u, stride=None):
+        """Write the initial state of u now and each stride-th converged step
+        of u as it is computed"""
+        self.vtk.put_init(*u.genesis)
+        u.stream(self.vtk, stride=stride)
+        self.u = u
+        return self
+
+    def close(self):
+        if self.u is not None:
+            self.u.stream(None)
+            self.u = None
+        self.vtk.finish()
+
+class VTKManager(object):
+    """Writes the steps of a solution to .vtu files and the collection of
+    steps to a .pvd file. The methods mirror those of ExodusIIManager so that
+    either can be used as a SolutionSpace's stream writer
+
+    """
+    def __init__(self, filename, compress=True):
+        root, ext = os.path.splitext(filename)
+        self.filename = root + ".pvd"
+        self.root = root
+        self.compress = compress
+        self.datasets = []
+
+    @timed("output")
+    def put_init(self, num_dim, coords, conn, elem_blks, node_sets, side_sets,
+                 all_glob_data, all_element_data, elem_num_map, node_data,
+                 title=None, d=None):
+        """Set up the mesh and write the initial step, the arguments are those
+        of ExodusIIManager.put_init"""
+        if d is not None:
+            self.root = os.path.join(d, os.path.basename(self.root))
+            self.filename = self.root + ".pvd"
+        self.num_dim = num_dim
+        self.coords = coords
+        self.conn = conn
+        self.num_elem = conn.shape[0]
+        self.elem_blk_ids = [eb[1] for eb in elem_blks]
+        self.node_var_names = list(node_data[0])
+
+        # element variables of every block, in order of first appearance
+        self.elem_var_names = []
+        for eb in elem_blks:
+            self.elem_var_names.extend([k for k in eb[4]
+                                        if k not in self.elem_var_names])
+        self.elem_var_index = [[self.elem_var_names.index(k) for k in eb[4]]
+                               for eb in elem_blks]
+
+        self.datasets = []
+        ave = [data for (_, _, data) in all_element_data]
+        self.snapshot(ave, node_data[1], 0., 0.)
+
+    @timed("output")
+    def snapshot(self, ave, node_data, time, dtime):
+        """Write the element averages ave and nodal data of one step"""
+        grid = VTU(self.coords, self.conn, compress=self.compress)
+
+        # displacement as a vector, so that it can be used to warp the mesh
+        names = self.node_var_names
+        disp = [i for (i, k) in enumerate(names) if k.startswith("Displacement")]
+        if disp:
+            u = np.zeros((node_data.shape[0], 3))
+            u[:, :len(disp)] = node_data[:, disp]
+            grid.add_point_data("Displacement", u)
+        for (i, name) in enumerate(names):
+            if i not in disp:
+                grid.add_point_data(name, node_data[:, i])
+
+        elem_data = np.zeros((self.num_elem, len(self.elem_var_names)))
+        for (i, elem_ids) in enumerate(self.elem_blk_ids):
+            elem_data[np.ix_(elem_ids, self.elem_var_index[i])] = ave[i]
+        for (k, name) in enumerate(self.elem_var_names):
+            grid.add_cell_data(name, elem_data[:, k])
+
+        grid.add_field_data("TIME", np.array([time]))
+        grid.add_field_data("DTIME", np.array([dtime]))
+
+        f = "{0}_{1:04d}.vtu".format(self.root, len(self.datasets))
+        grid.write(f)
+        self.datasets.append((time, os.path.basename(f)))
+
+        # keep the collection current so that it can be viewed while a
+        # streamed simulation runs
+        write_pvd(self.filename, self.datasets)
+
+    @timed("output")
+    def finish(self):
+        write_pvd(self.filename, self.datasets)
@@ -73,19 +73,25 @@ def exodiff(source1, source2, control_file=None, interp=False, f=None,
     if not os.path.isfile(source2):
         logger.error("{0}: no such file".format(source2))
 
-    H1, D1 = loadcontents(source1, logger)
-    H2, D2 = loadcontents(source2, logger)
-
     if control_file is not None:
         if not os.path.isfile(control_file):
             logger.error("{0}: no such file".format(control_file))
             return 2
         variables = read_diff_file(control_file, logger)
     else:
-        variables = zip(H1, [DIFFTOL] * len(H1), [FAILTOL] * len(H1),
-                        [FLOOR] * len(H1))
+        variables = None
+
+    if isexo(source1) and isexo(source2):
+        # compare the whole fields
+        status = diff_exofiles(source1, source2, variables, logger,
+                               interp=interp)
 
-    status = diff_files(H1, D1, H2, D2, variables, logger, interp=interp)
+    else:
+        H1, D1 = loadcontents(source1, logger)
+        H2, D2 = loadcontents(source2, logger)
+        if variables is None:
+            variables = default_tolerances(H1)
+        status = diff_files(H1, D1, H2, D2, variables, logger, interp=interp)
 
     if status == 0:
         logger.info("\nFiles are the same")
@@ -99,8 +105,17 @@ def exodiff(source1, source2, control_file=None, interp=False, f=None,
     return status
 
 
+def isexo(filepath):
+    return filepath.endswith((".exo", ".e", ".base_exo"))
+
+
+def default_tolerances(names):
+    """(name, dtol, ftol, floor, atol, rtol) of each variable in names"""
+    return [(name, DIFFTOL, FAILTOL, FLOOR, FAILTOL, FAILTOL) for name in names]
+
+
 def loadcontents(filepath, logger):
-    if filepath.endswith((".exo", ".e", ".base_exo")):
+    if isexo(filepath):
         return loadexo(filepath, logger)
     return loadascii(filepath, logger)
 
@@ -114,7 +129,7 @@ def loadexo(filepath, logger):
     for glob_var_name in glob_var_names:
         data.append(exof.get_glob_var_time(glob_var_name))
     for elem_var_name in elem_var_names:
-        data.append(exof.get_elem_var_time(elem_var_name, 0))
+        data.append(exof.get_elem_var_time(elem_var_name, 1))
     data = np.transpose(np.array(data))
     head = ["TIME"] + glob_var_names + elem_var_names
     exof.close()
@@ -188,9 +203,9 @@ def diff_files(head1, data1, head2, data2, vars_to_compare, logger, interp=False
             logger.error("Timestep size in File1 and File2 differ")
             return NOT_SAME
 
-    status = []
+    status = [SAME]
     bad = [[], []]
-    for (var, dtol, ftol, floor) in vars_to_compare:
+    for (var, dtol, ftol, floor, atol, rtol) in vars_to_compare:
 
         if var == "TIME":
             continue
@@ -198,13 +213,17 @@ def diff_files(head1, data1, head2, data2, vars_to_compare, logger, interp=False
         try:
             i1 = head1.index(var)
         except ValueError:
-            logger.warn("{0}: not in File1\n".format(var))
+            logger.error("{0}: not in File1\n".format(var))
+            status.append(NOT_SAME)
+            bad[0].append(var)
             continue
 
         try:
             i2 = head2.index(var)
         except ValueError:
-            logger.warn("{0}: not in File2\n".format(var))
+            logger.error("{0}: not in File2\n".format(var))
+            status.append(NOT_SAME)
+            bad[0].append(var)
             continue
 
         d1 = afloor(data1[:, i1], floor)
@@ -213,7 +232,7 @@ def diff_files(head1, data1, head2, data2, vars_to_compare, logger, interp=False
         logger.info("Comparing {0}".format(var), end="." * (40 - len(var)))
 
         if not interp:
-            if np.allclose(d1, d2, atol=ftol, rtol=ftol):
+            if np.allclose(d1, d2, atol=atol, rtol=rtol):
                 logger.info(" pass")
                 logger.info("File1.{0} := File2.{0}\n".format(var))
                 status.append(SAME)
@@ -240,6 +259,11 @@ def diff_files(head1, data1, head2, data2, vars_to_compare, logger, interp=False
         logger.info("NRMS(File.{0}, File2.{0}) = {1: 12.6E}\n".format(var, nrms))
         continue
 
+    if len(status) == 1:
+        # a regression test that compared nothing does not pass
+        logger.error("No variables were compared")
+        status.append(NOT_SAME)
+
     failed = ", ".join("{0}".format(f) for f in bad[0])
     diffed = ", ".join("{0}".format(f) for f in bad[1])
     if failed:
@@ -250,6 +274,236 @@ def diff_files(head1, data1, head2, data2, vars_to_compare, logger, interp=False
     return max(status)
 
 
+def diff_exofiles(source1, source2, vars_to_compare, logger, interp=False):
+    """Diff every global, nodal, and element variable of two exodus files at
+    every time step
+
+    The variables are compared a step at a time (a variable at a step is read
+    from the file only when it is compared).  With interp, the histories of
+    the variables are interpolated to common times.
+
+    """
+    logger.info("Reading {0}".format(source1))
+    exo1 = ExodusIIReader(source1)
+    logger.info("Reading {0}".format(source2))
+    exo2 = ExodusIIReader(source2)
+
+    # the meshes must be the same
+    blk_ids = list(exo1.elem_blk_ids)
+    if (exo1.num_nodes != exo2.num_nodes or
+        exo1.num_elem != exo2.num_elem or
+        blk_ids != list(exo2.elem_blk_ids)):
+        logger.error("Meshes of File1 and File2 differ")
+        return NOT_SAME
+
+    t1 = exo1.get_all_times()
+    t2 = exo2.get_all_times()
+    if not interp:
+        # interpolation will not be used when comparing values, so the
+        # timesteps must be equal
+        if t1.shape[0] != t2.shape[0]:
+            logger.error("Number of timesteps in File1({0:d}) and "
+                         "File2({1:d}) differ".format(t1.shape[0], t2.shape[0]))
+            return NOT_SAME
+
+        if not np.allclose(t1, t2, atol=FAILTOL, rtol=FAILTOL):
+            logger.error("Timestep size in File1 and File2 differ")
+            return NOT_SAME
+
+    if vars_to_compare is None:
+        names = []
+        for name in (exo1.glob_var_names + exo1.node_var_names +
+                     exo1.elem_var_names):
+            if name not in names:
+                names.append(name)
+        vars_to_compare = default_tolerances(names)
+
+    # the values of each type of variable at a step, [(block, values)]
+    def glob_vals(exof, var, step):
+        i = exof.global_var_index(var)
+        return [(None, np.atleast_1d(exof.get_glob_vars(step)[i]))]
+    def nodal_vals(exof, var, step):
+        return [(None, exof.get_nodal_var_history(var, steps=step)[0])]
+    def elem_vals(exof, var, step):
+        vals = []
+        for blk_id in blk_ids:
+            try:
+                vals.append((blk_id, exof.get_elem_var_blk(step, var, blk_id)))
+            except KeyError:
+                # variable not defined on this block
+                continue
+        return vals
+    kinds = (("global", "glob_var_names", glob_vals, "step"),
+             ("nodal", "node_var_names", nodal_vals, "node"),
+             ("element", "elem_var_names", elem_vals, "element"))
+
+    status = [SAME]
+    bad = [[], []]
+    for (var, dtol, ftol, floor, atol, rtol) in vars_to_compare:
+
+        if var == "TIME":
+            continue
+
+        compared = 0
+        for (kind, names, vals, entity) in kinds:
+            if var not in getattr(exo1, names):
+                continue
+            compared = 1
+            label = "{0} ({1})".format(var, kind)
+
+            if var not in getattr(exo2, names):
+                logger.error("{0}: not in File2\n".format(label))
+                status.append(NOT_SAME)
+                bad[0].append(label)
+                continue
+
+            logger.info("Comparing {0}".format(label),
+                        end="." * max(1, 40 - len(label)))
+
+            err = FieldError(floor, atol, rtol)
+            if not interp:
+                for step in range(t1.shape[0]):
+                    vals1 = dict(vals(exo1, var, step))
+                    for (blk, d2) in vals(exo2, var, step):
+                        if blk in vals1:
+                            err.update(vals1[blk], d2, step, blk)
+                times = t1
+            else:
+                times = np.linspace(max(np.amin(t1), np.amin(t2)),
+                                    min(np.amax(t1), np.amax(t2)), t1.shape[0])
+                hist1 = field_history(exo1, var, vals, t1.shape[0])
+                hist2 = field_history(exo2, var, vals, t2.shape[0])
+                for (blk, d2) in hist2.items():
+                    if blk in hist1:
+                        err.update(interp_columns(times, t1, hist1[blk]),
+                                   interp_columns(times, t2, d2),
+                                   np.arange(times.shape[0]), blk)
+
+            st = err.status(dtol, ftol, interp)
+            status.append(st)
+            if st == SAME:
+                logger.info(" pass")
+                eq = "==" if err.num_bad or interp else ":="
+                logger.info("File1.{0} {1} File2.{0}".format(label, eq))
+            elif st == DIFF:
+                logger.info(" diff")
+                logger.warn("File1.{0} ~= File2.{0}".format(label))
+                bad[1].append(label)
+            else:
+                logger.info(" fail")
+                logger.error("File1.{0} != File2.{0}".format(label))
+                bad[0].append(label)
+
+            if err.num_bad or interp:
+                logger.info("NRMS(File.{0}, File2.{0}) = {1: 12.6E}".format(
+                    label, err.nrms))
+            if err.max_error > 0.:
+                i, blk, step = err.where
+                where = "step {0:d} (time {1: 12.6E})".format(step, times[step])
+                if blk is not None:
+                    where = "block {0}, {1}".format(blk, where)
+                if entity != "step":
+                    where = "{0} {1:d}, {2}".format(entity, i + 1, where)
+                logger.info("Max |File1.{0} - File2.{0}| = {1: 12.6E} at "
+                            "{2}".format(label, err.max_error, where))
+            logger.info("")
+
+        if not compared:
+            logger.error("{0}: not in File1\n".format(var))
+            status.append(NOT_SAME)
+            bad[0].append(var)
+
+    exo1.close()
+    exo2.close()
+
+    if len(status) == 1:
+        # a regression test that compared nothing does not pass
+        logger.error("No variables were compared")
+        status.append(NOT_SAME)
+
+    failed = ", ".join("{0}".format(f) for f in bad[0])
+    diffed = ", ".join("{0}".format(f) for f in bad[1])
+    if failed:
+        logger.info("Variabes that failed: {0}".format(failed))
+    if diffed:
+        logger.info("Variabes that diffed: {0}".format(diffed))
+
+    return max(status)
+
+
+def field_history(exof, var, vals, num_steps):
+    """The values of var at every step, {block: (num_steps, num_entities)}"""
+    history = {}
+    for step in range(num_steps):
+        for (blk, d) in vals(exof, var, step):
+            history.setdefault(blk, []).append(d)
+    return dict((blk, np.array(d)) for (blk, d) in history.items())
+
+
+class FieldError(object):
+    """Accumulated error of the values of a variable, compared a step (or
+    block) at a time
+
+    Values a and b differ if |a - b| > atol + rtol * |b|, after the values
+    smaller than floor are set to zero.  The root mean square of a - b over
+    every step and entity and the location of the largest |a - b| are kept.
+
+    """
+    def __init__(self, floor, atol, rtol):
+        self.floor = floor
+        self.atol = atol
+        self.rtol = rtol
+        self.num_bad = 0
+        self.sum_sq = 0.
+        self.count = 0
+        self.max_abs = 0.
+        self.max_error = 0.
+        self.where = None
+
+    def update(self, a, b, step, blk=None):
+        """Compare the values a, b of the entities at step.  If step is an
+        array, a and b are (num_steps, num_entities) arrays of the values at
+        each step"""
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        a = np.where(np.abs(a) <= self.floor, 0., a)
+        b = np.where(np.abs(b) <= self.floor, 0., b)
+        if not a.size:
+            return
+        e = np.abs(a - b)
+        self.num_bad += np.count_nonzero(e > self.atol + self.rtol * np.abs(b))
+        self.sum_sq += np.sum(e * e)
+        self.count += e.size
+        self.max_abs = max(self.max_abs, np.amax(np.abs(a)))
+        i = np.argmax(e)
+        if self.where is None or e.flat[i] > self.max_error:
+            self.max_error = e.flat[i]
+            if e.ndim == 1:
+                self.where = (i, blk, step)
+            else:
+                k, i = np.unravel_index(i, e.shape)
+                self.where = (i, blk, step[k])
+
+    @property
+    def rms(self):
+        return np.sqrt(self.sum_sq / max(self.count, 1))
+
+    @property
+    def nrms(self):
+        dnom = self.max_abs
+        if dnom < 1.e-12: dnom = 1.
+        return self.rms / dnom
+
+    def status(self, dtol, ftol, interp=False):
+        if not interp and not self.num_bad:
+            return SAME
+        if self.nrms < dtol:
+            return SAME
+        if self.nrms < ftol:
+            return DIFF
+        return NOT_SAME
+
+
 def plot_files(source1, source2):
     import matplotlib.pyplot as plt
     cwd = os.getcwd()
@@ -324,14 +578,30 @@ def interp_rms_error(t1, d1, t2, d2):
     """
     ti = max(np.amin(t1), np.amin(t2))
     tf = min(np.amax(t1), np.amax(t2))
-    n = t1.shape[0]
-    f1 = lambda x: np.interp(x, t1, d1)
-    f2 = lambda x: np.interp(x, t2, d2)
-    rms = np.sqrt(np.mean([(f1(t) - f2(t)) ** 2
-                           for t in np.linspace(ti, tf, n)]))
+    t = np.linspace(ti, tf, t1.shape[0])
+    rms = np.sqrt(np.mean((interp_columns(t, t1, d1) -
+                           interp_columns(t, t2, d2)) ** 2))
     return rms
 
 
+def interp_columns(x, xp, fp):
+    """Linear interpolation of each column of fp, fp[:, j] at xp, to x
+
+    Like np.interp, the values outside of xp are the end values
+
+    """
+    fp = np.asarray(fp)
+    if fp.ndim == 1:
+        return np.interp(x, xp, fp)
+    if xp.shape[0] == 1:
+        return np.repeat(fp[:1], len(x), axis=0)
+    i = np.clip(np.searchsorted(xp, x, side="right") - 1, 0, xp.shape[0] - 2)
+    dx = xp[i+1] - xp[i]
+    w = np.where(dx > 0., (x - xp[i]) / np.where(dx > 0., dx, 1.), 1.)
+    w = np.clip(w, 0., 1.)[:, np.newaxis]
+    return (1. - w) * fp[i] + w * fp[i+1]
+
+
 def read_diff_file(filepath, logger):
     """Read the diff instruction file
 
@@ -345,7 +615,8 @@ def read_diff_file(filepath, logger):
     The diff instruction file has the following format
 
     <ExDiff [ftol="real"] [dtol="real"] [floor="real"]>
-      <Variable name="string" [ftol="real"] [dtol="real"] [floor="real"]/>
+      <Variable name="string" [ftol="real"] [dtol="real"] [floor="real"]
+                [atol="real"] [rtol="real"]/>
     </ExDiff>
 
     It lets you specify:
@@ -357,6 +628,8 @@ def read_diff_file(filepath, logger):
       individual failure tolerance (Variable ftol attribute)
       individual diff tolerance (Variable dtol attribute)
       individual floor (Variable floor attribute)
+      individual absolute and relative tolerances (Variable atol and rtol
+      attributes, ftol by default) of the value by value comparison
 
     """
     doc = xdom.parse(filepath)
@@ -387,7 +660,13 @@ def read_diff_file(filepath, logger):
         vfloor = var.getAttribute("floor")
         if vfloor: vfloor = float(vfloor)
         else: vfloor = floor
-        variables.append((name, vdtol, vftol, floor))
+        vatol = var.getAttribute("atol")
+        if vatol: vatol = float(vatol)
+        else: vatol = vftol
+        vrtol = var.getAttribute("rtol")
+        if vrtol: vrtol = float(vrtol)
+        else: vrtol = vftol
+        variables.append((name, vdtol, vftol, vfloor, vatol, vrtol))
 
     return variables
 
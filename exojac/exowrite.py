@@ -163,7 +163,15 @@ class ExodusIIWriter(Genesis):
         time_value : float
             The time at the specified time step.
 
+        Notes
+        -----
+        The definitions are complete when the first time is written.  The
+        header and mesh are then written to the file and each time step is
+        written as it is put, rather than when the file is closed.
+
         """
+        if not self.db.data_mode:
+            self.db.enddef()
         self.db.variables[VAR_WHOLE_TIME][time_step] = time_value
         return
 
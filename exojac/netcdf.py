@@ -78,6 +78,26 @@ To read the NetCDF file we just created:
     9
     >>> f.close()
 
+Records can also be written as they are produced, without keeping them in
+memory, by ending the define mode once all dimensions, variables and
+attributes are created:
+
+    >>> f = netcdf.netcdf_file('simple.nc', 'w')
+    >>> f.createDimension('time', None)
+    >>> time = f.createVariable('time', 'd', ('time',))
+    >>> f.enddef()
+    >>> for i in range(10):
+    ...     time[i] = i
+    ...     f.sync()
+    >>> f.close()
+
+`enddef` writes the header, leaving room for it to grow by up to `slack`
+bytes, and the data of the fixed size variables. Each record is then
+written directly to its place in the file and `sync` updates the number of
+records in the header, so that the records written so far can be read while
+the file is still being written. An existing file is opened to append
+records to it with mode 'a'.
+
 """
 
 #TODO:
@@ -100,6 +120,7 @@ __all__ = ['netcdf_file']
 
 from operator import mul
 from mmap import mmap, ACCESS_READ
+from io import BytesIO
 
 import numpy as np
 from numpy.compat import asbytes, asstr
@@ -140,6 +161,10 @@ REVERSE = { ('b', 1): NC_BYTE,
             ('l', 4): NC_INT,
             ('S', 1): NC_CHAR }
 
+# bytes reserved after the header by enddef, so that the header can be
+# rewritten in place if attributes change
+HEADER_SLACK = 4096
+
 
 class netcdf_file(object):
     """
@@ -159,8 +184,9 @@ class netcdf_file(object):
     ----------
     filename : string or file-like
         string -> filename
-    mode : {'r', 'w'}, optional
-        read-write mode, default is 'r'
+    mode : {'r', 'w', 'a'}, optional
+        read-write mode, default is 'r'.  'a' opens an existing file to
+        append records, see `enddef`
     mmap : None or bool, optional
         Whether to mmap `filename` when reading.  Default is True
         when `filename` is a file name, False when `filename` is a
@@ -182,15 +208,18 @@ class netcdf_file(object):
             elif mmap and not hasattr(filename, 'fileno'):
                 raise ValueError('Cannot use file object for mmap')
         else: # maybe it's a string
+            if not mode in ('r', 'w', 'a'):
+                raise ValueError("Mode must be one of 'r', 'w' or 'a'.")
             self.filename = filename
-            self.fp = open(self.filename, '%sb' % mode)
+            self.fp = open(self.filename, {'r': 'rb', 'w': 'w+b', 'a': 'r+b'}[mode])
             if mmap is None:
-                mmap  = True
+                # the data of a file being appended to is written through
+                mmap = mode == 'r'
         self.use_mmap = mmap
         self.version_byte = version
 
-        if not mode in 'rw':
-            raise ValueError("Mode must be either 'r' or 'w'.")
+        if not mode in ('r', 'w', 'a'):
+            raise ValueError("Mode must be one of 'r', 'w' or 'a'.")
         self.mode = mode
 
         self.dimensions = {}
@@ -202,8 +231,16 @@ class netcdf_file(object):
 
         self._attributes = {}
 
-        if mode == 'r':
+        # in data mode records are written to the file as they are assigned
+        self.__dict__['_data_mode'] = False
+        self.__dict__['_header_size'] = 0
+        self.__dict__['_begin_rec'] = 0
+        self.__dict__['_mm'] = None
+
+        if mode in ('r', 'a'):
             self._read()
+        if mode == 'a':
+            self._enter_data_mode()
 
     def __setattr__(self, attr, value):
         # Store user defined attributes in a separate dict,
@@ -218,11 +255,62 @@ class netcdf_file(object):
         """Closes the NetCDF file."""
         if not self.fp.closed:
             try:
-                self.flush()
+                if self._data_mode:
+                    self._sync(header=True)
+                else:
+                    self.flush()
             finally:
                 self.fp.close()
     __del__ = close
 
+    @property
+    def data_mode(self):
+        """Whether the file is in data mode, see `enddef`"""
+        return self._data_mode
+
+    def record_offset(self, name, record=0):
+        """Byte offset in the file of the record `record` of the record
+        variable `name`."""
+        var = self.variables[name]
+        if not var.isrec:
+            raise ValueError("%s is not a record variable" % name)
+        return var._offset + record * self._recsize
+
+    def slab(self, name, records=slice(None)):
+        """
+        The records `records` (an index or a slice) of the record variable
+        `name`.
+
+        When the file is memory mapped the slab is a view of the map, strided
+        by the record size, and no data are read until the view is used.
+        Otherwise, the slab is ``variables[name][records]``.
+
+        """
+        var = self.variables[name]
+        if self._mm is None or not var.isrec:
+            return var[records]
+
+        shape = var._shape[1:]
+        strides = []
+        stride = var._size
+        for n in shape[::-1]:
+            strides.insert(0, stride)
+            stride *= n
+        if isinstance(records, slice):
+            start, stop, step = records.indices(self._recs)
+            n = len(xrange(start, stop, step))
+            if not n:
+                return empty((0,) + shape, dtype=var.data.dtype)
+            shape = (n,) + shape
+            strides.insert(0, step * self._recsize)
+        else:
+            start = records + self._recs if records < 0 else records
+            if not 0 <= start < self._recs:
+                raise IndexError("record index out of range")
+        return ndarray.__new__(ndarray, shape, dtype='>%s' % var._typecode,
+                buffer=self._mm, offset=self.record_offset(name, start),
+                strides=tuple(strides))
+
     def createDimension(self, name, length):
         """
         Adds a dimension to the Dimension section of the NetCDF data structure.
@@ -243,6 +331,8 @@ class netcdf_file(object):
         createVariable
 
         """
+        if self._data_mode:
+            raise ValueError("Cannot create dimensions in data mode.")
         self.dimensions[name] = length
         self._dims.append(name)
 
@@ -277,6 +367,8 @@ class netcdf_file(object):
         creating the NetCDF variable.
 
         """
+        if self._data_mode:
+            raise ValueError("Cannot create variables in data mode.")
         shape = tuple([self.dimensions[dim] for dim in dimensions])
         shape_ = tuple([dim or 0 for dim in shape])  # replace None with 0 for numpy
 
@@ -300,10 +392,200 @@ class netcdf_file(object):
         sync : Identical function
 
         """
-        if hasattr(self, 'mode') and self.mode is 'w':
+        if self._data_mode:
+            self._sync()
+        elif hasattr(self, 'mode') and self.mode is 'w':
             self._write()
     sync = flush
 
+    def enddef(self, slack=HEADER_SLACK):
+        """
+        Leave define mode: write the header and the fixed size variables and
+        write records to the file as they are assigned from now on.
+
+        In data mode the record variables are not kept in memory.  `sync`
+        (or `flush`) writes the number of records to the header, the header
+        itself is rewritten on `close`.  No dimensions or variables can be
+        created once in data mode.
+
+        Parameters
+        ----------
+        slack : int, optional
+            Number of bytes reserved after the header.  Attributes can be
+            changed in data mode as long as the header does not grow by more
+            than `slack` bytes.
+
+        """
+        if self.mode == 'r':
+            raise ValueError("Cannot write to a file opened for reading.")
+        if self._data_mode:
+            return
+
+        # lay out the variables after the header and its slack
+        variables = self._sorted_variables()
+        rec_vars = [k for k in variables if self.variables[k].isrec]
+        for name in variables:
+            var = self.variables[name]
+            var.__dict__['_vsize'] = self._var_vsize(var, len(rec_vars))
+            if var.isrec and len(var.data) > self._recs:
+                self.__dict__['_recs'] = len(var.data)
+        pos = len(self._header()) + slack
+        pos += -pos % 4
+        self.__dict__['_header_size'] = pos
+        for name in [k for k in variables if k not in rec_vars]:
+            self.variables[name].__dict__['_offset'] = pos
+            pos += self.variables[name]._vsize
+        self.__dict__['_begin_rec'] = pos
+        for name in rec_vars:
+            self.variables[name].__dict__['_offset'] = pos
+            pos += self.variables[name]._vsize
+        self.__dict__['_recsize'] = pos - self._begin_rec
+
+        header = self._header()
+        self.fp.seek(0)
+        self.fp.write(header)
+        self.fp.write(asbytes('\x00') * (self._header_size - len(header)))
+        for name in variables:
+            var = self.variables[name]
+            if not var.isrec:
+                self._write_fixed(var)
+                continue
+            # records assigned before enddef
+            for (r, row) in enumerate(var.data):
+                self._write_row(var, r, row)
+
+        self._enter_data_mode()
+        self._sync()
+
+    def _enter_data_mode(self):
+        for var in self.variables.values():
+            if var.isrec:
+                var.__dict__['data'] = empty((0,) + var.data.shape[1:],
+                                             dtype=var.data.dtype)
+            var.__dict__['_file'] = self
+        self.__dict__['_data_mode'] = True
+
+    def _sync(self, header=False):
+        """Write the number of records (and, optionally, the header) to the
+        file"""
+        if header:
+            data = self._header()
+            if len(data) > self._header_size:
+                raise ValueError("Header does not fit in the space reserved "
+                                 "for it, increase the enddef slack.")
+            self.fp.seek(0)
+            self.fp.write(data)
+        self.fp.seek(4)
+        self._pack_int(self._recs)
+
+        # records of variables not assigned are zeros, extend the file so that
+        # every record counted in the header can be read
+        end = self._begin_rec + self._recs * self._recsize
+        self.fp.seek(0, 2)
+        if self.fp.tell() < end:
+            self.fp.truncate(end)
+        self.fp.flush()
+
+    def _header(self):
+        """The header, with the begin of each variable as set by enddef"""
+        fp = self.fp
+        self.__dict__['fp'] = BytesIO()
+        try:
+            self.fp.write(asbytes('CDF'))
+            self.fp.write(array(self.version_byte, '>b').tostring())
+            self._write_numrecs()
+            self._write_dim_array()
+            self._write_gatt_array()
+            if self.variables:
+                self.fp.write(NC_VARIABLE)
+                self._pack_int(len(self.variables))
+                for name in self._sorted_variables():
+                    self._write_var_metadata(name)
+            else:
+                self.fp.write(ABSENT)
+            return self.fp.getvalue()
+        finally:
+            self.__dict__['fp'] = fp
+
+    def _write_fixed(self, var):
+        self.fp.seek(var._offset)
+        self.fp.write(var.data.tostring())
+        count = var.data.size * var.data.itemsize
+        self.fp.write(asbytes('\x00') * (var._vsize - count))
+
+    def _row_offset(self, var, r):
+        return var._offset + r * self._recsize
+
+    def _write_row(self, var, r, row):
+        row = asarray(row, dtype=var.data.dtype)
+        self.fp.seek(self._row_offset(var, r))
+        self.fp.write(row.tostring())
+        count = row.size * row.itemsize
+        self.fp.write(asbytes('\x00') * (var._vsize - count))
+
+    def _read_row(self, var, r):
+        size = reduce(mul, var._shape[1:], 1)
+        self.fp.seek(self._row_offset(var, r))
+        row = fromstring(self.fp.read(size * var.data.itemsize),
+                         dtype=var.data.dtype)
+        return row.reshape(var._shape[1:])
+
+    def _record_index(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        return index[0], index[1:]
+
+    def _get(self, var, index):
+        """var[index] of a variable in data mode"""
+        if not var.isrec:
+            return var.data[index]
+        rec_index, rest = self._record_index(index)
+        if isinstance(rec_index, (int, long, np.integer)):
+            r = rec_index + self._recs if rec_index < 0 else rec_index
+            if not 0 <= r < self._recs:
+                raise IndexError("record index out of range")
+            return self._read_row(var, r)[rest]
+        rows = range(self._recs)
+        if isinstance(rec_index, slice):
+            rows, rec_index = rows[rec_index], slice(None)
+        data = empty((len(rows),) + var._shape[1:], dtype=var.data.dtype)
+        for (k, r) in enumerate(rows):
+            data[k] = self._read_row(var, r)
+        return data[(rec_index,) + rest]
+
+    def _put(self, var, index, data):
+        """Write var[index] = data of a variable in data mode through to the
+        file"""
+        if not var.isrec:
+            var.data[index] = data
+            self._write_fixed(var)
+            return
+        rec_index, rest = self._record_index(index)
+        data = asarray(data)
+        if isinstance(rec_index, slice):
+            stop = rec_index.stop
+            if stop is None:
+                stop = (rec_index.start or 0) + len(data)
+            rows = range(*rec_index.indices(stop))
+        else:
+            r = rec_index + self._recs if rec_index < 0 else rec_index
+            rows, data = [r], data[np.newaxis]
+
+        # rows that are not completely assigned are read first
+        shape = var._shape[1:]
+        covered = np.zeros(shape, dtype=bool)
+        covered[rest] = True
+        full = covered.all()
+        for (k, r) in enumerate(rows):
+            if full or r >= self._recs:
+                row = np.zeros(shape, dtype=var.data.dtype)
+            else:
+                row = self._read_row(var, r)
+            row[rest] = data[k] if data.ndim else data
+            self._write_row(var, r, row)
+        if rows and rows[-1] + 1 > self._recs:
+            self.__dict__['_recs'] = rows[-1] + 1
+
     def _write(self):
         self.fp.write(asbytes('CDF'))
         self.fp.write(array(self.version_byte, '>b').tostring())
@@ -350,11 +632,7 @@ class netcdf_file(object):
             self.fp.write(NC_VARIABLE)
             self._pack_int(len(self.variables))
 
-            # Sort variables non-recs first, then recs. We use a DSU
-            # since some people use pupynere with Python 2.3.x.
-            deco = [ (v._shape and not v.isrec, k) for (k, v) in self.variables.items() ]
-            deco.sort()
-            variables = [ k for (unused, k) in deco ][::-1]
+            variables = self._sorted_variables()
 
             # Set the metadata for all variables.
             for name in variables:
@@ -370,6 +648,23 @@ class netcdf_file(object):
         else:
             self.fp.write(ABSENT)
 
+    def _sorted_variables(self):
+        # Sort variables non-recs first, then recs. We use a DSU
+        # since some people use pupynere with Python 2.3.x.
+        deco = [ (v._shape and not v.isrec, k) for (k, v) in self.variables.items() ]
+        deco.sort()
+        return [ k for (unused, k) in deco ][::-1]
+
+    def _var_vsize(self, var, rec_vars):
+        if not var.isrec:
+            vsize = var.data.size * var.data.itemsize
+            vsize += -vsize % 4
+        else:  # record variable
+            vsize = reduce(mul, var._shape[1:], 1) * var.data.itemsize
+            if rec_vars > 1:
+                vsize += -vsize % 4
+        return vsize
+
     def _write_var_metadata(self, name):
         var = self.variables[name]
 
@@ -384,24 +679,15 @@ class netcdf_file(object):
         nc_type = REVERSE[var.typecode(), var.itemsize()]
         self.fp.write(asbytes(nc_type))
 
-        if not var.isrec:
-            vsize = var.data.size * var.data.itemsize
-            vsize += -vsize % 4
-        else:  # record variable
-            try:
-                vsize = var.data[0].size * var.data.itemsize
-            except IndexError:
-                vsize = 0
-            rec_vars = len([var for var in self.variables.values()
-                    if var.isrec])
-            if rec_vars > 1:
-                vsize += -vsize % 4
+        rec_vars = len([v for v in self.variables.values() if v.isrec])
+        vsize = self._var_vsize(var, rec_vars)
         self.variables[name].__dict__['_vsize'] = vsize
         self._pack_int(vsize)
 
-        # Pack a bogus begin, and set the real value later.
+        # Pack a bogus begin, and set the real value later.  In data mode,
+        # the begin is known.
         self.variables[name].__dict__['_begin'] = self.fp.tell()
-        self._pack_begin(0)
+        self._pack_begin(var.__dict__.get('_offset', 0))
 
     def _write_var_data(self, name):
         var = self.variables[name]
@@ -530,6 +816,9 @@ class netcdf_file(object):
         dtypes = {'names': [], 'formats': []}
         rec_vars = []
         count = self._unpack_int()
+        if self.use_mmap:
+            # one map of the whole file, the variables are views of it
+            self.__dict__['_mm'] = mmap(self.fp.fileno(), 0, access=ACCESS_READ)
         for var in range(count):
             (name, dimensions, shape, attributes,
              typecode, size, dtype_, begin_, vsize) = self._read_var()
@@ -565,14 +854,13 @@ class netcdf_file(object):
                         dtypes['formats'].append('(%d,)>b' % padding)
 
                 # Data will be set later.
-                data = None
+                data = empty((0,) + shape[1:], dtype=dtype_)
             else: # not a record variable
                 # Calculate size to avoid problems with vsize (above)
                 a_size = reduce(mul, shape, 1) * size
                 if self.use_mmap:
-                    mm = mmap(self.fp.fileno(), begin_+a_size, access=ACCESS_READ)
                     data = ndarray.__new__(ndarray, shape, dtype=dtype_,
-                            buffer=mm, offset=begin_, order=0)
+                            buffer=self._mm, offset=begin_, order=0)
                 else:
                     pos = self.fp.tell()
                     self.fp.seek(begin_)
@@ -583,6 +871,15 @@ class netcdf_file(object):
             # Add variable.
             self.variables[name] = netcdf_variable(
                     data, typecode, size, shape, dimensions, attributes)
+            self.variables[name].__dict__['_offset'] = begin_
+            self.variables[name].__dict__['_vsize'] = vsize
+
+        if len(rec_vars) == 1:
+            # Records of a single record variable are not padded
+            var = self.variables[rec_vars[0]]
+            vsize = reduce(mul, var._shape[1:], 1) * var._size
+            self.__dict__['_recsize'] = vsize
+            var.__dict__['_vsize'] = vsize
 
         if rec_vars:
             # Remove padding when only one record variable.
@@ -592,18 +889,27 @@ class netcdf_file(object):
 
             # Build rec array.
             if self.use_mmap:
-                mm = mmap(self.fp.fileno(), begin+self._recs*self._recsize, access=ACCESS_READ)
-                rec_array = ndarray.__new__(ndarray, (self._recs,), dtype=dtypes,
-                        buffer=mm, offset=begin, order=0)
-            else:
+                # each record variable is a strided view of the file, the
+                # records are not gathered in to a record array
+                for var in rec_vars:
+                    self.variables[var].__dict__['data'] = self.slab(var)
+            elif self.mode != 'a':
+                # records of a file being appended to are read from the file
+                # as they are accessed, they are not loaded here
                 pos = self.fp.tell()
                 self.fp.seek(begin)
                 rec_array = fromstring(self.fp.read(self._recs*self._recsize), dtype=dtypes)
                 rec_array.shape = (self._recs,)
                 self.fp.seek(pos)
 
-            for var in rec_vars:
-                self.variables[var].__dict__['data'] = rec_array[var]
+                for var in rec_vars:
+                    self.variables[var].__dict__['data'] = rec_array[var]
+
+        offsets = [v._offset for v in self.variables.values()]
+        self.__dict__['_header_size'] = min(offsets or [self.fp.tell()])
+        self.__dict__['_begin_rec'] = begin or max(
+            [v._offset + v._vsize for v in self.variables.values()] or
+            [self._header_size])
 
     def _read_var(self):
         name = asstr(self._unpack_string())
@@ -730,6 +1036,9 @@ class netcdf_variable(object):
     isrec, shape
 
     """
+    # the netcdf_file of a variable in data mode
+    _file = None
+
     def __init__(self, data, typecode, size, shape, dimensions, attributes=None):
         self.data = data
         self._typecode = typecode
@@ -768,6 +1077,8 @@ class netcdf_variable(object):
         This is a read-only attribute and can not be modified in the
         same manner of other numpy arrays.
         """
+        if self._file is not None and self.isrec:
+            return (self._file._recs,) + self._shape[1:]
         return self.data.shape
     shape = property(shape)
 
@@ -836,9 +1147,14 @@ class netcdf_variable(object):
         return self._size
 
     def __getitem__(self, index):
+        if self._file is not None:
+            return self._file._get(self, index)
         return self.data[index]
 
     def __setitem__(self, index, data):
+        if self._file is not None:
+            self._file._put(self, index, data)
+            return
         # Expand data for record vars?
         if self.isrec:
             if isinstance(index, tuple):
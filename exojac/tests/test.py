@@ -2,12 +2,15 @@
 import numpy as np
 import os
 import sys
+import shutil
 
 
 D, F = os.path.split(os.path.realpath(__file__))
 sys.path.insert(0, os.path.dirname(D))
 from __init__ import ExodusIIFile
 from exoinc import *
+import netcdf as nc
+import exodiff
 
 
 def main():
@@ -237,10 +240,53 @@ def runtest():
 
         continue
 
-    # udpate and close the file
+    # udpate the file, the steps written so far can be read while it is open
     exofile.update()
+    reader = ExodusIIFile(exofile.filename, mode="r")
+    assert reader.num_time_steps == num_time_steps + 1
+    assert np.allclose(reader.get_time(num_time_steps), time_value)
+    assert np.allclose(reader.get_nodal_var(num_time_steps, "nod_var1"),
+                       nodal_var_vals)
+    reader.close()
     exofile.close()
 
+    # append a step to the closed file
+    db = nc.netcdf_file(exofile.filename, "a")
+    assert db.data_mode
+    step = db.variables[VAR_WHOLE_TIME].shape[0]
+    db.variables[VAR_WHOLE_TIME][step] = time_value + .01
+    db.variables[VAR_NOD_VAR_NEW(2)][step] = nodal_var_vals + .01
+    db.close()
+
+    exofile = ExodusIIFile(exofile.filename, mode="r")
+    assert exofile.num_time_steps == num_time_steps + 2
+    assert np.allclose(exofile.get_time(num_time_steps), time_value)
+    assert np.allclose(exofile.get_time(step), time_value + .01)
+    assert np.allclose(exofile.get_nodal_var(step, "nod_var1"),
+                       nodal_var_vals + .01)
+    assert np.allclose(exofile.get_nodal_var(step, "nod_var0"), 0.)
+    exofile.close()
+
+    # diff the file with itself, a variable of the control file that is not
+    # in the files (names are case sensitive) is a failure
+    filename = os.path.join(D, "myrun.exo")
+    shutil.copyfile(exofile.filename, filename)
+    control_file = os.path.join(D, "myrun.exodiff")
+    log = os.path.join(D, "myrun.exodiff.log")
+    for (names, status) in ((["nod_var1", "ele_var2"], exodiff.SAME),
+                            (["nod_var1", "NOD_VAR0"], exodiff.NOT_SAME),
+                            (["NOD_VAR0"], exodiff.NOT_SAME)):
+        with open(control_file, "w") as fh:
+            fh.write("<ExDiff>\n")
+            for name in names:
+                fh.write('  <Variable name="{0}"/>\n'.format(name))
+            fh.write("</ExDiff>\n")
+        assert exodiff.exodiff(filename, filename, control_file=control_file,
+                               f=log, v=0) == status
+    assert exodiff.exodiff(filename, filename, f=log, v=0) == exodiff.SAME
+    for f in (filename, control_file, log):
+        os.remove(f)
+
     # now read it
     exofile = ExodusIIFile(exofile.filename, mode="r")
     print exofile
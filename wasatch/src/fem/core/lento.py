@@ -89,6 +89,20 @@ class Lento(fem.FEModel):
 
         findstiff = True
 
+        # bandwidth reducing renumbering of the dofs, the renumbered system
+        # is solved in banded storage
+        perm = None
+        if ro.renumber:
+            perm, bw = utils.dof_ordering(connect, nnode, ndof)
+            self.logger.write("dof renumbering (rcm): bandwidth {0} -> "
+                              "{1}".format(*bw))
+            bw = bw[1]
+            if 4 * bw >= nnode * ndof:
+                # too wide for banded storage to pay
+                self.logger.write("dof renumbering dropped, bandwidth too "
+                                  "large for a banded solve")
+                perm = None
+
         self.logger.write(intro("Implicit", runid, nsteps, tol,
                                 maxit, relax, tstart, tterm,
                                 ndof, nelems, nnode, elements))
@@ -142,7 +156,10 @@ class Lento(fem.FEModel):
                                     loadfactor, K, b)
 
                 # --- Solve for the correction
-                c, dw, info = utils.linsolve(K, b)
+                if perm is not None:
+                    c, dw, info = utils.banded_linsolve(K, b, perm, bw)
+                else:
+                    c, dw, info = utils.linsolve(K, b)
                 if info > 0:
                     self.logger.write("using least squares to solve system",
                                       beg="*** ")
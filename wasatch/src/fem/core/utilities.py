@@ -2,6 +2,9 @@ import sys
 import time
 import numpy as np
 import scipy.linalg.flapack as flapack
+from scipy.linalg import cholesky_banded, cho_solve_banded, LinAlgError
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import reverse_cuthill_mckee
 
 import __runopt__ as ro
 
@@ -116,6 +119,47 @@ def update_element_states(t, dt, X, elements, connect, u, du):
     return
 
 
+def dof_ordering(connect, nnode, ndof):
+    """Reverse Cuthill-McKee renumbering of the degrees of freedom
+
+    Parameters
+    ----------
+    connect : array_like, (i, j,)
+        List of nodes on the jth element
+    nnode : int
+        Number of nodes
+    ndof : int
+        Number of degrees of freedom per node
+
+    Returns
+    -------
+    perm : ndarray
+        perm[i] is the (original) dof numbered i
+    bandwidth : tuple
+        Half bandwidth of the global stiffness before and after renumbering
+
+    Notes
+    -----
+    The nodes are ordered from the node adjacency graph and the dofs of each
+    node are kept together.
+
+    """
+    connect = np.asarray(connect)
+    m = connect.shape[1]
+    rows = np.repeat(connect, m, axis=1).ravel()
+    cols = np.tile(connect, (1, m)).ravel()
+    keep = (rows >= 0) & (cols >= 0)
+    rows, cols = rows[keep], cols[keep]
+    graph = coo_matrix((np.ones(len(rows)), (rows, cols)),
+                       shape=(nnode, nnode)).tocsr()
+    nperm = np.asarray(reverse_cuthill_mckee(graph, symmetric_mode=True))
+    new = np.argsort(nperm)
+    bw = (ndof * np.abs(rows - cols).max() + ndof - 1,
+          ndof * np.abs(new[rows] - new[cols]).max() + ndof - 1)
+    perm = (ndof * nperm[:, np.newaxis] + np.arange(ndof)).ravel()
+    return perm, bw
+
+
 def linsolve(a, b):
     """Interface to the lapack dposv solve function in scipy.linalg
 
@@ -154,3 +198,55 @@ def linsolve(a, b):
                          % (time.time() - ti) )
 
     return c, x, info
+
+
+def banded_linsolve(a, b, perm, bw):
+    """Solve the renumbered system by banded Cholesky factorization
+
+    Parameters
+    ----------
+    a : ndarray
+        Real, symmetric, positive-definite matrix (the stiffness matrix)
+    b : ndarray
+        RHS of system of equations
+    perm : ndarray
+        perm[i] is the (original) dof numbered i, see dof_ordering
+    bw : int
+        Half bandwidth of the renumbered matrix
+
+    Returns
+    -------
+    c : ndarray
+        Cholesky factor in (upper) banded storage
+    x : ndarray
+        Solution to A x = b, in the original numbering
+    info : int
+        info = 0 -> solution is in x
+        info > 0 -> matrix is not positive definite
+
+    Notes
+    -----
+    Only the bw + 1 diagonals of the renumbered matrix are gathered from a,
+    the factorization costs O(n bw**2) operations in place of O(n**3).
+
+    """
+    if ro.debug:
+        ti = time.time()
+        sys.stdout.write('*** entering: fem.core.lento.banded_linsolve\n')
+
+    n = a.shape[0]
+    ab = np.zeros((bw + 1, n))
+    for k in range(bw + 1):
+        ab[bw - k, k:] = a[perm[:n-k], perm[k:]]
+    try:
+        c = cholesky_banded(ab)
+    except LinAlgError:
+        return None, None, 1
+    x = np.empty(n)
+    x[perm] = cho_solve_banded((c, False), b[perm])
+
+    if ro.debug:
+        sys.stdout.write('***  exiting: fem.core.lento.banded_linsolve (%.2f)s\n'
+                         % (time.time() - ti) )
+
+    return c, x, 0
@@ -47,6 +47,9 @@ def main(argv=None):
         help="Clean simulation output [default: %(default)s]")
     parser.add_argument("--cleanall", default=False, action="store_true",
         help="Clean all simulation output [default: %(default)s]")
+    parser.add_argument("--renumber", default=False, action="store_true",
+        help="""Renumber the degrees of freedom to reduce the bandwidth of
+                the stiffness [default: %(default)s]""")
     parser.add_argument("--profile", default=False, action="store_true",
         help="Run the simulation in a profiler [default: %(default)s]")
     parser.add_argument("-d", nargs="?", default=None, const="_RUNID_",
@@ -60,6 +63,7 @@ def main(argv=None):
     ro.debug = args.dbg
     ro.sqa = args.sqa
     ro.verbosity = args.v
+    ro.renumber = args.renumber
     if not cfg.exodus:
         cfg.exodus = args.E
 